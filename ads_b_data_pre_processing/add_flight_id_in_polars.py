@@ -3,18 +3,47 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from functools import partial
+from itertools import islice
 from pathlib import Path
 from timeit import default_timer
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
 import polars as pl
 
+from aia_model_contrail_avoidance.ads_b_ingestion import RAW_OBJECT_SUFFIX, scan_raw_ads_b_files
+from aia_model_contrail_avoidance.compact_schema import (
+    airports_as_categorical,
+    encode_icao_columns,
+    flight_key,
+    is_icao_encoded,
+)
 from aia_model_contrail_avoidance.config import (
+    ADS_B_INPUT_TIMESTAMP_FORMAT,
+    ADS_B_PARQUET_INPUT_OPTIONAL_COLUMNS,
     ADS_B_PARQUET_INPUT_SCHEMA,
-    ADS_B_PARQUET_OUTPUT_SCHEMA_WITH_FLIGHT_ID,
 )
 from aia_model_contrail_avoidance.core_model.airports import list_of_uk_airports
+from aia_model_contrail_avoidance.core_model.flights import flight_distance_expression
+from aia_model_contrail_avoidance.daily_partitions import (
+    compact_day_partition,
+    day_partition_directories_in_date_order,
+    day_partitions,
+    remove_chunk_parts,
+    write_day_partitions,
+)
+from aia_model_contrail_avoidance.flight_id_checkpoint import FlightIdCheckpoint
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
 
 logger = logging.getLogger(__name__)
 
@@ -25,75 +54,180 @@ logger = logging.getLogger(__name__)
 # Input: flight daraframe parquet files for the week without flight IDs
 FLIGHT_DATAFRAME_DIR = Path("~/ads_b").expanduser()
 
+# Input of the fused mode: raw ADS-B CSV files, segmented without converting them to parquet
+RAW_ADS_B_DIR = Path("~/ads_b_raw").expanduser()
+
+# If True, identify flights directly from the raw CSV files in RAW_ADS_B_DIR
+READ_RAW_CSV_FILES = False
+
 # Output: clean flights with flight IDs
 FLIGHTS_WITH_IDS_DIR = Path("~/ads_b_with_flight_ids").expanduser()
 
+# Number of input files segmented together, flights in progress are continued in the next chunk
+DEFAULT_FILES_PER_CHUNK = 5
+
+# Directory in the output dir of the checkpoint saved after each chunk, see `FlightIdCheckpoint`
+CHECKPOINT_DIR_NAME = ".checkpoint"
+
+# Prefix of the scratch directories in the output dir of `identify_uk_flights_in_parallel`
+SCRATCH_DIR_PREFIX = ".segmentation-"
+
+# Environment variable that sizes the polars thread pool of a process when polars is imported
+POLARS_MAX_THREADS_VARIABLE = "POLARS_MAX_THREADS"
+
+
+# Kilometres in a nautical mile, the unit of `flight_distance_expression`
+KILOMETRES_PER_NAUTICAL_MILE = 1.852
+
 
 # TAKEN FROM PETERS CODE AND KEPT FOR REFERENCE
 @dataclass
 class FlightSegmentationConfig:
-    """Configuration parameters for flight segmentation logic."""
+    """Configuration parameters for flight segmentation logic.
+
+    See `split_flight_at_datapoint` for how the thresholds start new flights.
+    """
 
     # "Soft" in-air gap where we need consistency checks
     soft_gap_minutes: float = 45.0
     # Long ground gap between flights
     long_ground_gap_minutes: float = 50.0
-    # Hard "always new flight" gap (currently used)
+    # Hard "always new flight" gap
     hard_gap_hours: float = 6.0
     # Big spatial jump threshold (km)
     max_jump_km: float = 500.0
+    # Ground speed (km/h) above which a big jump cannot have been flown in its time gap
+    max_implied_speed_kmh: float = 1200.0
     # "Same heading" threshold (deg) for in-air continuity
     same_heading_deg: float = 90.0
+    # Only start new flights at hard gaps, as before the other rules were applied
+    hard_gap_only: bool = False
 
 
-def filter_and_fill_origin_destination_pair(
-    flight_dataframe: pl.DataFrame,
-) -> pl.DataFrame:
-    """Filter out rows with missing origin and destination airports, and fill forward/backward.
+def scan_ads_b_parquet_files(input_files: Sequence[Path]) -> pl.LazyFrame:
+    """Lazily scan raw ADS-B parquet files with `ADS_B_PARQUET_INPUT_SCHEMA`.
+
+    Files converted before a column of `ADS_B_PARQUET_INPUT_OPTIONAL_COLUMNS` was kept are read
+    with the default value of that column, so they need not be ingested again. Only when some
+    files lack a column are the files scanned one by one.
 
     Args:
-        flight_dataframe: polars DataFrame sorted by timestamp.
-            required columns: departure_airport_icao, arrival_airport_icao, icao_address.
+        input_files: raw ADS-B parquet files, concatenated in the given order.
 
-    Returns: dataframe with filled origin and destination airport columns.
+    Returns: LazyFrame of the ADS-B datapoints with the string timestamps of the files.
     """
-    # remove rows where both departure and arrival airports are missing
-    flight_dataframe_filtered = flight_dataframe.filter(
-        pl.col("departure_airport_icao").is_not_null().over("icao_address")
-        & pl.col("arrival_airport_icao").is_not_null().over("icao_address")
+    missing_columns_of_files = [
+        [
+            column
+            for column in ADS_B_PARQUET_INPUT_OPTIONAL_COLUMNS
+            if column not in pl.read_parquet_schema(path)
+        ]
+        for path in input_files
+    ]
+    if not any(missing_columns_of_files):
+        return pl.scan_parquet(list(input_files), schema=ADS_B_PARQUET_INPUT_SCHEMA)
+
+    logger.warning(
+        "%d input files lack some of the columns %s, reading them with their default values.",
+        sum(1 for missing_columns in missing_columns_of_files if missing_columns),
+        list(ADS_B_PARQUET_INPUT_OPTIONAL_COLUMNS),
     )
-
-    logger.debug(
-        "After filtering out rows with missing origin and destination airports, there are %d unique aircraft",
-        len(flight_dataframe_filtered["icao_address"].unique()),
+    return pl.concat(
+        [
+            pl.scan_parquet(
+                path, schema=ADS_B_PARQUET_INPUT_SCHEMA, missing_columns="insert"
+            ).with_columns(
+                pl.lit(
+                    ADS_B_PARQUET_INPUT_OPTIONAL_COLUMNS[column],
+                    dtype=ADS_B_PARQUET_INPUT_SCHEMA[column],
+                ).alias(column)
+                for column in missing_columns
+            )
+            for path, missing_columns in zip(input_files, missing_columns_of_files, strict=True)
+        ],
+        how="vertical",
     )
 
-    # fill forward and backward the missing departure and arrival airports within each icao_address group
-    return flight_dataframe_filtered.with_columns(
-        [
-            pl.col("departure_airport_icao")
-            .fill_null(strategy="forward")
-            .fill_null(strategy="backward")
-            .over("icao_address"),
-            pl.col("arrival_airport_icao")
-            .fill_null(strategy="forward")
-            .fill_null(strategy="backward")
-            .over("icao_address"),
-        ]
+
+def scan_ads_b_input_files(
+    input_files: Sequence[Path], *, compact_icao: bool = False
+) -> pl.LazyFrame:
+    """Lazily scan raw ADS-B parquet or CSV files and parse their timestamps.
+
+    The parquet files are scanned with `scan_ads_b_parquet_files` and the timestamp parsing is
+    part of the scan, so only the columns used downstream are read. Raw gzip CSV files are
+    scanned with `scan_raw_ads_b_files` into the same columns, so flights are identified straight
+    from the raw files without writing and reading them back as parquet.
+
+    With compact_icao the ICAO columns are encoded with `encode_icao_columns` and datapoints
+    without a valid aircraft address are removed. Otherwise the string ICAO columns are read as
+    they are.
+
+    Args:
+        input_files: raw ADS-B parquet files, or raw CSV files ending in `RAW_OBJECT_SUFFIX`,
+            concatenated in the given order.
+        compact_icao: if True, return the ICAO columns in the compact encoding.
+
+    Returns: LazyFrame of the ADS-B datapoints with a datetime timestamp column.
+
+    Raises:
+        ValueError: if some input files are raw CSV files and others are not.
+    """
+    raw_input_files = [path for path in input_files if path.name.endswith(RAW_OBJECT_SUFFIX)]
+    if raw_input_files and len(raw_input_files) < len(input_files):
+        msg = (
+            f"Input files mix {len(raw_input_files)} raw CSV files ending in "
+            f"{RAW_OBJECT_SUFFIX} with {len(input_files) - len(raw_input_files)} parquet files, "
+            f"such as {raw_input_files[0]}; read either raw or parquet files."
+        )
+        raise ValueError(msg)
+    if raw_input_files:
+        lazy_flight_dataframe = scan_raw_ads_b_files(input_files)
+    else:
+        lazy_flight_dataframe = scan_ads_b_parquet_files(input_files).with_columns(
+            pl.col("timestamp").str.to_datetime(format=ADS_B_INPUT_TIMESTAMP_FORMAT)
+        )
+    if not compact_icao:
+        return lazy_flight_dataframe
+    return encode_icao_columns(lazy_flight_dataframe).filter(pl.col("icao_address").is_not_null())
+
+
+def filter_and_fill_origin_destination_pair[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+) -> FlightFrame:
+    """Filter out rows with missing origin or destination airports.
+
+    The filter is per datapoint, so no missing airports are left to fill within each icao_address
+    group, and the datapoints keep their order without a window over icao_address.
+
+    Args:
+        flight_dataframe: polars DataFrame or LazyFrame sorted by timestamp.
+            required columns: departure_airport_icao, arrival_airport_icao.
+
+    Returns: dataframe with no missing origin and destination airports.
+    """
+    return flight_dataframe.filter(
+        pl.col("departure_airport_icao").is_not_null()
+        & pl.col("arrival_airport_icao").is_not_null()
     )
 
 
-def add_unique_flight_identifier(
-    flight_dataframe: pl.DataFrame,
-) -> pl.DataFrame:
+def add_unique_flight_identifier[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+) -> FlightFrame:
     """Add unique_flight_identifier column using: aircraft id, departure and arrival airports.
 
+    With the compact ICAO encoding the identifier is the three codes packed into one integer,
+    otherwise it is the three codes joined into a string.
+
     Args:
-        flight_dataframe: polars DataFrame sorted by timestamp.
+        flight_dataframe: polars DataFrame or LazyFrame sorted by timestamp.
             required columns: icao_address, departure_airport_icao, arrival_airport_icao.
 
     Returns: dataframe with new "unique_flight_identifier" column.
     """
+    if is_icao_encoded(flight_dataframe.collect_schema()):
+        return flight_dataframe.with_columns(flight_key().alias("unique_flight_identifier"))
     return flight_dataframe.with_columns(
         (
             pl.col("icao_address").cast(pl.Utf8)
@@ -105,19 +239,19 @@ def add_unique_flight_identifier(
     )
 
 
-def create_flight_info_dataframe_for_latest_flights(
-    output_dataframe: pl.DataFrame,
-) -> pl.DataFrame:
+def create_flight_info_dataframe_for_latest_flights[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    output_dataframe: FlightFrame,
+) -> FlightFrame:
     """Create flight info dataframe with last timestamps per flight_id within the last 6 hours.
 
     Args:
-        output_dataframe: polars DataFrame with flight_id column.
+        output_dataframe: polars DataFrame or LazyFrame with flight_id column.
             required columns: icao_address, departure_airport_icao, arrival_airport_icao, flight_id,
             timestamp.
 
     Returns: information dataframe with last timestamps per flight_id within the last 6 hours.
     """
-    if output_dataframe.is_empty():
+    if isinstance(output_dataframe, pl.DataFrame) and output_dataframe.is_empty():
         return pl.DataFrame()
 
     required_columns = {
@@ -127,31 +261,30 @@ def create_flight_info_dataframe_for_latest_flights(
         "flight_id",
         "timestamp",
     }
-    missing = required_columns - set(output_dataframe.columns)
+    missing = required_columns - set(output_dataframe.collect_schema().names())
     if missing:
         msg = f"Missing required columns in output_dataframe: {missing}"
         raise ValueError(msg)
 
-    max_timestamp = output_dataframe.select(pl.col("timestamp").max()).to_series()[0]
-    threshold = max_timestamp - pl.duration(hours=6)
+    # the latest last_timestamp is the latest timestamp of the output dataframe
     latest_flights_info_dataframe = (
         output_dataframe.group_by(
             ["flight_id", "icao_address", "departure_airport_icao", "arrival_airport_icao"]
         )
         .agg(pl.col("timestamp").max().alias("last_timestamp"))
-        .filter(pl.col("last_timestamp") >= threshold)
+        .filter(pl.col("last_timestamp") >= pl.col("last_timestamp").max() - pl.duration(hours=6))
     )
     # create unique flight identifier in latest_flights_info_dataframe
     return add_unique_flight_identifier(latest_flights_info_dataframe)
 
 
-def remove_non_uk_flights(
-    output_dataframe: pl.DataFrame,
-) -> pl.DataFrame:
+def remove_non_uk_flights[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    output_dataframe: FlightFrame,
+) -> FlightFrame:
     """Remove non-UK flights (when both departure and arrival airports are not in UK).
 
     Args:
-        output_dataframe: polars DataFrame with flight data.
+        output_dataframe: polars DataFrame or LazyFrame with flight data.
             required columns: departure_airport_icao, arrival_airport_icao.
 
     Returns: dataframe with only UK flights.
@@ -163,189 +296,285 @@ def remove_non_uk_flights(
     )
 
 
-def remove_erroneous_single_point_flights(
-    flight_dataframe_with_flight_id: pl.DataFrame,
-) -> pl.DataFrame:
-    """Remove flights that consist of only a few data points.
+def remove_erroneous_single_point_flights[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe_with_continued_flight_id: FlightFrame,
+) -> FlightFrame:
+    """Remove new flights that consist of only a few data points.
+
+    A new flight here is a run of consecutive datapoints of an aircraft with the same
+    unique_flight_identifier, which includes the aircraft, so runs never span two aircraft.
 
     Args:
-        flight_dataframe_with_flight_id: polars DataFrame of flight data.
-            required columns: icao_address, timestamp,first_flight_id, unique_flight_identifier.
+        flight_dataframe_with_continued_flight_id: polars DataFrame or LazyFrame of flight data,
+            sorted by icao_address and timestamp.
+            required columns: unique_flight_identifier, continued_flight_id.
 
-    Returns: dataframe with single-point flights removed and first_flight_id refactored.
+    Returns: dataframe with the datapoints of single-point new flights removed.
     """
-    # order by icao_address and timestamp
-    flight_dataframe_with_flight_id = flight_dataframe_with_flight_id.sort(
-        ["icao_address", "timestamp"]
-    )
-    # get flight IDs that occur less than the minimum number of consecutive datapoints threshold
+    # the datapoints of new flights of an aircraft all come before its continued flights
+    is_new_flight = pl.col("continued_flight_id").is_null()
+    first_flight_id = (
+        is_new_flight
+        & pl.col("unique_flight_identifier").ne_missing(pl.col("unique_flight_identifier").shift())
+    ).cum_sum()
+    # remove flight IDs that occur less than the minimum number of consecutive datapoints threshold
     min_number_of_consecutive_datapoints = 3
-    unique_flights_with_high_counts = (
-        flight_dataframe_with_flight_id.group_by("first_flight_id")
-        .agg(pl.len().alias("count"))
-        .filter(pl.col("count") > min_number_of_consecutive_datapoints)
-        .select("first_flight_id")
-        .to_series()
-        .to_list()
-    )
-    logger.debug(
-        "number of unique flights before removing erroneous single-point flights: %d",
-        len(flight_dataframe_with_flight_id["first_flight_id"].unique()),
-    )
-    # remove timestamps with these flight IDs
-    flight_dataframe_with_flight_id = flight_dataframe_with_flight_id.filter(
-        pl.col("first_flight_id").is_in(unique_flights_with_high_counts)
-    )
-    logger.debug(
-        "number of unique flights after removing erroneous single-point flights: %d",
-        len(flight_dataframe_with_flight_id["first_flight_id"].unique()),
+    return flight_dataframe_with_continued_flight_id.filter(
+        ~is_new_flight
+        | (is_new_flight.sum().over(first_flight_id) > min_number_of_consecutive_datapoints)
     )
 
-    # refactor first_flight_id to be consecutive after removing single-point flights
-    flight_dataframe_with_flight_id = flight_dataframe_with_flight_id.with_columns(
-        pl.struct(["unique_flight_identifier"]).rle_id().alias("first_flight_id")
-    )
-    logger.debug(
-        "After removing erroneous flights, there are %d unique flights",
-        len(flight_dataframe_with_flight_id["first_flight_id"].unique()),
-    )
-    return flight_dataframe_with_flight_id
 
+def first_timestamps_of_next_flights[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe_with_unique_flight_identifier: FlightFrame,
+) -> FlightFrame:
+    """First timestamp of each flight that starts within 6 hours of the start of the dataframe.
 
-def segment_dataframe_into_new_and_continued_flights(
-    previous_flight_info_dataframe: pl.DataFrame,
-    flight_dataframe_with_unique_flight_identifier: pl.DataFrame,
-) -> tuple[pl.DataFrame, pl.DataFrame]:
-    """Segment flight dataframe into new flights and continued flights using data from previous run.
+    These are the flights that can continue a flight of the previous chunk.
 
     Args:
-        previous_flight_info_dataframe: polars DataFrame with last timestamps per flight_id from
-            previous flight info.
-            required columns: icao_address, unique_flight_identifier, flight_id.
-        flight_dataframe_with_unique_flight_identifier: polars DataFrame with unique flight identifier column.
+        flight_dataframe_with_unique_flight_identifier: polars DataFrame or LazyFrame with unique
+            flight identifier column.
             required columns: icao_address, unique_flight_identifier, timestamp.
 
-    Returns: tuple of dataframes (continued_flights_dataframe, new_flights_dataframe_with_unique_flight_identifier).
+    Returns: dataframe with icao_address, unique_flight_identifier and first_timestamp columns.
     """
-    # get first timestamp per icao_address in the flight dataframe within the next 6 hours
-    next_flight_per_aircraft_from_flight_dataframe = (
+    return (
         flight_dataframe_with_unique_flight_identifier.group_by(
             "icao_address", "unique_flight_identifier"
         ).agg(pl.col("timestamp").min().alias("first_timestamp"))
     ).filter(pl.col("first_timestamp") <= (pl.col("first_timestamp").min() + pl.duration(hours=6)))
 
+
+def latest_previous_flights[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    previous_flight_info_dataframe: FlightFrame,
+) -> FlightFrame:
+    """Keep the flight with the latest last_timestamp of each unique_flight_identifier.
+
+    Args:
+        previous_flight_info_dataframe: polars DataFrame or LazyFrame with last timestamps per
+            flight_id from previous flight info.
+            required columns: icao_address, unique_flight_identifier, flight_id, last_timestamp.
+
+    Returns: flight info dataframe with one flight per unique_flight_identifier.
+    """
+    return previous_flight_info_dataframe.sort(["last_timestamp", "flight_id"]).unique(
+        ["icao_address", "unique_flight_identifier"], keep="last"
+    )
+
+
+def add_continued_flight_id[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    previous_flight_info_dataframe: FlightFrame,
+    flight_dataframe_with_unique_flight_identifier: FlightFrame,
+) -> FlightFrame:
+    """Add the flight_id of the previous flight that each datapoint continues, if any.
+
+    A flight continues the previous flight with the same unique_flight_identifier if it starts
+    within 6 hours of the start of the dataframe, and all later datapoints of the aircraft belong
+    to it. When the previous flight info has several flights with the same
+    unique_flight_identifier, the flight with the latest last_timestamp is continued.
+
+    Args:
+        previous_flight_info_dataframe: polars DataFrame or LazyFrame with last timestamps per
+            flight_id from previous flight info.
+            required columns: icao_address, unique_flight_identifier, flight_id, last_timestamp.
+        flight_dataframe_with_unique_flight_identifier: polars DataFrame or LazyFrame with unique
+            flight identifier column, sorted by icao_address and timestamp.
+            required columns: icao_address, unique_flight_identifier, timestamp.
+
+    Returns: dataframe with new "continued_flight_id" column, null for new flights.
+    """
+    # get first timestamp per icao_address in the flight dataframe within the next 6 hours
+    next_flight_per_aircraft_from_flight_dataframe = first_timestamps_of_next_flights(
+        flight_dataframe_with_unique_flight_identifier
+    )
+
+    # continue only the latest previous flight of each unique_flight_identifier
+    latest_previous_flight_info_dataframe = latest_previous_flights(previous_flight_info_dataframe)
+
     # the unique_flight_identifier has to match the flight_info_dataframe
     continued_flights_info_dataframe = next_flight_per_aircraft_from_flight_dataframe.join(
-        previous_flight_info_dataframe,
+        latest_previous_flight_info_dataframe,
         on=["icao_address", "unique_flight_identifier"],
         how="inner",
-    )
-    # keep only necessary columns
-    continued_flights_info_dataframe = continued_flights_info_dataframe.select(
-        ["icao_address", "unique_flight_identifier", "first_timestamp", "flight_id"]
-    )
-    # change first_timestamp column name to timestamp for joining
-    continued_flights_info_dataframe = continued_flights_info_dataframe.rename(
-        {"first_timestamp": "timestamp"}
+    ).select(
+        "icao_address",
+        "unique_flight_identifier",
+        pl.col("first_timestamp").alias("timestamp"),
+        pl.col("flight_id").alias("continued_flight_id"),
     )
 
-    # segment data into continued flights from previous flight info and new flights based on unique identifier
-    flight_dataframe_with_previous_flight_id = flight_dataframe_with_unique_flight_identifier.join(
+    # the join keeps the order of the flight data, which the forward fill relies on
+    flight_dataframe_with_continued_flight_id = flight_dataframe_with_unique_flight_identifier.join(
         continued_flights_info_dataframe,
         on=["icao_address", "unique_flight_identifier", "timestamp"],
         how="left",
+        maintain_order="left",
     )
-    # fill in flight_id for continued flights
-    flight_dataframe_with_previous_flight_id = (
-        flight_dataframe_with_previous_flight_id.with_columns(
-            pl.col("flight_id").fill_null(strategy="forward").over("icao_address")
-        )
+    # fill in flight_id for continued flights, within the aircraft of the first datapoint
+    continued_flight_icao_address = (
+        pl.when(pl.col("continued_flight_id").is_not_null())
+        .then(pl.col("icao_address"))
+        .forward_fill()
     )
-    # remove rows where there is no flight_id (these are new flights)
-    continued_flights_dataframe = flight_dataframe_with_previous_flight_id.filter(
-        pl.col("flight_id").is_not_null()
+    return flight_dataframe_with_continued_flight_id.with_columns(
+        pl.when(continued_flight_icao_address == pl.col("icao_address"))
+        .then(pl.col("continued_flight_id").forward_fill())
+        .alias("continued_flight_id")
     )
-    new_flights_dataframe_with_unique_flight_identifier = (
-        flight_dataframe_with_previous_flight_id.filter(pl.col("flight_id").is_null()).drop(
-            "flight_id"
-        )
+
+
+def split_flight_at_datapoint(config: FlightSegmentationConfig) -> pl.Expr:
+    """Whether each datapoint starts a new flight rather than continuing the previous datapoint.
+
+    Compares each datapoint with the previous one, which must be of the same aircraft:
+
+    - a time gap longer than hard_gap_hours always starts a new flight,
+    - a jump further than max_jump_km starts a new flight if it implies a ground speed above
+      max_implied_speed_kmh, so a long gap in the air of a cruising aircraft is left to the
+      soft gap rule,
+    - a gap longer than long_ground_gap_minutes with the aircraft reported on_ground at both
+      datapoints starts a new flight,
+    - a gap longer than soft_gap_minutes otherwise, in the air, starts a new flight if the heading
+      changes by more than same_heading_deg.
+
+    A rule with missing data, such as an unknown heading, does not start a new flight.
+
+    Args:
+        config: FlightSegmentationConfig with parameters for segmentation logic.
+
+    Returns: boolean expression, required columns: timestamp, latitude, longitude, on_ground,
+        heading.
+    """
+    time_gap = pl.col("timestamp").diff()
+    hard_gap = time_gap > config.hard_gap_hours * pl.duration(hours=1)
+    if config.hard_gap_only:
+        return hard_gap.fill_null(value=False)
+
+    jump_km = KILOMETRES_PER_NAUTICAL_MILE * flight_distance_expression(
+        pl.col("latitude").shift(),
+        pl.col("longitude").shift(),
+        pl.col("latitude"),
+        pl.col("longitude"),
     )
-    return continued_flights_dataframe, new_flights_dataframe_with_unique_flight_identifier
+    implied_speed_kmh = jump_km / (time_gap.dt.total_seconds(fractional=True) / 3600.0)
+    ground_gap = pl.col("on_ground") & pl.col("on_ground").shift()
+    heading_difference = (pl.col("heading") - pl.col("heading").shift()).abs() % 360.0
+    heading_change = pl.min_horizontal(heading_difference, 360.0 - heading_difference)
+    return (
+        hard_gap
+        | ((jump_km > config.max_jump_km) & (implied_speed_kmh > config.max_implied_speed_kmh))
+        | (ground_gap & (time_gap > config.long_ground_gap_minutes * pl.duration(minutes=1)))
+        | (
+            ~ground_gap
+            & (time_gap > config.soft_gap_minutes * pl.duration(minutes=1))
+            & (heading_change > config.same_heading_deg)
+        )
+    ).fill_null(value=False)
 
 
-def seperate_flight_id_for_large_time_gaps(
-    flight_dataframe_with_flight_id: pl.DataFrame,
+def seperate_flight_id_for_large_time_gaps[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe_with_continued_flight_id: FlightFrame,
     config: FlightSegmentationConfig,
-) -> pl.DataFrame:
-    """Separate flight IDs for large time gaps within the same flight.
+    next_flight_id: int,
+) -> FlightFrame:
+    """Assign flight IDs to new flights, with separate flight IDs for large time gaps.
+
+    New flights are numbered from next_flight_id in order of icao_address and timestamp, and a
+    datapoint that cannot continue the previous datapoint of its flight, see
+    `split_flight_at_datapoint`, starts the next flight ID.
 
     Args:
-        flight_dataframe_with_flight_id: polars DataFrame with flight data.
-            required columns: first_flight_id, timestamp.
+        flight_dataframe_with_continued_flight_id: polars DataFrame or LazyFrame with flight data,
+            sorted by icao_address and timestamp.
+            required columns: unique_flight_identifier, continued_flight_id, timestamp, and the
+            columns of `split_flight_at_datapoint` unless config.hard_gap_only.
         config: FlightSegmentationConfig with parameters for segmentation logic.
+        next_flight_id: flight_id of the first new flight.
 
-    Returns: dataframe with updated "flight_id" column.
+    Returns: dataframe with new "flight_id" column.
     """
-    # order by icao_address and timestamp
-    flight_dataframe_with_flight_id = flight_dataframe_with_flight_id.sort(
-        ["icao_address", "timestamp"]
-    )
-    # for each flight, check if there are any time gaps larger than the threshold
-    # gt() returns boolean series where True indicates a gap larger than threshold
-    flight_dataframe_with_flight_id = flight_dataframe_with_flight_id.with_columns(
-        pl.col("timestamp")
-        .diff()
-        .gt(config.hard_gap_hours * pl.duration(hours=1))
-        .over("first_flight_id")
-        .alias("time_gap_flight_increment")
-    )
-    # cum_sum() over the whole dataframe to increment for each time gap found
-    flight_dataframe_with_flight_id = flight_dataframe_with_flight_id.with_columns(
-        pl.col("time_gap_flight_increment").cum_sum().alias("time_gap_flight_increment")
-    )
-    # this is added to first_flight_id to create final flight_id
-    flight_dataframe_with_flight_id = flight_dataframe_with_flight_id.with_columns(
-        (
-            pl.col("first_flight_id").cast(pl.Int32)
-            + pl.col("time_gap_flight_increment").cast(pl.Int32)
-        ).alias("flight_id")
+    is_new_flight = pl.col("continued_flight_id").is_null()
+    new_flight_start = is_new_flight & pl.col("unique_flight_identifier").ne_missing(
+        pl.col("unique_flight_identifier").shift()
     )
-    logger.debug(
-        "After separating flight IDs for large time gaps, there are %d unique flights",
-        len(flight_dataframe_with_flight_id["flight_id"].unique()),
+    # the first datapoint of each flight has no gap, the others follow a datapoint of the flight
+    time_gap_flight_increment = (
+        is_new_flight & ~new_flight_start & split_flight_at_datapoint(config)
     )
-    logger.debug("smallest flight_id: %d", flight_dataframe_with_flight_id["flight_id"].min())
-    logger.debug("largest flight_id: %d", flight_dataframe_with_flight_id["flight_id"].max())
-
-    return flight_dataframe_with_flight_id.drop(
-        "unique_flight_identifier", "first_flight_id", "time_gap_flight_increment"
+    # cum_sum() over the whole dataframe to increment for each new flight and time gap found
+    new_flight_id = (
+        next_flight_id - 1 + new_flight_start.cum_sum() + time_gap_flight_increment.cum_sum()
     )
+    return flight_dataframe_with_continued_flight_id.with_columns(
+        pl.coalesce(pl.col("continued_flight_id"), new_flight_id).cast(pl.Int32).alias("flight_id")
+    ).drop("unique_flight_identifier", "continued_flight_id")
 
 
-def assign_flight_id_to_unique_flights(
-    flight_dataframe: pl.DataFrame,
+def assign_flight_id_to_unique_flights[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
     config: FlightSegmentationConfig,
     previous_flight_info_dataframe: pl.DataFrame | None = None,
-) -> pl.DataFrame:
+    next_flight_id: int | None = None,
+) -> FlightFrame:
     """Segment flights based on message data in the dataframe.
 
+    The segmentation is one lazy query, a DataFrame is collected with the in-memory engine and a
+    LazyFrame is returned uncollected, so it can be sunk with the streaming engine. The datapoints
+    are sorted once, see `assign_flight_id_to_sorted_flights`.
+
     Args:
-        flight_dataframe: polars DataFrame sorted by timestamp.
+        flight_dataframe: polars DataFrame or LazyFrame sorted by timestamp.
         previous_flight_info_dataframe: polars DataFrame with last timestamps per flight_id from
             previous flight.
         config: FlightSegmentationConfig with parameters for segmentation logic.
+        next_flight_id: flight_id of the first new flight, one more than the largest flight_id
+            of the previous flight info if not given, or 0 without previous flight info.
 
     Returns: dataframe with new "flight_id" column.
     """
-    if flight_dataframe.is_empty():
+    if isinstance(flight_dataframe, pl.DataFrame) and flight_dataframe.is_empty():
         return flight_dataframe.with_columns(pl.lit(None, pl.Int32).alias("flight_id"))
 
-    # Ensure chronological order and per-aircraft processing and encure correct types
-    flight_dataframe = flight_dataframe.sort(["icao_address", "timestamp"])
+    # Ensure chronological order and per-aircraft processing
+    output_dataframe = assign_flight_id_to_sorted_flights(
+        flight_dataframe.lazy().sort(["icao_address", "timestamp"], maintain_order=True),
+        config,
+        previous_flight_info_dataframe,
+        next_flight_id,
+    )
+    if isinstance(flight_dataframe, pl.DataFrame):
+        return output_dataframe.collect()
+    return output_dataframe
+
+
+def assign_flight_id_to_sorted_flights(
+    lazy_flight_dataframe: pl.LazyFrame,
+    config: FlightSegmentationConfig,
+    previous_flight_info_dataframe: pl.DataFrame | None = None,
+    next_flight_id: int | None = None,
+) -> pl.LazyFrame:
+    """Segment flights of datapoints that are already sorted by icao_address and timestamp.
+
+    Every step keeps the order of the datapoints, so they are never sorted again: continued and
+    new flights are told apart by a column rather than split and concatenated, and flights are
+    delimited by comparing each datapoint with the previous one rather than by windows.
+
+    Args:
+        lazy_flight_dataframe: polars LazyFrame sorted by icao_address and timestamp.
+        config: FlightSegmentationConfig with parameters for segmentation logic.
+        previous_flight_info_dataframe: polars DataFrame with last timestamps per flight_id from
+            previous flight.
+        next_flight_id: flight_id of the first new flight, see
+            `assign_flight_id_to_unique_flights`.
+
+    Returns: LazyFrame with new "flight_id" column, in the order of the input.
+    """
+    lazy_flight_dataframe = lazy_flight_dataframe.set_sorted("icao_address")
 
     # remove datapoints where departure and arrival airports are missing for the whole aircraft
     flight_dataframe_filled_origin_destination_pair = filter_and_fill_origin_destination_pair(
-        flight_dataframe
+        lazy_flight_dataframe
     )
 
     # create origin-destination pair column with calsign to identify unique flights
@@ -356,77 +585,192 @@ def assign_flight_id_to_unique_flights(
     # if flight info from previous flight is provided, use it to continue flight IDs
     if previous_flight_info_dataframe is not None and not previous_flight_info_dataframe.is_empty():
         # next flight_id to assign
-        next_flight_id = (
-            previous_flight_info_dataframe.select(pl.col("flight_id").max()).item()
-        ) + 1
+        if next_flight_id is None:
+            next_flight_id = (
+                previous_flight_info_dataframe.select(pl.col("flight_id").max()).item()
+            ) + 1
         logger.info(
             "Continuing flight IDs from previous chunk, starting with flight_id %d",
             next_flight_id,
         )
-        # create unique flight identifier in previous flight info dataframe
-        continued_flights_dataframe, new_flights_dataframe_with_unique_flight_identifier = (
-            segment_dataframe_into_new_and_continued_flights(
-                previous_flight_info_dataframe, flight_dataframe_with_unique_flight_identifier
-            )
-        )
-        continued_flights_dataframe = continued_flights_dataframe.drop(
-            "unique_flight_identifier",
+        flight_dataframe_with_continued_flight_id = add_continued_flight_id(
+            previous_flight_info_dataframe.lazy(),
+            flight_dataframe_with_unique_flight_identifier,
         )
     else:
+        flight_dataframe_with_continued_flight_id = (
+            flight_dataframe_with_unique_flight_identifier.with_columns(
+                pl.lit(None, pl.Int32).alias("continued_flight_id")
+            )
+        )
+    if next_flight_id is None:
         # start flight_id from 0
         next_flight_id = 0
-        continued_flights_dataframe = pl.DataFrame(
-            [], schema=flight_dataframe_with_unique_flight_identifier.schema
-        )
-        # add flight id column
-        continued_flights_dataframe = continued_flights_dataframe.with_columns(
-            pl.lit(None, pl.Int32).alias("flight_id")
-        ).drop("unique_flight_identifier")
-        new_flights_dataframe_with_unique_flight_identifier = (
-            flight_dataframe_with_unique_flight_identifier
-        )
 
-    # assign flight_id based on unique icao_addresses, O-D pairs
-    flight_dataframe_with_flight_id = new_flights_dataframe_with_unique_flight_identifier.sort(
-        ["icao_address", "timestamp"]
-    ).with_columns(
-        pl.struct(["icao_address", "unique_flight_identifier"]).rle_id().alias("first_flight_id")
+    # if a new flight occurs only a few times, remove it to avoid erroneous metadata switches
+    flight_dataframe_with_continued_flight_id = remove_erroneous_single_point_flights(
+        flight_dataframe_with_continued_flight_id
     )
 
-    # if first_flight_id occurs only once, remove it to avoid erroneous metadata switches
-    flight_dataframe_with_flight_id = remove_erroneous_single_point_flights(
-        flight_dataframe_with_flight_id
-    )
-    # add next_flight_id to first_flight_id to ensure unique flight IDs across flights
-    flight_dataframe_with_flight_id = flight_dataframe_with_flight_id.with_columns(
-        (pl.col("first_flight_id") + int(next_flight_id)).alias("first_flight_id")
-    )
-    logger.debug(
-        "After adding next_flight_id, largest first_flight_id: %d",
-        flight_dataframe_with_flight_id["first_flight_id"].max(),
+    # number the new flights, and increment flight_id for time gaps larger than the threshold
+    return seperate_flight_id_for_large_time_gaps(
+        flight_dataframe_with_continued_flight_id, config, int(next_flight_id)
     )
 
-    # for each flight, check if there are any time gaps larger than the threshold, and increment flight_id accordingly
-    flight_dataframe_with_flight_id = seperate_flight_id_for_large_time_gaps(
-        flight_dataframe_with_flight_id, config
+
+def compact_closed_days(
+    output_dir: Path,
+    compression: Literal["lz4", "uncompressed", "snappy", "gzip", "brotli", "zstd"] = "zstd",
+    *,
+    all_days_closed: bool = False,
+) -> None:
+    """Compact the day partitions that no more chunks are written to.
+
+    The input files are in chronological order, so every day before the latest day written is
+    closed. The days are ordered by date, as the ordinal days of the partitions restart at a new
+    year.
+
+    Args:
+        output_dir: Directory of the day partitions.
+        compression: Parquet compression codec.
+        all_days_closed: If True, also compact the latest day, once all input files are processed.
+    """
+    day_directories = day_partition_directories_in_date_order(output_dir)
+    if not all_days_closed:
+        day_directories = day_directories[:-1]
+    for day_directory in day_directories:
+        compact_day_partition(day_directory, compression)
+
+
+def start_from_checkpoint(  # noqa: PLR0913
+    input_files: list[Path],
+    output_dir: Path,
+    files_per_chunk: int,
+    config: FlightSegmentationConfig,
+    *,
+    compact_icao: bool = False,
+    resume: bool = False,
+) -> tuple[FlightIdCheckpoint, list[list[Path]]]:
+    """The checkpoint to start flight identification from and the chunks of files left to process.
+
+    Without resume, flight identification starts from the first input file. With resume, it starts
+    after the chunks of the checkpoint saved in output_dir, and the part files written by later
+    chunks of the interrupted run and the scratch directories it left are removed.
+
+    Args:
+        input_files: all input files, in order.
+        output_dir: output directory of the day partitions and the checkpoint.
+        files_per_chunk: number of input files per chunk.
+        config: FlightSegmentationConfig with parameters for segmentation logic.
+        compact_icao: if True, ICAO columns are written as their integer and enum encodings.
+        resume: if True, resume from the saved checkpoint.
+
+    Returns: tuple of the checkpoint and the remaining chunks of input files.
+
+    Raises:
+        ValueError: if the saved checkpoint was made with another files_per_chunk, config or
+            compact_icao.
+    """
+    checkpoint = FlightIdCheckpoint(
+        files_per_chunk=files_per_chunk,
+        segmentation_config=asdict(config),
+        compact_icao=compact_icao,
     )
+    if resume:
+        checkpoint = FlightIdCheckpoint.load(
+            output_dir / CHECKPOINT_DIR_NAME,
+            files_per_chunk,
+            asdict(config),
+            compact_icao=compact_icao,
+        )
+        remove_chunk_parts(output_dir, checkpoint.processed_chunks)
+        for scratch_dir in output_dir.glob(f"{SCRATCH_DIR_PREFIX}*"):
+            shutil.rmtree(scratch_dir)
+        logger.info("Resuming after %d processed files", len(checkpoint.processed_input_files))
+    remaining_input_files = checkpoint.remaining_input_files(input_files)
+    file_chunks = [
+        remaining_input_files[i : i + files_per_chunk]
+        for i in range(0, len(remaining_input_files), files_per_chunk)
+    ]
+    return checkpoint, file_chunks
 
-    # combine continued flights and new flights with flight IDs
-    return pl.concat(
-        [continued_flights_dataframe, flight_dataframe_with_flight_id], how="vertical"
-    ).sort(["icao_address", "timestamp"])
+
+def next_flight_id_after_chunk(next_flight_id: int, largest_flight_id: int | None) -> int:
+    """The flight_id of the first new flight of the next chunk.
+
+    Tracked from chunk to chunk rather than taken from the flight info of the latest flights,
+    which does not include the flights that ended early in the chunk.
+
+    Args:
+        next_flight_id: flight_id of the first new flight of the chunk.
+        largest_flight_id: largest flight_id in the output of the chunk, None if it is empty.
+
+    Returns: flight_id of the first new flight of the next chunk.
+    """
+    if largest_flight_id is None:
+        return next_flight_id
+    return max(next_flight_id, largest_flight_id + 1)
 
 
-def identify_uk_flights(
+def identify_uk_flights(  # noqa: PLR0913
     input_files: list[Path],
     output_dir: Path,
     *,
     config: FlightSegmentationConfig,
     compression: Literal["lz4", "uncompressed", "snappy", "gzip", "brotli", "zstd"] = "zstd",
+    compact_icao: bool = False,
+    streaming: bool = False,
+    files_per_chunk: int = DEFAULT_FILES_PER_CHUNK,
+    compact_days: bool = False,
+    workers: int = 1,
+    resume: bool = False,
 ) -> None:
-    """For each parquet file in directory, identify flights and assign flight IDs."""
-    if config is None:
-        config = FlightSegmentationConfig()
+    """For each parquet file in directory, identify flights and assign flight IDs.
+
+    The input files are segmented in chunks of files_per_chunk files, flights that are still in
+    progress at the end of a chunk are continued in the next one. The UK flights of each chunk are
+    written to a new part file per day, `output_dir/day=NNN/part-CCCCC-IIIII.parquet` with NNN the
+    ordinal day and CCCCC the chunk index (see `daily_partitions`), so no daily file is read back
+    to append to it. With compact_days, the part files of each day are merged into one file once
+    the day is closed.
+
+    With compact_icao, the ICAO address and airport columns are encoded as integers and airport
+    enums (see `compact_schema`) as soon as they are read, so flights are identified on integer
+    keys and the daily files are written in the compact encoding.
+
+    After each chunk, the flight info carried to the next chunk, the next flight ID and the
+    processed input files are saved to a checkpoint in `output_dir/.checkpoint`. With resume, the
+    input files processed by an interrupted run are skipped and the flight IDs continue as if it
+    had not been interrupted (see `start_from_checkpoint`).
+
+    With streaming, see `identify_uk_flights_streaming`, and with more than one worker, see
+    `identify_uk_flights_in_parallel`. Both give the same flight IDs.
+    """
+    if workers > 1:
+        identify_uk_flights_in_parallel(
+            input_files,
+            output_dir,
+            config=config,
+            compression=compression,
+            compact_icao=compact_icao,
+            files_per_chunk=files_per_chunk,
+            compact_days=compact_days,
+            workers=workers,
+            resume=resume,
+        )
+        return
+    if streaming:
+        identify_uk_flights_streaming(
+            input_files,
+            output_dir,
+            config=config,
+            compression=compression,
+            compact_icao=compact_icao,
+            files_per_chunk=files_per_chunk,
+            compact_days=compact_days,
+            resume=resume,
+        )
+        return
 
     overall_start = default_timer()
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -435,36 +779,38 @@ def identify_uk_flights(
         "Running flight identification for %d flight data files",
         len(input_files),
     )
-    logger.info("Chunking 5 files at a time")
+    logger.info("Chunking %d files at a time", files_per_chunk)
     logger.info("Output dir: %s", output_dir)
 
-    previous_chunk_flight_info_dataframe = pl.DataFrame()
-
-    # create file chunks of 5 files each
-    file_chunks = [input_files[i : i + 5] for i in range(0, len(input_files), 5)]
-    for file_chunk in file_chunks:
+    # create file chunks of files_per_chunk files each
+    checkpoint, file_chunks = start_from_checkpoint(
+        input_files, output_dir, files_per_chunk, config, compact_icao=compact_icao, resume=resume
+    )
+    for chunk_index, file_chunk in enumerate(file_chunks, start=checkpoint.processed_chunks):
         logger.info("Processing file chunk starting with %s", file_chunk[0].name)
-        # open all files in directory and add them to one dataframe
-        flight_dataframe = pl.concat(
-            [pl.read_parquet(file, schema=ADS_B_PARQUET_INPUT_SCHEMA) for file in file_chunk],
-            how="vertical",
-        )
-        # update dataframe so that timestamp is datetime type
-        flight_dataframe = flight_dataframe.with_columns(
-            pl.col("timestamp").str.to_datetime(format="%Y-%m-%d %H:%M:%S%.f %Z")
-        )
+        # open all files in the chunk and add them to one dataframe
+        flight_dataframe = scan_ads_b_input_files(file_chunk, compact_icao=compact_icao).collect()
 
         # assign flight IDs
         output_dataframe = assign_flight_id_to_unique_flights(
             flight_dataframe=flight_dataframe,
-            config=FlightSegmentationConfig(),
-            previous_flight_info_dataframe=previous_chunk_flight_info_dataframe,
+            config=config,
+            previous_flight_info_dataframe=checkpoint.flight_info,
+            next_flight_id=checkpoint.next_flight_id,
+        )
+        logger.debug(
+            "Assigned flight IDs to %d unique flights", output_dataframe["flight_id"].n_unique()
         )
 
         # extract last timestamp per flight_id within the last 6 hours of data
         previous_chunk_flight_info_dataframe = create_flight_info_dataframe_for_latest_flights(
             output_dataframe=output_dataframe
         )
+        largest_flight_id = output_dataframe.select(pl.col("flight_id").max()).item()
+        next_flight_id = next_flight_id_after_chunk(
+            checkpoint.next_flight_id,
+            None if largest_flight_id is None else int(largest_flight_id),
+        )
         # remove non UK flights (both departure and arrival airports not in UK)
         output_dataframe_uk_flights = remove_non_uk_flights(output_dataframe)
 
@@ -473,19 +819,563 @@ def identify_uk_flights(
         output_dataframe_uk_flights = output_dataframe_uk_flights.with_columns(
             pl.col("timestamp").dt.ordinal_day().alias("flight_day")
         )
-        for day, day_df in output_dataframe_uk_flights.partition_by(
-            "flight_day", as_dict=True
-        ).items():
-            day_str = str(day[0]).zfill(3)
-            day_file = output_dir / f"UK_flights_day_{day_str}.parquet"
-            # if file exists, append to it
-            if day_file.exists():
-                existing_day_df = pl.read_parquet(
-                    day_file, schema=ADS_B_PARQUET_OUTPUT_SCHEMA_WITH_FLIGHT_ID
+        write_day_partitions(
+            output_dataframe_uk_flights,
+            output_dir,
+            chunk_index,
+            compact=compact_icao,
+            compression=compression,
+        )
+        checkpoint = checkpoint.after_chunk(
+            file_chunk, previous_chunk_flight_info_dataframe, next_flight_id
+        )
+        checkpoint.save(output_dir / CHECKPOINT_DIR_NAME)
+        if compact_days:
+            compact_closed_days(output_dir, compression)
+
+    if compact_days:
+        compact_closed_days(output_dir, compression, all_days_closed=True)
+    elapsed = default_timer() - overall_start
+    logger.info(
+        "Flight identification complete in %dm %.1fs",
+        int(elapsed // 60),
+        elapsed % 60,
+    )
+
+
+def identify_uk_flights_streaming(  # noqa: PLR0913
+    input_files: list[Path],
+    output_dir: Path,
+    *,
+    config: FlightSegmentationConfig,
+    compression: Literal["lz4", "uncompressed", "snappy", "gzip", "brotli", "zstd"] = "zstd",
+    compact_icao: bool = False,
+    files_per_chunk: int = DEFAULT_FILES_PER_CHUNK,
+    compact_days: bool = False,
+    resume: bool = False,
+) -> None:
+    """Identify flights in chunks of input files, each chunk as one lazy query.
+
+    Each chunk is scanned, segmented and sunk to the day partitions with the streaming engine, so
+    the data of a chunk is never collected into one DataFrame. Only the flight info of the latest
+    flights, needed to continue flights in the next chunk, is collected from the same query plan.
+    The output is the same as for `identify_uk_flights`.
+
+    Peak memory still grows with files_per_chunk, not only with the streaming batch size: the sort
+    by icao_address and timestamp and the per-flight windows of the segmentation are blocking, so
+    the engine holds the whole chunk for them. Streaming saves the intermediate copies of the
+    eager path, and memory is bounded by lowering files_per_chunk.
+    """
+    overall_start = default_timer()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info(
+        "Streaming flight identification for %d flight data files, %d files at a time",
+        len(input_files),
+        files_per_chunk,
+    )
+    logger.info("Output dir: %s", output_dir)
+
+    checkpoint, file_chunks = start_from_checkpoint(
+        input_files, output_dir, files_per_chunk, config, compact_icao=compact_icao, resume=resume
+    )
+    for chunk_index, file_chunk in enumerate(file_chunks, start=checkpoint.processed_chunks):
+        logger.info("Processing file chunk starting with %s", file_chunk[0].name)
+        lazy_flight_dataframe = scan_ads_b_input_files(file_chunk, compact_icao=compact_icao)
+
+        lazy_output_dataframe = assign_flight_id_to_unique_flights(
+            flight_dataframe=lazy_flight_dataframe,
+            config=config,
+            previous_flight_info_dataframe=checkpoint.flight_info,
+            next_flight_id=checkpoint.next_flight_id,
+        )
+        lazy_output_dataframe_uk_flights = remove_non_uk_flights(
+            lazy_output_dataframe
+        ).with_columns(pl.col("timestamp").dt.ordinal_day().alias("flight_day"))
+        if compact_icao:
+            lazy_output_dataframe_uk_flights = airports_as_categorical(
+                lazy_output_dataframe_uk_flights
+            )
+
+        # the queries share the segmentation plan, which is only computed once
+        _, previous_chunk_flight_info_dataframe, largest_flight_id = pl.collect_all(
+            [
+                lazy_output_dataframe_uk_flights.sink_parquet(
+                    day_partitions(output_dir, chunk_index),
+                    compression=compression,
+                    mkdir=True,
+                    lazy=True,
+                ),
+                create_flight_info_dataframe_for_latest_flights(lazy_output_dataframe),
+                lazy_output_dataframe.select(pl.col("flight_id").max()),
+            ],
+            engine="streaming",
+        )
+        checkpoint = checkpoint.after_chunk(
+            file_chunk,
+            previous_chunk_flight_info_dataframe,
+            next_flight_id_after_chunk(checkpoint.next_flight_id, largest_flight_id.item()),
+        )
+        checkpoint.save(output_dir / CHECKPOINT_DIR_NAME)
+        if compact_days:
+            compact_closed_days(output_dir, compression)
+
+    if compact_days:
+        compact_closed_days(output_dir, compression, all_days_closed=True)
+    elapsed = default_timer() - overall_start
+    logger.info(
+        "Flight identification complete in %dm %.1fs",
+        int(elapsed // 60),
+        elapsed % 60,
+    )
+
+
+@dataclass
+class LocalChunkSegmentation:
+    """Flights of one chunk segmented on its own, with the summaries needed to stitch it.
+
+    The local flight IDs start from 0 as if the chunk was the first one, and no flight continues a
+    flight of the previous chunk.
+    """
+
+    # Index of the chunk in the input files
+    chunk_index: int
+    # Datapoints of the chunk with their local flight_id, null for removed single-point flights
+    datapoints_file: Path
+    # First timestamps of the flights that start within 6 hours of the start of the chunk
+    first_flights: pl.DataFrame
+    # Number of local flight IDs of each aircraft
+    local_flight_counts: pl.DataFrame
+    # Airports and last timestamp of each local flight
+    local_flights: pl.DataFrame
+
+
+@dataclass
+class StitchedChunk:
+    """Global flight IDs of a chunk, stitched to the flights of the previous chunks."""
+
+    # Index of the chunk in the input files
+    chunk_index: int
+    # Datapoints of the chunk with their local flight_id, see `LocalChunkSegmentation`
+    datapoints_file: Path
+    # Offset from the local to the global flight_id of the aircraft that continue no flight
+    flight_id_offsets: pl.DataFrame
+    # Datapoints with global flight IDs of the aircraft that continue a flight, if any
+    continuing_aircraft_datapoints: pl.DataFrame | None
+
+
+def segment_chunk_locally(
+    file_chunk: list[Path],
+    chunk_index: int,
+    scratch_dir: Path,
+    *,
+    config: FlightSegmentationConfig,
+    compact_icao: bool = False,
+) -> LocalChunkSegmentation:
+    """Assign local flight IDs to a chunk of input files, independently of the other chunks.
+
+    The first phase of `identify_uk_flights_in_parallel`. The datapoints are written to the
+    scratch directory, the summaries are collected from the same query plan.
+
+    Args:
+        file_chunk: raw ADS-B parquet files of the chunk.
+        chunk_index: index of the chunk in the input files.
+        scratch_dir: directory for the datapoints with local flight IDs.
+        config: FlightSegmentationConfig with parameters for segmentation logic.
+        compact_icao: if True, segment on the compact ICAO encoding.
+
+    Returns: local segmentation of the chunk.
+    """
+    lazy_flight_dataframe = scan_ads_b_input_files(file_chunk, compact_icao=compact_icao)
+    # the datapoints as prepared in assign_flight_id_to_sorted_flights, before any are removed
+    lazy_prepared_dataframe = add_unique_flight_identifier(
+        filter_and_fill_origin_destination_pair(
+            lazy_flight_dataframe.sort(["icao_address", "timestamp"], maintain_order=True)
+        )
+    ).with_row_index("datapoint_index")
+    lazy_local_output_dataframe = assign_flight_id_to_sorted_flights(
+        lazy_prepared_dataframe, config
+    )
+    lazy_datapoints_with_local_flight_id = lazy_prepared_dataframe.join(
+        lazy_local_output_dataframe.select("datapoint_index", "flight_id"),
+        on="datapoint_index",
+        how="left",
+        maintain_order="left",
+    ).drop("datapoint_index", "unique_flight_identifier")
+
+    datapoints_file = scratch_dir / f"chunk-{chunk_index:05d}.parquet"
+    _, first_flights, local_flight_counts, local_flights = pl.collect_all(
+        [
+            lazy_datapoints_with_local_flight_id.sink_parquet(datapoints_file, lazy=True),
+            first_timestamps_of_next_flights(lazy_prepared_dataframe),
+            lazy_local_output_dataframe.group_by("icao_address").agg(
+                pl.col("flight_id").n_unique().alias("local_flight_count")
+            ),
+            lazy_local_output_dataframe.group_by(
+                ["flight_id", "icao_address", "departure_airport_icao", "arrival_airport_icao"]
+            ).agg(pl.col("timestamp").max()),
+        ],
+        engine="streaming",
+    )
+    logger.info("Segmented file chunk starting with %s", file_chunk[0].name)
+    return LocalChunkSegmentation(
+        chunk_index=chunk_index,
+        datapoints_file=datapoints_file,
+        first_flights=first_flights,
+        local_flight_counts=local_flight_counts,
+        local_flights=local_flights,
+    )
+
+
+def stitch_chunk(
+    local_segmentation: LocalChunkSegmentation,
+    previous_flight_info_dataframe: pl.DataFrame,
+    next_flight_id: int,
+    config: FlightSegmentationConfig,
+) -> tuple[StitchedChunk, pl.DataFrame, int]:
+    """Map the local flight IDs of a chunk to the flight IDs of the sequential algorithm.
+
+    The second phase of `identify_uk_flights_in_parallel`, run for each chunk in order. Only the
+    aircraft that continue a flight of the previous chunk are segmented again, with
+    `assign_flight_id_to_sorted_flights` and the previous flights they continue. The flight IDs of
+    the other aircraft are their local IDs shifted by the number of flight IDs taken by the
+    aircraft before them, in the order of icao_address that the IDs are assigned in.
+
+    Args:
+        local_segmentation: local segmentation of the chunk.
+        previous_flight_info_dataframe: flight info of the latest flights of the previous chunk,
+            see `create_flight_info_dataframe_for_latest_flights`.
+        next_flight_id: flight_id of the first new flight of the chunk.
+        config: FlightSegmentationConfig with parameters for segmentation logic.
+
+    Returns: tuple of the stitched chunk, the flight info of its latest flights and the flight_id
+        of the first new flight of the next chunk.
+    """
+    local_flight_counts = local_segmentation.local_flight_counts
+    continuing_aircraft = local_flight_counts.get_column("icao_address").clear()
+    continuing_aircraft_datapoints = None
+    sequential_flight_counts = local_flight_counts.clear().rename(
+        {"local_flight_count": "sequential_flight_count"}
+    )
+    first_new_flight_id = 0
+    if not previous_flight_info_dataframe.is_empty():
+        continued_previous_flights = latest_previous_flights(previous_flight_info_dataframe).join(
+            local_segmentation.first_flights,
+            on=["icao_address", "unique_flight_identifier"],
+            how="semi",
+        )
+        continuing_aircraft = continued_previous_flights.get_column("icao_address").unique()
+
+    if not continuing_aircraft.is_empty():
+        # given only the flights they continue, these aircraft are segmented as in the chunk
+        continuing_aircraft_datapoints = assign_flight_id_to_sorted_flights(
+            pl.scan_parquet(local_segmentation.datapoints_file)
+            .filter(pl.col("icao_address").is_in(continuing_aircraft.implode()))
+            .drop("flight_id"),
+            config,
+            continued_previous_flights,
+        ).collect()
+        first_new_flight_id = (
+            continued_previous_flights.select(pl.col("flight_id").max()).item() + 1
+        )
+        sequential_flight_counts = (
+            continuing_aircraft_datapoints.filter(pl.col("flight_id") >= first_new_flight_id)
+            .group_by("icao_address")
+            .agg(pl.col("flight_id").n_unique().alias("sequential_flight_count"))
+        )
+
+    # flight IDs taken by the aircraft before each aircraft, locally and in the sequential order
+    is_continuing = pl.col("icao_address").is_in(continuing_aircraft.implode())
+    local_flight_count = pl.col("local_flight_count").cast(pl.Int64)
+    sequential_flight_count = pl.col("sequential_flight_count").cast(pl.Int64)
+    continuing_flight_count = pl.when(is_continuing).then(sequential_flight_count).otherwise(0)
+    aircraft_flight_counts = (
+        local_flight_counts.join(
+            sequential_flight_counts, on="icao_address", how="full", coalesce=True
+        )
+        .with_columns(
+            pl.col("local_flight_count").fill_null(0),
+            pl.when(is_continuing)
+            .then(pl.col("sequential_flight_count").fill_null(0))
+            .otherwise(pl.col("local_flight_count"))
+            .alias("sequential_flight_count"),
+        )
+        .sort("icao_address")
+        .with_columns(
+            (local_flight_count.cum_sum() - local_flight_count).alias("local_flights_before"),
+            (sequential_flight_count.cum_sum() - sequential_flight_count).alias(
+                "sequential_flights_before"
+            ),
+            (continuing_flight_count.cum_sum() - continuing_flight_count).alias(
+                "continuing_flights_before"
+            ),
+        )
+    )
+    flight_id_offsets = aircraft_flight_counts.filter(~is_continuing).select(
+        "icao_address",
+        (
+            next_flight_id + pl.col("sequential_flights_before") - pl.col("local_flights_before")
+        ).alias("flight_id_offset"),
+    )
+
+    latest_flights = [
+        local_segmentation.local_flights.join(flight_id_offsets, on="icao_address", how="inner")
+        .with_columns((pl.col("flight_id") + pl.col("flight_id_offset")).cast(pl.Int32))
+        .drop("flight_id_offset")
+    ]
+    if continuing_aircraft_datapoints is not None:
+        # new flights of the continuing aircraft were numbered after the flights they continue
+        continuing_flight_id_offsets = aircraft_flight_counts.filter(is_continuing).select(
+            "icao_address",
+            (
+                next_flight_id
+                + pl.col("sequential_flights_before")
+                - pl.col("continuing_flights_before")
+                - first_new_flight_id
+            ).alias("flight_id_offset"),
+        )
+        continuing_aircraft_datapoints = (
+            continuing_aircraft_datapoints.join(
+                continuing_flight_id_offsets,
+                on="icao_address",
+                how="left",
+                maintain_order="left",
+            )
+            .with_columns(
+                pl.when(pl.col("flight_id") >= first_new_flight_id)
+                .then(pl.col("flight_id") + pl.col("flight_id_offset"))
+                .otherwise(pl.col("flight_id"))
+                .cast(pl.Int32)
+            )
+            .drop("flight_id_offset")
+        )
+        latest_flights.append(
+            continuing_aircraft_datapoints.group_by(
+                ["flight_id", "icao_address", "departure_airport_icao", "arrival_airport_icao"]
+            ).agg(pl.col("timestamp").max())
+        )
+
+    stitched_chunk = StitchedChunk(
+        chunk_index=local_segmentation.chunk_index,
+        datapoints_file=local_segmentation.datapoints_file,
+        flight_id_offsets=flight_id_offsets,
+        continuing_aircraft_datapoints=continuing_aircraft_datapoints,
+    )
+    flight_info_dataframe = create_flight_info_dataframe_for_latest_flights(
+        pl.concat(latest_flights, how="vertical")
+    )
+    # the sum of an empty column is 0, never None
+    next_chunk_next_flight_id = next_flight_id + int(
+        aircraft_flight_counts.select(pl.col("sequential_flight_count").sum()).item()
+    )
+    return stitched_chunk, flight_info_dataframe, next_chunk_next_flight_id
+
+
+def write_stitched_chunk(
+    stitched_chunk: StitchedChunk,
+    output_dir: Path,
+    *,
+    compact_icao: bool = False,
+    compression: Literal["lz4", "uncompressed", "snappy", "gzip", "brotli", "zstd"] = "zstd",
+) -> None:
+    """Write the UK flights of a stitched chunk with their global flight IDs to the day partitions.
+
+    Args:
+        stitched_chunk: stitched chunk.
+        output_dir: directory of the day partitions.
+        compact_icao: if True, the chunk was segmented on the compact ICAO encoding.
+        compression: Parquet compression codec.
+    """
+    lazy_output_dataframe = (
+        pl.scan_parquet(stitched_chunk.datapoints_file)
+        .filter(pl.col("flight_id").is_not_null())
+        .join(
+            stitched_chunk.flight_id_offsets.lazy(),
+            on="icao_address",
+            how="inner",
+            maintain_order="left",
+        )
+        .with_columns((pl.col("flight_id") + pl.col("flight_id_offset")).cast(pl.Int32))
+        .drop("flight_id_offset")
+    )
+    if stitched_chunk.continuing_aircraft_datapoints is not None:
+        lazy_output_dataframe = pl.concat(
+            [lazy_output_dataframe, stitched_chunk.continuing_aircraft_datapoints.lazy()],
+            how="vertical",
+        )
+    lazy_output_dataframe_uk_flights = remove_non_uk_flights(
+        lazy_output_dataframe.sort(["icao_address", "timestamp"], maintain_order=True)
+    ).with_columns(pl.col("timestamp").dt.ordinal_day().alias("flight_day"))
+    if compact_icao:
+        lazy_output_dataframe_uk_flights = airports_as_categorical(lazy_output_dataframe_uk_flights)
+    lazy_output_dataframe_uk_flights.sink_parquet(
+        day_partitions(output_dir, stitched_chunk.chunk_index),
+        compression=compression,
+        mkdir=True,
+        engine="streaming",
+    )
+    stitched_chunk.datapoints_file.unlink()
+
+
+def write_and_checkpoint_chunk(  # noqa: PLR0913
+    stitched_chunk: StitchedChunk,
+    checkpoint: FlightIdCheckpoint,
+    output_dir: Path,
+    *,
+    compact_icao: bool = False,
+    compact_days: bool = False,
+    compression: Literal["lz4", "uncompressed", "snappy", "gzip", "brotli", "zstd"] = "zstd",
+) -> None:
+    """Write a stitched chunk, then save the checkpoint after it and compact the closed days.
+
+    The third phase of `identify_uk_flights_in_parallel`, run for each chunk in order, as each
+    chunk is processed in the sequential modes.
+
+    Args:
+        stitched_chunk: stitched chunk.
+        checkpoint: checkpoint after the chunk.
+        output_dir: directory of the day partitions and the checkpoint.
+        compact_icao: if True, the chunk was segmented on the compact ICAO encoding.
+        compact_days: if True, compact the day partitions that are closed after the chunk.
+        compression: Parquet compression codec.
+    """
+    write_stitched_chunk(
+        stitched_chunk, output_dir, compact_icao=compact_icao, compression=compression
+    )
+    checkpoint.save(output_dir / CHECKPOINT_DIR_NAME)
+    if compact_days:
+        compact_closed_days(output_dir, compression)
+    logger.info("Wrote chunk %d", stitched_chunk.chunk_index)
+
+
+@contextmanager
+def polars_threads_of_new_processes(threads: int) -> Iterator[None]:
+    """Size the polars thread pool of the processes started in the context.
+
+    Polars sizes its thread pool when it is imported, so the size is set in the environment that
+    new processes inherit, and the thread pool of this process is unchanged.
+
+    Args:
+        threads: number of polars threads of each new process.
+    """
+    previous_threads = os.environ.get(POLARS_MAX_THREADS_VARIABLE)
+    os.environ[POLARS_MAX_THREADS_VARIABLE] = str(threads)
+    try:
+        yield
+    finally:
+        if previous_threads is None:
+            del os.environ[POLARS_MAX_THREADS_VARIABLE]
+        else:
+            os.environ[POLARS_MAX_THREADS_VARIABLE] = previous_threads
+
+
+def identify_uk_flights_in_parallel(  # noqa: PLR0913
+    input_files: list[Path],
+    output_dir: Path,
+    *,
+    config: FlightSegmentationConfig,
+    compression: Literal["lz4", "uncompressed", "snappy", "gzip", "brotli", "zstd"] = "zstd",
+    compact_icao: bool = False,
+    files_per_chunk: int = DEFAULT_FILES_PER_CHUNK,
+    compact_days: bool = False,
+    workers: int = 2,
+    resume: bool = False,
+) -> None:
+    """Identify flights in chunks of input files segmented in parallel, then stitched in order.
+
+    1. Each chunk is segmented with local flight IDs by `segment_chunk_locally`, in a pool of
+       `workers` processes. Each process has its share of the cores for its polars queries, so
+       the chunks are segmented on separate cores rather than competing for all of them.
+    2. The chunks are stitched in order by `stitch_chunk` as soon as they are segmented, which
+       only segments again the aircraft that continue a flight of the previous chunk.
+    3. Each stitched chunk is written, checkpointed and its closed days compacted by
+       `write_and_checkpoint_chunk` in one writer thread, so in chunk order.
+
+    The flight IDs and output are the same as for `identify_uk_flights` with one worker. At most
+    `workers` chunks are segmented ahead of the stitching and at most `workers` stitched chunks
+    wait to be written, so the writes and checkpoints keep up with the segmentation. The
+    datapoints with local flight IDs are written to a scratch directory in output_dir, and the
+    file of a chunk is removed once the chunk is written.
+
+    Each chunk is written to and read back from the scratch directory, and the aircraft that
+    continue a flight are segmented again, so this mode is only faster than one worker when there
+    are spare cores, see `benchmarks/benchmark_parallel_flight_identification.py`.
+    """
+    overall_start = default_timer()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info(
+        "Running flight identification for %d flight data files, %d files at a time with %d workers",
+        len(input_files),
+        files_per_chunk,
+        workers,
+    )
+    logger.info("Output dir: %s", output_dir)
+
+    checkpoint, file_chunks = start_from_checkpoint(
+        input_files, output_dir, files_per_chunk, config, compact_icao=compact_icao, resume=resume
+    )
+    with (
+        tempfile.TemporaryDirectory(prefix=SCRATCH_DIR_PREFIX, dir=output_dir) as scratch_dir,
+        polars_threads_of_new_processes(max(1, (os.cpu_count() or 1) // workers)),
+        # spawn rather than fork, forking a process that has used polars can deadlock
+        ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as segmentation_executor,
+        ThreadPoolExecutor(max_workers=1) as write_executor,
+    ):
+        segment = partial(
+            segment_chunk_locally,
+            scratch_dir=Path(scratch_dir),
+            config=config,
+            compact_icao=compact_icao,
+        )
+        chunks_to_segment = enumerate(file_chunks, start=checkpoint.processed_chunks)
+        # segmentations in chunk order, submitted at most `workers` chunks ahead of the stitching
+        segmentations: deque[tuple[list[Path], Future[LocalChunkSegmentation]]] = deque(
+            (file_chunk, segmentation_executor.submit(segment, file_chunk, chunk_index))
+            for chunk_index, file_chunk in islice(chunks_to_segment, workers)
+        )
+        writes: deque[Future[None]] = deque()
+        while segmentations:
+            file_chunk, local_segmentation = segmentations.popleft()
+            stitched_chunk, previous_chunk_flight_info_dataframe, next_flight_id = stitch_chunk(
+                local_segmentation.result(),
+                checkpoint.flight_info,
+                checkpoint.next_flight_id,
+                config,
+            )
+            checkpoint = checkpoint.after_chunk(
+                file_chunk, previous_chunk_flight_info_dataframe, next_flight_id
+            )
+            writes.append(
+                write_executor.submit(
+                    write_and_checkpoint_chunk,
+                    stitched_chunk,
+                    checkpoint,
+                    output_dir,
+                    compact_icao=compact_icao,
+                    compact_days=compact_days,
+                    compression=compression,
+                )
+            )
+            # at most `workers` writes are pending, as each holds the chunk's continuing aircraft
+            while writes and (writes[0].done() or len(writes) > workers):
+                writes.popleft().result()
+            next_chunk = next(chunks_to_segment, None)
+            if next_chunk is not None:
+                chunk_index, next_file_chunk = next_chunk
+                segmentations.append(
+                    (
+                        next_file_chunk,
+                        segmentation_executor.submit(segment, next_file_chunk, chunk_index),
+                    )
                 )
-                day_df = pl.concat([existing_day_df, day_df], how="vertical")  # noqa: PLW2901
-            day_df.write_parquet(day_file, compression=compression)
+        for write in writes:
+            write.result()
 
+    if compact_days:
+        compact_closed_days(output_dir, compression, all_days_closed=True)
     elapsed = default_timer() - overall_start
     logger.info(
         "Flight identification complete in %dm %.1fs",
@@ -502,10 +1392,12 @@ if __name__ == "__main__":
         datefmt="%H:%M:%S",
     )
 
-    input_files = sorted(FLIGHT_DATAFRAME_DIR.glob("*.parquet"))
+    if READ_RAW_CSV_FILES:
+        input_files = sorted(RAW_ADS_B_DIR.rglob(f"*{RAW_OBJECT_SUFFIX}"))
+    else:
+        input_files = sorted(FLIGHT_DATAFRAME_DIR.glob("*.parquet"))
     output_dir = FLIGHTS_WITH_IDS_DIR
 
-    first_input_file = [input_files[0]]  # For testing, only process first file
     # Run flight identification
     identify_uk_flights(
         input_files=input_files,
@@ -2,23 +2,39 @@
 
 from __future__ import annotations
 
+import argparse
 import logging
+import multiprocessing
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import polars as pl
 
+from aia_model_contrail_avoidance.compact_schema import apply_schema_profile
+from aia_model_contrail_avoidance.config import SchemaProfile
 from aia_model_contrail_avoidance.core_model.airspace import (
     ENVIRONMENTAL_BOUNDS_UK_AIRSPACE,
     find_uk_airspace_of_flight_segment,
 )
 from aia_model_contrail_avoidance.core_model.environment import (
-    calculate_total_energy_forcing,
-    create_grid_environment,
+    calculate_energy_forcing_per_flight,
     run_flight_data_through_environment,
 )
+from aia_model_contrail_avoidance.core_model.environment_cache import ENVIRONMENT_CACHE
+from aia_model_contrail_avoidance.core_model.environment_store import (
+    ENERGY_FORCING_DATA_DIRECTORY,
+    convert_grid_environment_to_memory_map,
+    environment_file_path,
+    is_memory_mapped_environment_current,
+)
+from aia_model_contrail_avoidance.daily_partitions import daily_flight_data_sources
 from aia_model_contrail_avoidance.flight_data_processing import TemporalFlightSubset
 
+if TYPE_CHECKING:
+    from aia_model_contrail_avoidance.core_model.grid_lookup import GridLookup
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -32,6 +48,9 @@ def add_energy_forcing_to_flight_info_database(
 ) -> None:
     """Add energy forcing information to the flight information database.
 
+    The energy forcing summaries of every flight are computed in one group_by, see
+    `calculate_energy_forcing_per_flight`, and joined onto the saved flight information.
+
     Args:
         flight_dataframe_with_ef: Polars DataFrame containing flight data with energy forcing
             information.
@@ -39,48 +58,37 @@ def add_energy_forcing_to_flight_info_database(
         save_flights_info_with_ef_dir: Directory to save the flight information with energy forcing
             as a parquet file.
     """
-    # Calculate total energy forcing for each unique flight
-    unique_flight_ids = flight_dataframe_with_ef["flight_id"].unique().to_list()
-    total_ef_list = calculate_total_energy_forcing(unique_flight_ids, flight_dataframe_with_ef)
-
-    # Create a summary dataframe with flight information and total energy forcing
-    energy_forcing_per_flight = pl.DataFrame(
-        {"flight_id": unique_flight_ids, "total_energy_forcing": total_ef_list}
+    energy_forcing_per_flight = calculate_energy_forcing_per_flight(flight_dataframe_with_ef)
+    flight_info_with_ef = pl.read_parquet(flight_info_file_path).join(
+        energy_forcing_per_flight, on="flight_id", how="inner", maintain_order="left"
     )
-    # Load the existing flight information database (assuming it's a parquet file)
-    flight_info_df = pl.read_parquet(flight_info_file_path)
-    # Join the two dataframes on flight_id
-    joined_df = flight_info_df.join(energy_forcing_per_flight, on="flight_id", how="inner")
-    # Save the joined dataframe to a new parquet file
-    joined_df.write_parquet(file=save_flights_info_with_ef_dir, mkdir=True)
+    flight_info_with_ef.write_parquet(file=save_flights_info_with_ef_dir, mkdir=True)
     logger.info("flight info saved to path: %s", save_flights_info_with_ef_dir)
 
 
-def calculate_energy_forcing_for_flights(
+def calculate_energy_forcing_for_flights(  # noqa: PLR0913
     flight_dataframe_path: str,
     flight_info_file_path: str,
-    enviornment_filename: str,
+    environment: GridLookup,
     parquet_file_with_ef: str,
     save_flights_info_with_ef_dir: str,
+    schema_profile: SchemaProfile = SchemaProfile.STANDARD,
 ) -> None:
     """Calculate energy forcing for flight data using the UK ADS-B January environment.
 
     Args:
         flight_dataframe_path: Path to the flight data parquet file.
+        flight_info_file_path: Path to the existing flight information parquet file.
         parquet_file_with_ef: Path to save the flight timestamps with energy forcing as a parquet
             file.
-        enviornment_filename: Filename of the saved CocipGrid environment dataset to use for energy
-            forcing calculation.
-        flight_info_file_path: Path to the existing flight information parquet file.
+        environment: Loaded CocipGrid environment to use for energy forcing calculation.
         save_flights_info_with_ef_dir: Directory to save the flight information with energy forcing
             as a parquet file.
+        schema_profile: Numeric dtypes of the saved flight data with energy forcing.
     """
     # Load the processed flight data from parquet file
     flight_dataframe = pl.read_parquet(flight_dataframe_path)
 
-    logger.info("Loading environment data")
-    environment = create_grid_environment(enviornment_filename)
-
     if BOOL_REMOVE_DATAPOINTS_OUTSIDE_UK_ENVIRONMENT:
         # Remove datapoints that are outside the environment (latitude and longitude bounds)
         flight_dataframe = flight_dataframe.filter(
@@ -93,6 +101,12 @@ def calculate_energy_forcing_for_flights(
     flight_data_with_ef = run_flight_data_through_environment(flight_dataframe, environment)
     logger.info("Processed %s data points", len(flight_data_with_ef))
 
+    # Add energy forcing to the flight information database, before the dtypes are narrowed
+    add_energy_forcing_to_flight_info_database(
+        flight_data_with_ef, flight_info_file_path, save_flights_info_with_ef_dir
+    )
+    flight_data_with_ef = apply_schema_profile(flight_data_with_ef, schema_profile)
+
     # adding airspace information to dataframe
     flight_data_with_ef = find_uk_airspace_of_flight_segment(flight_data_with_ef)
     logger.info("Added airspace information to flight data.")
@@ -101,9 +115,43 @@ def calculate_energy_forcing_for_flights(
     flight_data_with_ef.write_parquet(file=parquet_file_with_ef, mkdir=True)
     logger.info("Flight data saved to path: %s", parquet_file_with_ef)
 
-    # Add energy forcing information to the flight information database
-    add_energy_forcing_to_flight_info_database(
-        flight_data_with_ef, flight_info_file_path, save_flights_info_with_ef_dir
+
+def _check_workers(workers: int) -> None:
+    """Raise a ValueError if the number of worker processes is less than one."""
+    if workers < 1:
+        msg = f"workers must be at least 1, got {workers}"
+        raise ValueError(msg)
+
+
+def number_of_workers(value: str) -> int:
+    """Parse the number of worker processes of the command line, which must be at least one."""
+    try:
+        workers = int(value)
+        _check_workers(workers)
+    except ValueError as error:
+        msg = f"invalid number of workers: {value!r}, must be an integer of at least 1"
+        raise argparse.ArgumentTypeError(msg) from error
+    return workers
+
+
+def _initialise_worker(enviornment_filename: str) -> None:
+    """Memory-map the environment store into the environment cache of a worker process.
+
+    All workers memory-map the same store, so they share the same physical pages.
+    """
+    # progress is reported in day order by the parent process, workers only log warnings
+    logging.getLogger().setLevel(logging.WARNING)
+    ENVIRONMENT_CACHE.get(enviornment_filename, memory_mapped=True)
+
+
+def _calculate_energy_forcing_for_day_in_worker(
+    day_arguments: dict[str, str], enviornment_filename: str, schema_profile: SchemaProfile
+) -> None:
+    """Calculate energy forcing for one day in a worker process."""
+    calculate_energy_forcing_for_flights(
+        environment=ENVIRONMENT_CACHE.get(enviornment_filename, memory_mapped=True),
+        schema_profile=schema_profile,
+        **day_arguments,
     )
 
 
@@ -114,51 +162,91 @@ def calculate_energy_forcing_from_filepath(  # noqa: PLR0913
     save_flights_info_with_ef_dir: Path,
     temporal_flight_subset: TemporalFlightSubset,
     enviornment_filename: str,
+    *,
+    workers: int = 1,
+    schema_profile: SchemaProfile = SchemaProfile.STANDARD,
 ) -> None:
     """Calculate energy forcing for processed ADS-B flight data.
 
+    With more than one worker the days are processed in a pool of processes, which memory-map the
+    environment store (converted again whenever the NetCDF file has changed) instead of each
+    receiving a copy. One worker always reads the NetCDF file, whether or not a store exists.
+    Days are reported in order once they finish, and failed days are reported together at the end.
+
     Args:
-        processed_flights_with_ids_dir: Directory containing processed parquet files with flight data.
-        processed_flights_info_dir: Directory containing processed parquet files with flight information.
+        processed_flights_with_ids_dir: Directory containing processed parquet files with flight data,
+            or day partitions of part files.
+        processed_flights_info_dir: Directory containing processed parquet files with flight
+            information, days without a flight information file are skipped.
         save_flights_with_ef_dir: Directory to save flights with energy forcing data.
         save_flights_info_with_ef_dir: Directory to save flight information with energy forcing.
         temporal_flight_subset: TemporalFlightSubset, the temporal subset of flights to process.
         enviornment_filename: Filename of the saved CocipGrid environment dataset to use for energy
             forcing calculations.
+        workers: Number of worker processes, days are processed sequentially for one worker.
+        schema_profile: Numeric dtypes of the saved flight data with energy forcing.
+
+    Raises:
+        ValueError: If workers is less than one.
     """
+    _check_workers(workers)
     start = time.time()
 
     first_day = temporal_flight_subset.value[4]
     final_day = temporal_flight_subset.value[5]
 
-    processed_paraquet_files = sorted(processed_flights_with_ids_dir.glob("*.parquet"))
-    logger.info("Found %s files to process.", len(processed_paraquet_files))
-    if len(processed_paraquet_files) < final_day:
+    processed_flight_data_sources = list(
+        daily_flight_data_sources(processed_flights_with_ids_dir).items()
+    )
+    logger.info("Found %s files to process.", len(processed_flight_data_sources))
+    if len(processed_flight_data_sources) < final_day:
         logger.info(
             "Generating Statistics from files %s to %s.",
             first_day,
-            len(processed_paraquet_files),
+            len(processed_flight_data_sources),
         )
     else:
         logger.info("Generating Statistics from files %s to %s.", first_day, final_day)
-    for file_path in processed_paraquet_files[first_day - 1 : final_day]:
-        output_file_name = str(file_path.stem + "_with_ef")
-        logger.info("Processing file: %s", output_file_name)
+
+    days_arguments = []
+    for file_stem, file_path in processed_flight_data_sources[first_day - 1 : final_day]:
+        output_file_name = str(file_stem + "_with_ef")
         # Find the matching info file with the same stem (day number)
-        info_file_path = processed_flights_info_dir / f"{file_path.stem}_flight_info.parquet"
+        info_file_path = processed_flights_info_dir / f"{file_stem}_flight_info.parquet"
         if not info_file_path.exists():
-            logger.warning("No matching info file found for %s, skipping.", file_path.name)
+            logger.warning("No matching info file found for %s, skipping.", file_stem)
             continue
         info_output_file_name = str(info_file_path.stem + "_with_ef")
-        logger.info("Processing info file: %s", info_output_file_name)
-        calculate_energy_forcing_for_flights(
-            flight_dataframe_path=str(file_path),
-            flight_info_file_path=str(info_file_path),
-            parquet_file_with_ef=str(save_flights_with_ef_dir / f"{output_file_name}.parquet"),
-            save_flights_info_with_ef_dir=str(
-                save_flights_info_with_ef_dir / f"{info_output_file_name}.parquet"
-            ),
-            enviornment_filename=enviornment_filename,
+        days_arguments.append(
+            {
+                "flight_dataframe_path": str(file_path),
+                "flight_info_file_path": str(info_file_path),
+                "parquet_file_with_ef": str(
+                    save_flights_with_ef_dir / f"{output_file_name}.parquet"
+                ),
+                "save_flights_info_with_ef_dir": str(
+                    save_flights_info_with_ef_dir / f"{info_output_file_name}.parquet"
+                ),
+            }
+        )
+
+    if workers == 1:
+        # the environment is loaded once per process and reused for every daily file and run
+        for day_arguments in days_arguments:
+            logger.info("Processing file: %s", Path(day_arguments["flight_dataframe_path"]).name)
+            calculate_energy_forcing_for_flights(
+                environment=ENVIRONMENT_CACHE.get(enviornment_filename),
+                schema_profile=schema_profile,
+                **day_arguments,
+            )
+        logger.info(
+            "Environment cache: %d hits, %d misses.",
+            ENVIRONMENT_CACHE.hits,
+            ENVIRONMENT_CACHE.misses,
+        )
+    else:
+        calculate_energy_forcing_for_days_in_parallel(
+            days_arguments, enviornment_filename, workers, schema_profile
         )
 
     end = time.time()
@@ -166,6 +254,67 @@ def calculate_energy_forcing_from_filepath(  # noqa: PLR0913
     logger.info("Energy forcing calculation completed in %.1f minutes.", round(length / 60, 1))
 
 
+def calculate_energy_forcing_for_days_in_parallel(
+    days_arguments: list[dict[str, str]],
+    enviornment_filename: str,
+    workers: int,
+    schema_profile: SchemaProfile = SchemaProfile.STANDARD,
+) -> None:
+    """Calculate energy forcing for each day in a pool of worker processes.
+
+    Args:
+        days_arguments: Keyword arguments of `calculate_energy_forcing_for_flights` for each day,
+            except the environment.
+        enviornment_filename: Filename of the saved CocipGrid environment dataset.
+        workers: Number of worker processes.
+        schema_profile: Numeric dtypes of the saved flight data with energy forcing.
+
+    Raises:
+        ValueError: If workers is less than one.
+        RuntimeError: If any day failed, after every day has been attempted.
+    """
+    _check_workers(workers)
+    store_directory = ENERGY_FORCING_DATA_DIRECTORY / enviornment_filename
+    if not is_memory_mapped_environment_current(
+        store_directory, environment_file_path(enviornment_filename)
+    ):
+        logger.info("Converting environment to a memory-mapped store at %s", store_directory)
+        convert_grid_environment_to_memory_map(enviornment_filename, store_directory)
+
+    logger.info("Processing %d files with %d workers.", len(days_arguments), workers)
+    failed_files = []
+    # spawn rather than fork, forking a process that has used polars can deadlock
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_initialise_worker,
+        initargs=(enviornment_filename,),
+    ) as executor:
+        futures = [
+            executor.submit(
+                _calculate_energy_forcing_for_day_in_worker,
+                day_arguments,
+                enviornment_filename,
+                schema_profile,
+            )
+            for day_arguments in days_arguments
+        ]
+        # report in day order, whatever order the days finish in
+        for day_arguments, future in zip(days_arguments, futures, strict=True):
+            file_name = Path(day_arguments["flight_dataframe_path"]).name
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Failed to process file: %s", file_name)
+                failed_files.append(file_name)
+            else:
+                logger.info("Processed file: %s", file_name)
+
+    if failed_files:
+        msg = f"Energy forcing calculation failed for {len(failed_files)} files: {failed_files}"
+        raise RuntimeError(msg)
+
+
 if __name__ == "__main__":
     ADS_B_ANALYSIS_DIR = Path("~/ads_b_analysis").expanduser()
     PROCESSED_FLIGHTS_WITH_IDS_DIR = ADS_B_ANALYSIS_DIR / "ads_b_processed_flights"
@@ -178,6 +327,22 @@ if __name__ == "__main__":
     if not SAVE_FLIGHTS_INFO_WITH_EF_DIR.exists():
         SAVE_FLIGHTS_INFO_WITH_EF_DIR.mkdir(parents=True, exist_ok=True)
 
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--workers",
+        type=number_of_workers,
+        default=1,
+        help="Number of worker processes, one per day at a time.",
+    )
+    parser.add_argument(
+        "--schema-profile",
+        type=SchemaProfile,
+        choices=list(SchemaProfile),
+        default=SchemaProfile.STANDARD,
+        help="Numeric dtypes of the saved flight data with energy forcing.",
+    )
+    args = parser.parse_args()
+
     calculate_energy_forcing_from_filepath(
         PROCESSED_FLIGHTS_WITH_IDS_DIR,
         PROCESSED_FLIGHTS_INFO_DIR,
@@ -185,4 +350,6 @@ if __name__ == "__main__":
         SAVE_FLIGHTS_INFO_WITH_EF_DIR,
         temporal_flight_subset=TemporalFlightSubset.JANUARY,
         enviornment_filename="cocip_grid_global_week_1_2024",
+        workers=args.workers,
+        schema_profile=args.schema_profile,
     )
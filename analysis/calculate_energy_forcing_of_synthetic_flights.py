@@ -11,6 +11,7 @@ from aia_model_contrail_avoidance.core_model.environment import (
     create_grid_environment,
     run_flight_data_through_environment,
 )
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridLookup
 from aia_model_contrail_avoidance.testing import (
     create_flight_info_list_with_time_offset,
     generate_synthetic_flight_database,
@@ -54,7 +55,10 @@ if __name__ == "__main__":
         flight_info_list_flight_level_250, "test_flights_database"
     )
 
-    environment = create_grid_environment("cocip_grid_global_week_1_fine_pha_2024")
+    # built once, so the grid is copied once for the three flight levels
+    environment = GridLookup.from_data_array(
+        create_grid_environment("cocip_grid_global_week_1_fine_pha_2024")
+    )
 
     flight_data_with_ef_300 = run_flight_data_through_environment(
         flight_dataframe_flight_level_300, environment
@@ -10,6 +10,7 @@ from pathlib import Path
 import numpy as np
 import polars as pl
 
+from aia_model_contrail_avoidance.compact_schema import widen_compact_numeric_columns
 from aia_model_contrail_avoidance.core_model.airports import list_of_uk_airports
 from aia_model_contrail_avoidance.core_model.climate import (
     calculate_co2_mass_burned_from_flight_distance,
@@ -523,8 +524,11 @@ def generate_energy_forcing_statistics_from_filepath(
     else:
         logger.info("Generating Statistics from files %s to %s.", first_day, final_day)
     for parquet_file in energy_forcing_paraquet_files[first_day - 1 : final_day]:
-        # read and append all dataframes together
-        daily_dataframe = pl.read_parquet(parquet_file)
+        # read and append all dataframes together, the summed columns are widened to Float64
+        # when the files were saved with the compact schema profile
+        daily_dataframe = widen_compact_numeric_columns(
+            pl.read_parquet(parquet_file), ["distance_flown_in_segment", "ef"]
+        )
         if complete_flight_dataframe.is_empty():
             complete_flight_dataframe = daily_dataframe
         else:
@@ -6,6 +6,8 @@ import logging
 import time
 from pathlib import Path
 
+from aia_model_contrail_avoidance.config import SchemaProfile
+from aia_model_contrail_avoidance.daily_partitions import daily_flight_data_sources
 from aia_model_contrail_avoidance.flight_data_processing import (
     FlightDepartureAndArrivalSubset,
     TemporalFlightSubset,
@@ -17,12 +19,16 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(mes
 logger = logging.getLogger(__name__)
 
 
-def process_ads_b_flight_data_from_filepath(
+def process_ads_b_flight_data_from_filepath(  # noqa: PLR0913
     temporal_flight_subset: TemporalFlightSubset,
     flight_departure_and_arrival_subset: FlightDepartureAndArrivalSubset,
     flights_with_ids_dir: Path,
     processed_flights_with_ids_dir: Path,
     processed_flights_info_dir: Path,
+    *,
+    streaming: bool = False,
+    compact_icao: bool = False,
+    schema_profile: SchemaProfile = SchemaProfile.STANDARD,
 ) -> None:
     """Run the processing of ADS-B flight data.
 
@@ -30,12 +36,16 @@ def process_ads_b_flight_data_from_filepath(
         temporal_flight_subset: TemporalFlightSubset, the temporal subset of flights to process.
         flight_departure_and_arrival_subset: FlightDepartureAndArrivalSubset,
         the subset of flights based on departure and arrival criteria.
-        flights_with_ids_dir: Path, directory containing unprocessed parquet files.
+        flights_with_ids_dir: Path, directory containing unprocessed parquet files, or day
+        partitions of part files written by `identify_uk_flights`.
         processed_flights_with_ids_dir: Path, directory to save processed flights with IDs.
         processed_flights_info_dir: Path, directory to save processed flights info.
+        streaming: bool, if True process each file as one lazy query with the streaming engine.
+        compact_icao: bool, if True save the ICAO address and airports in the compact encoding.
+        schema_profile: SchemaProfile, the numeric dtypes of the saved flight data.
     """
     start = time.time()
-    unprocessed_paraquet_files = sorted(flights_with_ids_dir.glob("*.parquet"))
+    unprocessed_flight_data_sources = daily_flight_data_sources(flights_with_ids_dir)
 
     logger.info("Processing with Temporal Subset: %s", temporal_flight_subset.name)
     logger.info("Available Temporal Subsets: %s", list(TemporalFlightSubset.__members__.keys()))
@@ -47,10 +57,9 @@ def process_ads_b_flight_data_from_filepath(
         "Available Flight Departure and Arrival Subsets: %s",
         list(FlightDepartureAndArrivalSubset.__members__.keys()),
     )
-    for input_file in unprocessed_paraquet_files:
-        logger.info("Processing file: %s", input_file.name)
-        parquet_file_path = str(input_file)
-        save_filename = input_file.stem
+    for save_filename, input_source in unprocessed_flight_data_sources.items():
+        logger.info("Processing file: %s", save_filename)
+        parquet_file_path = str(input_source)
         full_save_path = processed_flights_with_ids_dir / f"{save_filename}.parquet"
         info_save_path = processed_flights_info_dir / f"{save_filename}.parquet"
 
@@ -60,6 +69,9 @@ def process_ads_b_flight_data_from_filepath(
             str(info_save_path),
             flight_departure_and_arrival_subset,
             temporal_flight_subset,
+            streaming=streaming,
+            compact_icao=compact_icao,
+            schema_profile=schema_profile,
         )
     end = time.time()
     length = end - start
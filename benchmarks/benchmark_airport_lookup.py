@@ -0,0 +1,72 @@
+"""Benchmark per-call latency of airport lookups from the parquet file and the registry."""  # noqa: INP001
+
+from __future__ import annotations
+
+import logging
+from timeit import timeit
+
+import polars as pl
+
+from aia_model_contrail_avoidance.core_model.airports import (
+    AIRPORT_DATA_PATH,
+    airport_icao_code_to_location,
+    airport_name_from_icao_code,
+    get_airport_registry,
+    list_of_uk_airports,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+NUMBER_OF_CALLS = 200
+
+
+def location_from_parquet(airport_icao_code: str) -> tuple[float, float]:
+    """Look up an airport location by reading the parquet file, as before the registry."""
+    airport_data = pl.read_parquet(AIRPORT_DATA_PATH)
+    airport_info = airport_data.filter(pl.col("icao") == airport_icao_code).select(["lat", "lon"])
+    return (float(airport_info["lat"][0]), float(airport_info["lon"][0]))
+
+
+def name_from_parquet(airport_icao_code: str) -> str:
+    """Look up an airport name by reading the parquet file, as before the registry."""
+    airport_data = pl.read_parquet(AIRPORT_DATA_PATH)
+    return str(airport_data.filter(pl.col("icao") == airport_icao_code)["name"][0])
+
+
+def uk_airports_from_parquet() -> list[str]:
+    """List the UK airports by reading the parquet file, as before the registry."""
+    airport_data = pl.read_parquet(AIRPORT_DATA_PATH)
+    return airport_data.filter(pl.col("iso_country") == "GB")["icao"].to_list()
+
+
+def log_latency(name: str, before: float, after: float) -> None:
+    """Log the per-call latency before and after the registry."""
+    logger.info(
+        "%s: %.3f ms per call before, %.4f ms after (%.0fx)",
+        name,
+        1e3 * before / NUMBER_OF_CALLS,
+        1e3 * after / NUMBER_OF_CALLS,
+        before / after,
+    )
+
+
+if __name__ == "__main__":
+    # the first call loads the registry, later calls reuse it
+    logger.info("Registry load: %.3f ms", 1e3 * timeit(get_airport_registry, number=1))
+
+    log_latency(
+        "airport_icao_code_to_location",
+        timeit(lambda: location_from_parquet("EGLL"), number=NUMBER_OF_CALLS),
+        timeit(lambda: airport_icao_code_to_location("EGLL"), number=NUMBER_OF_CALLS),
+    )
+    log_latency(
+        "airport_name_from_icao_code",
+        timeit(lambda: name_from_parquet("EGLL"), number=NUMBER_OF_CALLS),
+        timeit(lambda: airport_name_from_icao_code("EGLL"), number=NUMBER_OF_CALLS),
+    )
+    log_latency(
+        "list_of_uk_airports",
+        timeit(uk_airports_from_parquet, number=NUMBER_OF_CALLS),
+        timeit(list_of_uk_airports, number=NUMBER_OF_CALLS),
+    )
@@ -0,0 +1,91 @@
+"""Benchmark the vectorized and rasterized airspace classification against the per-point loop."""  # noqa: INP001
+
+from __future__ import annotations
+
+import logging
+from timeit import default_timer
+
+import numpy as np
+import shapely
+
+from aia_model_contrail_avoidance.core_model.airspace import (
+    DEFAULT_AIRSPACE_RASTER_RESOLUTION,
+    ENVIRONMENTAL_BOUNDS_UK_AIRSPACE,
+    classify_airspace_of_points,
+    get_gb_airspaces,
+    load_or_build_airspace_raster,
+    name_of_airspace_of_point,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+NUMBERS_OF_POINTS = (1_000_000, 10_000_000)
+# The per-point loop is only timed on a subset and scaled up
+NUMBER_OF_POINTS_FOR_PER_POINT_LOOP = 100_000
+
+
+def generate_points(number_of_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """Generate random points over the UK environment bounds."""
+    rng = np.random.default_rng(0)
+    longitudes = rng.uniform(
+        ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lon_min"],
+        ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lon_max"],
+        number_of_points,
+    )
+    latitudes = rng.uniform(
+        ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lat_min"],
+        ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lat_max"],
+        number_of_points,
+    )
+    return longitudes, latitudes
+
+
+if __name__ == "__main__":
+    airspaces = get_gb_airspaces()
+
+    longitudes, latitudes = generate_points(NUMBER_OF_POINTS_FOR_PER_POINT_LOOP)
+    start = default_timer()
+    per_point_names = name_of_airspace_of_point(
+        shapely.points(longitudes, latitudes),  # type: ignore[arg-type]
+        airspaces,
+    )
+    per_point_time = default_timer() - start
+    logger.info(
+        "Per-point loop: %d points in %.3f s", NUMBER_OF_POINTS_FOR_PER_POINT_LOOP, per_point_time
+    )
+    if classify_airspace_of_points(longitudes, latitudes, airspaces).to_list() != per_point_names:
+        msg = "Vectorized airspace classification does not match the per-point loop."
+        raise ValueError(msg)
+
+    start = default_timer()
+    raster = load_or_build_airspace_raster(airspaces, DEFAULT_AIRSPACE_RASTER_RESOLUTION)
+    logger.info("Loaded airspace raster in %.3f s", default_timer() - start)
+
+    for number_of_points in NUMBERS_OF_POINTS:
+        longitudes, latitudes = generate_points(number_of_points)
+        start = default_timer()
+        vectorized_airspace = classify_airspace_of_points(longitudes, latitudes, airspaces)
+        vectorized_time = default_timer() - start
+        logger.info(
+            "Vectorized: %d points in %.3f s, %.0fx the estimated per-point loop throughput",
+            number_of_points,
+            vectorized_time,
+            per_point_time
+            * number_of_points
+            / NUMBER_OF_POINTS_FOR_PER_POINT_LOOP
+            / vectorized_time,
+        )
+
+        start = default_timer()
+        raster_airspace = raster.classify(longitudes, latitudes)
+        raster_time = default_timer() - start
+        logger.info(
+            "Raster: %d points in %.3f s, %.1fx the vectorized throughput",
+            number_of_points,
+            raster_time,
+            vectorized_time / raster_time,
+        )
+        if not raster_airspace.cast(str).equals(vectorized_airspace.cast(str)):
+            msg = "Raster airspace classification does not match the polygon tests."
+            raise ValueError(msg)
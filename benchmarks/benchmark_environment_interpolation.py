@@ -0,0 +1,74 @@
+"""Benchmark nearest and linear sampling of the environment, comparing speed and EF totals."""  # noqa: INP001
+
+from __future__ import annotations
+
+import logging
+from timeit import default_timer
+
+import numpy as np
+import polars as pl
+
+from aia_model_contrail_avoidance.core_model.environment import (
+    EnvironmentInterpolation,
+    calculate_energy_forcing_per_flight,
+    run_flight_data_through_environment,
+)
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridLookup
+from aia_model_contrail_avoidance.flight_data_processing import add_distance_flown_in_segment
+from aia_model_contrail_avoidance.testing import (
+    create_synthetic_grid_environment,
+    generate_synthetic_ads_b_dataframe,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# A synthetic day of 10^6 datapoints
+NUMBER_OF_FLIGHTS = 5000
+DATAPOINTS_PER_FLIGHT = 200
+
+
+def generate_flight_dataframe() -> pl.DataFrame:
+    """Generate a synthetic day of flights cruising between 250 and 350 hPa."""
+    flight_dataframe = generate_synthetic_ads_b_dataframe(NUMBER_OF_FLIGHTS, DATAPOINTS_PER_FLIGHT)
+    cruise_flight_level = np.random.default_rng(0).uniform(270.0, 340.0, NUMBER_OF_FLIGHTS)
+    flight_dataframe = flight_dataframe.with_columns(
+        pl.Series("flight_level", cruise_flight_level[flight_dataframe["flight_id"].to_numpy()])
+    ).drop("altitude_baro")
+    return add_distance_flown_in_segment(flight_dataframe).fill_nan(0.0)
+
+
+def run_environment(
+    flight_dataframe: pl.DataFrame, lookup: GridLookup, interpolation: EnvironmentInterpolation
+) -> pl.DataFrame:
+    """Run the flights through the environment and log the wall time and EF total."""
+    start = default_timer()
+    flight_dataframe_with_ef = run_flight_data_through_environment(
+        flight_dataframe, lookup, interpolation
+    )
+    logger.info(
+        "%s: %d points in %.3f s, total EF %.6e",
+        interpolation.value,
+        len(flight_dataframe),
+        default_timer() - start,
+        flight_dataframe_with_ef["ef"].sum(),
+    )
+    return calculate_energy_forcing_per_flight(flight_dataframe_with_ef)
+
+
+if __name__ == "__main__":
+    flight_dataframe = generate_flight_dataframe()
+    lookup = GridLookup.from_data_array(create_synthetic_grid_environment())
+
+    nearest = run_environment(flight_dataframe, lookup, EnvironmentInterpolation.NEAREST)
+    linear = run_environment(flight_dataframe, lookup, EnvironmentInterpolation.LINEAR)
+
+    per_flight = nearest.join(linear, on="flight_id", suffix="_linear")
+    logger.info(
+        "Mean absolute per-flight EF difference: %.1f%% of the mean absolute per-flight EF",
+        100.0
+        * (per_flight["total_energy_forcing_linear"] - per_flight["total_energy_forcing"])
+        .abs()
+        .mean()
+        / per_flight["total_energy_forcing"].abs().mean(),
+    )
@@ -0,0 +1,245 @@
+"""Benchmark wall time and peak memory of flight segmentation with one sort and repeated sorts.
+
+The single sort path is also timed with the full segmentation rules, against the hard gap rule
+only that the repeated sorts path applies.
+
+Run from the repository root with `python -m benchmarks.benchmark_flight_segmentation`, so the
+flight ID script can be imported. Each path runs in its own process, as the peak resident memory
+of a process only grows.
+"""  # noqa: INP001
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from timeit import default_timer
+from typing import TYPE_CHECKING
+
+import polars as pl
+
+from ads_b_data_pre_processing.add_flight_id_in_polars import (
+    FlightSegmentationConfig,
+    add_unique_flight_identifier,
+    assign_flight_id_to_unique_flights,
+    first_timestamps_of_next_flights,
+    latest_previous_flights,
+)
+from aia_model_contrail_avoidance.testing import generate_synthetic_ads_b_dataframe
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# A synthetic day of 5 * 10^7 datapoints, generated in parts of 5 * 10^6 datapoints
+NUMBER_OF_PARTS = 10
+NUMBER_OF_FLIGHTS_PER_PART = 25000
+DATAPOINTS_PER_FLIGHT = 200
+# Aircraft fly several flights a day, so flights are told apart by their airports
+NUMBER_OF_AIRCRAFT = 50000
+
+
+def assign_flight_id_with_repeated_sorts(
+    flight_dataframe: pl.DataFrame,
+    config: FlightSegmentationConfig,
+    previous_flight_info_dataframe: pl.DataFrame | None = None,
+) -> pl.DataFrame:
+    """Segment flights with a sort before each step, as before the single-sort pipeline."""
+    sort_columns = ["icao_address", "timestamp"]
+    filled_airports = [
+        pl.col(column).fill_null(strategy="forward").fill_null(strategy="backward")
+        for column in ("departure_airport_icao", "arrival_airport_icao")
+    ]
+    flight_dataframe_with_unique_flight_identifier = add_unique_flight_identifier(
+        flight_dataframe.lazy()
+        .sort(sort_columns, maintain_order=True)
+        .filter(
+            pl.col("departure_airport_icao").is_not_null().over("icao_address")
+            & pl.col("arrival_airport_icao").is_not_null().over("icao_address")
+        )
+        .with_columns(expression.over("icao_address") for expression in filled_airports)
+    )
+
+    continued_flights_dataframe = None
+    next_flight_id = 0
+    new_flights_dataframe = flight_dataframe_with_unique_flight_identifier
+    if previous_flight_info_dataframe is not None and not previous_flight_info_dataframe.is_empty():
+        next_flight_id = previous_flight_info_dataframe.select(pl.col("flight_id").max()).item() + 1
+        continued_flights_info_dataframe = (
+            first_timestamps_of_next_flights(flight_dataframe_with_unique_flight_identifier)
+            .join(
+                latest_previous_flights(previous_flight_info_dataframe.lazy()),
+                on=["icao_address", "unique_flight_identifier"],
+                how="inner",
+            )
+            .select(
+                "icao_address",
+                "unique_flight_identifier",
+                pl.col("first_timestamp").alias("timestamp"),
+                "flight_id",
+            )
+        )
+        flight_dataframe_with_previous_flight_id = (
+            flight_dataframe_with_unique_flight_identifier.join(
+                continued_flights_info_dataframe,
+                on=["icao_address", "unique_flight_identifier", "timestamp"],
+                how="left",
+                maintain_order="left",
+            ).with_columns(pl.col("flight_id").fill_null(strategy="forward").over("icao_address"))
+        )
+        continued_flights_dataframe = flight_dataframe_with_previous_flight_id.filter(
+            pl.col("flight_id").is_not_null()
+        ).drop("unique_flight_identifier")
+        new_flights_dataframe = flight_dataframe_with_previous_flight_id.filter(
+            pl.col("flight_id").is_null()
+        ).drop("flight_id")
+
+    new_flights_dataframe = (
+        new_flights_dataframe.sort(sort_columns, maintain_order=True)
+        .with_columns(
+            pl.struct(["icao_address", "unique_flight_identifier"])
+            .rle_id()
+            .alias("first_flight_id")
+        )
+        .sort(sort_columns, maintain_order=True)
+        .filter(pl.len().over("first_flight_id") > 3)  # noqa: PLR2004
+        .with_columns(
+            pl.struct(["unique_flight_identifier"]).rle_id().alias("first_flight_id")
+            + next_flight_id
+        )
+        .sort(sort_columns, maintain_order=True)
+        .with_columns(
+            pl.col("timestamp")
+            .diff()
+            .gt(config.hard_gap_hours * pl.duration(hours=1))
+            .fill_null(value=False)
+            .over("first_flight_id")
+            .cum_sum()
+            .alias("time_gap_flight_increment")
+        )
+        .with_columns(
+            (
+                pl.col("first_flight_id").cast(pl.Int32)
+                + pl.col("time_gap_flight_increment").cast(pl.Int32)
+            ).alias("flight_id")
+        )
+        .drop("unique_flight_identifier", "first_flight_id", "time_gap_flight_increment")
+    )
+    if continued_flights_dataframe is not None:
+        new_flights_dataframe = pl.concat(
+            [continued_flights_dataframe, new_flights_dataframe], how="vertical"
+        )
+    return new_flights_dataframe.sort(sort_columns, maintain_order=True).collect()
+
+
+def write_day_of_ads_b_data(input_directory: Path) -> list[Path]:
+    """Write a synthetic day of ADS-B datapoints in time order, like the raw files."""
+    input_paths = []
+    for part in range(NUMBER_OF_PARTS):
+        input_path = input_directory / f"part_{part:02d}.parquet"
+        first_flight_id = part * NUMBER_OF_FLIGHTS_PER_PART
+        generate_synthetic_ads_b_dataframe(
+            NUMBER_OF_FLIGHTS_PER_PART, DATAPOINTS_PER_FLIGHT, seed=part
+        ).select(
+            pl.col("timestamp").dt.replace_time_zone("UTC"),
+            "latitude",
+            "longitude",
+            "altitude_baro",
+            # the synthetic flights are in the air throughout
+            pl.lit(value=False).alias("on_ground"),
+            # each flight keeps its heading
+            ((pl.col("flight_id") * 37) % 360).cast(pl.Float32).alias("heading"),
+            ((pl.col("flight_id") + first_flight_id) % NUMBER_OF_AIRCRAFT)
+            .cast(pl.String)
+            .str.zfill(6)
+            .alias("icao_address"),
+            "departure_airport_icao",
+            "arrival_airport_icao",
+        ).sort("timestamp").write_parquet(input_path)
+        input_paths.append(input_path)
+    return input_paths
+
+
+def peak_memory() -> int:
+    """Peak resident memory of this process in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def segment_day(
+    assign_flight_id: Callable[..., pl.DataFrame],
+    config: FlightSegmentationConfig,
+    input_paths: list[Path],
+) -> tuple[float, int, int]:
+    """Segment the day of datapoints read from the input files.
+
+    Returns:
+        Wall time of the segmentation in seconds, its peak memory above the input in bytes, and
+            the number of flights.
+    """
+    day = pl.read_parquet(input_paths)
+    memory_before = peak_memory()
+
+    start = default_timer()
+    output_dataframe = assign_flight_id(day, config)
+    elapsed = default_timer() - start
+
+    return elapsed, peak_memory() - memory_before, output_dataframe["flight_id"].n_unique()
+
+
+def run_in_new_process(
+    assign_flight_id: Callable[..., pl.DataFrame],
+    config: FlightSegmentationConfig,
+    input_paths: list[Path],
+) -> tuple[float, int, int]:
+    """Segment the day in a new process, so its peak memory is measured on its own."""
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(segment_day, assign_flight_id, config, input_paths).result()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        input_paths = write_day_of_ads_b_data(Path(temporary_directory))
+        logger.info(
+            "Segmenting %d datapoints of %d aircraft",
+            NUMBER_OF_PARTS * NUMBER_OF_FLIGHTS_PER_PART * DATAPOINTS_PER_FLIGHT,
+            NUMBER_OF_AIRCRAFT,
+        )
+        hard_gap_only = FlightSegmentationConfig(hard_gap_only=True)
+        results = {
+            "repeated sorts": run_in_new_process(
+                assign_flight_id_with_repeated_sorts, hard_gap_only, input_paths
+            ),
+            "single sort": run_in_new_process(
+                assign_flight_id_to_unique_flights, hard_gap_only, input_paths
+            ),
+            "single sort with all rules": run_in_new_process(
+                assign_flight_id_to_unique_flights, FlightSegmentationConfig(), input_paths
+            ),
+        }
+
+    for name, (elapsed, memory, number_of_flights) in results.items():
+        logger.info(
+            "%s: %.1f s, %.0f MB peak memory above the input, %d flights",
+            name,
+            elapsed,
+            memory / 1e6,
+            number_of_flights,
+        )
+    repeated_elapsed, repeated_memory, _ = results["repeated sorts"]
+    single_elapsed, single_memory, _ = results["single sort"]
+    logger.info(
+        "Single sort: %.2fx faster, %.2fx the peak memory",
+        repeated_elapsed / single_elapsed,
+        single_memory / repeated_memory,
+    )
+    logger.info(
+        "All rules: %.2fx the time of the hard gap rule only",
+        results["single sort with all rules"][0] / single_elapsed,
+    )
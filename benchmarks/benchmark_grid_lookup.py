@@ -0,0 +1,56 @@
+"""Benchmark the direct-index grid lookup against xarray nearest selection."""  # noqa: INP001
+
+from __future__ import annotations
+
+import logging
+from timeit import default_timer
+
+import numpy as np
+import xarray as xr
+
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridLookup
+from aia_model_contrail_avoidance.testing import create_synthetic_grid_environment
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+NUMBER_OF_POINTS = 10_000_000
+
+
+def generate_points(number_of_points: int) -> dict[str, np.ndarray]:
+    """Generate random points over the synthetic grid."""
+    rng = np.random.default_rng(0)
+    return {
+        "longitude": rng.uniform(-8.0, 2.0, number_of_points),
+        "latitude": rng.uniform(49.0, 61.0, number_of_points),
+        "level": rng.uniform(250.0, 350.0, number_of_points),
+        "time": np.datetime64("2024-01-01T00:00:00", "us")
+        + rng.integers(0, 23 * 3600, number_of_points).astype("timedelta64[s]"),
+    }
+
+
+if __name__ == "__main__":
+    environment = create_synthetic_grid_environment()
+    points = generate_points(NUMBER_OF_POINTS)
+
+    start = default_timer()
+    xarray_values = environment.sel(
+        {dim: xr.DataArray(values, dims=["points"]) for dim, values in points.items()},
+        method="nearest",
+    ).to_numpy()
+    xarray_time = default_timer() - start
+    logger.info("xarray nearest: %d points in %.3f s", NUMBER_OF_POINTS, xarray_time)
+
+    start = default_timer()
+    lookup = GridLookup.from_data_array(environment)
+    logger.info("Built lookup in %.3f s", default_timer() - start)
+
+    start = default_timer()
+    lookup_values = lookup.sample_nearest(points)
+    lookup_time = default_timer() - start
+    logger.info("Direct-index lookup: %d points in %.3f s", NUMBER_OF_POINTS, lookup_time)
+
+    if not np.array_equal(xarray_values, lookup_values):
+        msg = "Direct-index lookup does not match xarray nearest selection."
+        raise ValueError(msg)
+    logger.info("Speedup: %.1fx", xarray_time / lookup_time)
@@ -0,0 +1,75 @@
+"""Benchmark the vectorized and per-row interpolation of large distance flight segments."""  # noqa: INP001
+
+from __future__ import annotations
+
+import logging
+from timeit import default_timer
+
+import polars as pl
+
+from aia_model_contrail_avoidance.flight_data_processing import (
+    MAX_DISTANCE_BETWEEN_FLIGHT_TIMESTAMPS,
+    add_distance_flown_in_segment,
+    generate_interpolated_rows_of_large_distance_flights,
+)
+from aia_model_contrail_avoidance.testing import generate_synthetic_ads_b_dataframe
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# A synthetic day of 10^6 datapoints
+NUMBER_OF_FLIGHTS = 5000
+DATAPOINTS_PER_FLIGHT = 200
+# The per-row mode is quadratic in the number of long segments, so it is only timed on a subset
+NUMBER_OF_FLIGHTS_FOR_PER_ROW_MODE = 250
+
+
+def generate_flight_dataframe_with_segments(number_of_flights: int) -> pl.DataFrame:
+    """Generate a synthetic day of flights ready for interpolation."""
+    flight_dataframe = generate_synthetic_ads_b_dataframe(number_of_flights, DATAPOINTS_PER_FLIGHT)
+    flight_dataframe = flight_dataframe.with_columns(
+        (pl.col("altitude_baro") // 100.0).alias("flight_level")
+    ).drop("altitude_baro")
+    return add_distance_flown_in_segment(flight_dataframe).select(
+        [
+            "timestamp",
+            "latitude",
+            "longitude",
+            "flight_level",
+            "flight_id",
+            "icao_address",
+            "departure_airport_icao",
+            "arrival_airport_icao",
+            "distance_flown_in_segment",
+            "prev_lat",
+            "prev_lon",
+            "prev_timestamp",
+        ]
+    )
+
+
+def time_interpolation(flight_dataframe: pl.DataFrame, *, vectorized: bool) -> float:
+    """Return the wall time in seconds of one interpolation pass."""
+    start = default_timer()
+    interpolated_dataframe = generate_interpolated_rows_of_large_distance_flights(
+        flight_dataframe, MAX_DISTANCE_BETWEEN_FLIGHT_TIMESTAMPS, vectorized=vectorized
+    )
+    elapsed = default_timer() - start
+    logger.info(
+        "%s mode: %d rows in, %d rows out in %.3f s",
+        "Vectorized" if vectorized else "Per-row",
+        len(flight_dataframe),
+        len(interpolated_dataframe),
+        elapsed,
+    )
+    return elapsed
+
+
+if __name__ == "__main__":
+    full_day = generate_flight_dataframe_with_segments(NUMBER_OF_FLIGHTS)
+    subset = generate_flight_dataframe_with_segments(NUMBER_OF_FLIGHTS_FOR_PER_ROW_MODE)
+
+    time_interpolation(full_day, vectorized=True)
+    vectorized_subset_time = time_interpolation(subset, vectorized=True)
+    per_row_subset_time = time_interpolation(subset, vectorized=False)
+    logger.info("Speedup on subset: %.1fx", per_row_subset_time / vectorized_subset_time)
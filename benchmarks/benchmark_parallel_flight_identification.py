@@ -0,0 +1,97 @@
+"""Benchmark wall time of flight identification with one worker and with a pool of workers.
+
+The pool segments chunks in worker processes that each have their share of the cores, so the
+speedup grows with the number of cores and is below one on a single core, where the pool only adds
+the scratch files and the segmentation again of the aircraft that continue a flight.
+
+Run from the repository root with `python -m benchmarks.benchmark_parallel_flight_identification`,
+so the flight ID script can be imported.
+"""  # noqa: INP001
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from pathlib import Path
+from timeit import default_timer
+
+import polars as pl
+
+from ads_b_data_pre_processing.add_flight_id_in_polars import (
+    FlightSegmentationConfig,
+    identify_uk_flights,
+)
+from aia_model_contrail_avoidance.config import ADS_B_PARQUET_INPUT_SCHEMA
+from aia_model_contrail_avoidance.testing import generate_synthetic_ads_b_dataframe
+
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Days of synthetic datapoints, one input file of 5 * 10^5 datapoints per day
+NUMBER_OF_FILES = 16
+NUMBER_OF_FLIGHTS_PER_FILE = 2500
+DATAPOINTS_PER_FLIGHT = 200
+# Aircraft fly a flight every few days, so flights are continued across chunks
+NUMBER_OF_AIRCRAFT = 10000
+FILES_PER_CHUNK = 2
+# Numbers of workers to time, one worker is the sequential baseline
+WORKERS = (1, 2, 4)
+
+
+def write_ads_b_input_files(input_directory: Path) -> list[Path]:
+    """Write synthetic days of raw ADS-B datapoints in time order, like the raw files."""
+    input_paths = []
+    for day in range(NUMBER_OF_FILES):
+        input_path = input_directory / f"part_{day:03d}.parquet"
+        first_flight_id = day * NUMBER_OF_FLIGHTS_PER_FILE
+        flight_dataframe = generate_synthetic_ads_b_dataframe(
+            NUMBER_OF_FLIGHTS_PER_FILE, DATAPOINTS_PER_FLIGHT, seed=day
+        ).with_columns(
+            pl.col("timestamp") + pl.duration(days=day),
+            ((pl.col("flight_id") + first_flight_id) % NUMBER_OF_AIRCRAFT)
+            .cast(pl.String)
+            .str.zfill(6)
+            .alias("icao_address"),
+            # each flight keeps its heading, in the air throughout
+            ((pl.col("flight_id") * 37) % 360).cast(pl.Float32).alias("heading"),
+            pl.lit(value=False).alias("on_ground"),
+        )
+        flight_dataframe.sort("timestamp").select(
+            pl.col(column) if column in flight_dataframe.columns else pl.lit(None).alias(column)
+            for column in ADS_B_PARQUET_INPUT_SCHEMA
+        ).with_columns(pl.col("timestamp").dt.strftime("%Y-%m-%d %H:%M:%S%.f UTC")).cast(
+            ADS_B_PARQUET_INPUT_SCHEMA
+        ).write_parquet(input_path)
+        input_paths.append(input_path)
+    return input_paths
+
+
+if __name__ == "__main__":
+    elapsed_by_workers = {}
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        input_paths = write_ads_b_input_files(Path(temporary_directory))
+        logger.info(
+            "Identifying flights in %d datapoints on %s cores",
+            NUMBER_OF_FILES * NUMBER_OF_FLIGHTS_PER_FILE * DATAPOINTS_PER_FLIGHT,
+            os.cpu_count(),
+        )
+        for workers in WORKERS:
+            start = default_timer()
+            identify_uk_flights(
+                input_paths,
+                Path(temporary_directory) / f"workers_{workers}",
+                config=FlightSegmentationConfig(),
+                files_per_chunk=FILES_PER_CHUNK,
+                workers=workers,
+            )
+            elapsed_by_workers[workers] = default_timer() - start
+
+    for workers, elapsed in elapsed_by_workers.items():
+        logger.info(
+            "%d workers: %.1f s, %.2fx the speed of one worker",
+            workers,
+            elapsed,
+            elapsed_by_workers[1] / elapsed,
+        )
@@ -0,0 +1,185 @@
+"""Validate the compact schema profile: drift in monthly EF totals and memory and disk savings."""  # noqa: INP001
+
+from __future__ import annotations
+
+import logging
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from aia_model_contrail_avoidance.compact_schema import (
+    apply_schema_profile,
+    widen_compact_numeric_columns,
+)
+from aia_model_contrail_avoidance.config import SchemaProfile
+from aia_model_contrail_avoidance.core_model.environment import (
+    calculate_energy_forcing_per_flight,
+    run_flight_data_through_environment,
+)
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridAxis, GridLookup
+from aia_model_contrail_avoidance.flight_data_processing import (
+    FlightDepartureAndArrivalSubset,
+    TemporalFlightSubset,
+    process_ads_b_flight_data,
+)
+from aia_model_contrail_avoidance.testing import generate_synthetic_ads_b_dataframe
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# A synthetic January of 31 days with 2 * 10^5 datapoints per day
+NUMBER_OF_DAYS = 31
+NUMBER_OF_FLIGHTS_PER_DAY = 1000
+DATAPOINTS_PER_FLIGHT = 200
+# Spread of the random energy forcing per metre, grid points within one spread of zero are zero
+ENERGY_FORCING_SPREAD = 1e8
+
+
+def generate_month_environment() -> GridLookup:
+    """Generate a random hourly January environment over UK airspace on a one degree grid."""
+    times = np.arange(
+        np.datetime64("2024-01-01T00", "ns"),
+        np.datetime64("2024-02-01T00", "ns"),
+        np.timedelta64(1, "h"),
+    )
+    axes = {
+        "longitude": GridAxis(np.arange(-12.0, 7.0)),
+        "latitude": GridAxis(np.arange(44.0, 66.0)),
+        "level": GridAxis(np.array([150.0, 200.0, 250.0, 300.0, 350.0, 400.0])),
+        "time": GridAxis(times),
+    }
+    shape = tuple(len(axis) for axis in axes.values())
+    # mostly zero like a real environment, with warming and cooling regions
+    values = np.random.default_rng(0).normal(0.0, ENERGY_FORCING_SPREAD, shape)
+    values[np.abs(values) < ENERGY_FORCING_SPREAD] = 0.0
+    return GridLookup(values, axes)
+
+
+def write_month_of_ads_b_data(input_directory: Path) -> list[Path]:
+    """Write one parquet file of synthetic ADS-B data per day of January."""
+    input_paths = []
+    for day in range(NUMBER_OF_DAYS):
+        input_path = input_directory / f"UK_flights_day_{day + 1:03d}.parquet"
+        generate_synthetic_ads_b_dataframe(
+            NUMBER_OF_FLIGHTS_PER_DAY, DATAPOINTS_PER_FLIGHT, seed=day
+        ).with_columns(
+            pl.col("timestamp") + pl.duration(days=day),
+            pl.col("flight_id") + day * NUMBER_OF_FLIGHTS_PER_DAY,
+        ).write_parquet(input_path)
+        input_paths.append(input_path)
+    return input_paths
+
+
+def run_month(
+    input_paths: list[Path],
+    environment: GridLookup,
+    output_directory: Path,
+    schema_profile: SchemaProfile,
+) -> pl.DataFrame:
+    """Process each day and run it through the environment with a schema profile.
+
+    Returns:
+        The month of datapoints with energy forcing, read back from the saved daily files.
+    """
+    output_directory.mkdir()
+    for input_path in input_paths:
+        processed_path = output_directory / input_path.name
+        process_ads_b_flight_data(
+            str(input_path),
+            str(processed_path),
+            str(output_directory / f"{input_path.stem}_info.parquet"),
+            FlightDepartureAndArrivalSubset.ALL,
+            TemporalFlightSubset.JANUARY,
+            schema_profile=schema_profile,
+        )
+        flight_dataframe_with_ef = apply_schema_profile(
+            run_flight_data_through_environment(pl.read_parquet(processed_path), environment),
+            schema_profile,
+        )
+        flight_dataframe_with_ef.write_parquet(
+            output_directory / f"{input_path.stem}_with_ef.parquet"
+        )
+    # the statistics stage drops the first datapoint of each flight, which has no distance
+    return pl.read_parquet(sorted(output_directory.glob("*_with_ef.parquet"))).filter(
+        pl.col("distance_flown_in_segment").is_finite() & pl.col("ef").is_finite()
+    )
+
+
+def size_on_disk(output_directory: Path) -> int:
+    """Total size in bytes of the daily files with energy forcing."""
+    return sum(path.stat().st_size for path in output_directory.glob("*_with_ef.parquet"))
+
+
+def relative_difference(compact: float, standard: float) -> float:
+    """Relative difference of a compact value from the standard value."""
+    return abs(compact - standard) / abs(standard)
+
+
+if __name__ == "__main__":
+    environment = generate_month_environment()
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = Path(temporary_directory)
+        input_paths = write_month_of_ads_b_data(directory)
+
+        months = {}
+        disk_sizes = {}
+        for schema_profile in SchemaProfile:
+            output_directory = directory / schema_profile.value
+            months[schema_profile] = run_month(
+                input_paths, environment, output_directory, schema_profile
+            )
+            disk_sizes[schema_profile] = size_on_disk(output_directory)
+
+    standard = months[SchemaProfile.STANDARD]
+    compact = months[SchemaProfile.COMPACT]
+    logger.info("Datapoints in the month: %d (standard), %d (compact)", len(standard), len(compact))
+    logger.info("Compact dtypes: %s", dict(compact.schema))
+
+    # monthly totals the way the statistics stage computes them
+    widened_compact = widen_compact_numeric_columns(compact, ["distance_flown_in_segment", "ef"])
+    for column in ("ef", "distance_flown_in_segment"):
+        standard_total = standard[column].sum()
+        compact_total = widened_compact[column].sum()
+        logger.info(
+            "Monthly %s total: %.9e (standard), %.9e (compact), relative drift %.2e",
+            column,
+            standard_total,
+            compact_total,
+            relative_difference(compact_total, standard_total),
+        )
+
+    # drift of each flight relative to its gross EF, as warming and cooling segments can cancel
+    per_flight = (
+        calculate_energy_forcing_per_flight(standard)
+        .join(calculate_energy_forcing_per_flight(compact), on="flight_id", suffix="_compact")
+        .join(
+            standard.group_by("flight_id").agg(pl.col("ef").abs().sum().alias("gross_ef")),
+            on="flight_id",
+        )
+        .filter(pl.col("gross_ef") > 0.0)
+    )
+    flight_drift = (
+        pl.col("total_energy_forcing_compact") - pl.col("total_energy_forcing")
+    ).abs() / pl.col("gross_ef")
+    logger.info(
+        "Per-flight EF total drift relative to gross EF: median %.2e, max %.2e",
+        per_flight.select(flight_drift.median()).item(),
+        per_flight.select(flight_drift.max()).item(),
+    )
+
+    standard_memory = standard.estimated_size()
+    compact_memory = compact.estimated_size()
+    logger.info(
+        "Memory: %.1f MB (standard), %.1f MB (compact), %.0f%% saved",
+        standard_memory / 1e6,
+        compact_memory / 1e6,
+        100 * (1 - compact_memory / standard_memory),
+    )
+    logger.info(
+        "Disk: %.1f MB (standard), %.1f MB (compact), %.0f%% saved",
+        disk_sizes[SchemaProfile.STANDARD] / 1e6,
+        disk_sizes[SchemaProfile.COMPACT] / 1e6,
+        100 * (1 - disk_sizes[SchemaProfile.COMPACT] / disk_sizes[SchemaProfile.STANDARD]),
+    )
@@ -0,0 +1,389 @@
+"""Ingestion of raw ADS-B CSV files from an S3-compatible object store or a local directory."""
+
+from __future__ import annotations
+
+__all__ = (
+    "IngestionReport",
+    "LocalDirectorySource",
+    "RawObject",
+    "S3ObjectSource",
+    "ingest_raw_ads_b_data",
+    "ingested_parquet_files",
+    "partition_ads_b_parquet_files",
+    "scan_raw_ads_b_files",
+)
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from timeit import default_timer
+from typing import TYPE_CHECKING, Any
+from urllib.parse import quote
+
+import polars as pl
+
+from aia_model_contrail_avoidance.config import (
+    ADS_B_CSV_SCHEMA,
+    ADS_B_INPUT_TIMESTAMP_FORMAT,
+    ADS_B_PARQUET_INPUT_SCHEMA,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+logger = logging.getLogger(__name__)
+
+# Suffix of the gzip compressed raw ADS-B CSV files
+RAW_OBJECT_SUFFIX = ".gzip"
+# Manifest in the output directory of the keys converted so far, one per line
+MANIFEST_FILE_NAME = ".converted_keys.txt"
+# Number of raw objects downloaded and converted at the same time
+DEFAULT_WORKERS = 8
+# Number of attempts to ingest each raw object before it is reported as failed
+DEFAULT_ATTEMPTS = 3
+# Delay before the second attempt, doubled before each later attempt
+RETRY_DELAY_SECONDS = 1.0
+# Rows per file of the partitioned ADS-B parquet dataset, about 100 files for a year of raw data
+ROWS_PER_PARTITIONED_FILE = 5_000_000
+
+
+@dataclass(frozen=True)
+class RawObject:
+    """A raw ADS-B CSV file in a source."""
+
+    # Key of the object in the source
+    key: str
+    # Size of the object in bytes
+    size: int
+
+
+@dataclass(frozen=True)
+class LocalDirectorySource:
+    """Raw ADS-B CSV files in a local directory, keyed by their path relative to it."""
+
+    directory: Path
+    suffix: str = RAW_OBJECT_SUFFIX
+
+    def list_objects(self, max_objects: int | None = None) -> list[RawObject]:
+        """List the raw files in the directory and its subdirectories, in order of their keys."""
+        paths = sorted(self.directory.rglob(f"*{self.suffix}"))[:max_objects]
+        return [
+            RawObject(key=path.relative_to(self.directory).as_posix(), size=path.stat().st_size)
+            for path in paths
+        ]
+
+    def fetch(self, key: str, scratch_dir: Path) -> Path:  # noqa: ARG002
+        """Path of a raw file, which is read in place rather than copied to the scratch dir."""
+        return self.directory / key
+
+
+@dataclass
+class S3ObjectSource:
+    """Raw ADS-B CSV objects in a bucket of an S3-compatible object store.
+
+    With an endpoint_url, any S3-compatible store can be used, such as a local MinIO server.
+    """
+
+    bucket: str
+    prefix: str = ""
+    endpoint_url: str | None = None
+    suffix: str = RAW_OBJECT_SUFFIX
+    # boto3 S3 client, which is thread safe, created for the endpoint_url if not given
+    client: Any = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        """Create the S3 client if none was given."""
+        if self.client is None:
+            # boto3 is only needed for object stores, not to ingest a local directory
+            import boto3  # type: ignore[import-untyped]  # noqa: PLC0415
+
+            self.client = boto3.client("s3", endpoint_url=self.endpoint_url)
+
+    def list_objects(self, max_objects: int | None = None) -> list[RawObject]:
+        """List the raw objects under the prefix, in order of their keys."""
+        raw_objects: list[RawObject] = []
+        pages = self.client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket, Prefix=self.prefix
+        )
+        for page in pages:
+            raw_objects.extend(
+                RawObject(key=obj["Key"], size=obj["Size"])
+                for obj in page.get("Contents", [])
+                if obj["Key"].endswith(self.suffix)
+            )
+            if max_objects is not None and len(raw_objects) >= max_objects:
+                break
+        return raw_objects[:max_objects]
+
+    def fetch(self, key: str, scratch_dir: Path) -> Path:
+        """Download a raw object to the scratch dir.
+
+        Returns:
+            Path of the downloaded file.
+        """
+        path = scratch_dir / quote(key, safe="")
+        self.client.download_file(self.bucket, key, str(path))
+        return path
+
+
+type RawObjectSource = LocalDirectorySource | S3ObjectSource
+
+
+@dataclass(frozen=True)
+class IngestionReport:
+    """Outcome of an ingestion run."""
+
+    # Keys converted in this run, in the order they finished
+    converted_keys: tuple[str, ...]
+    # Keys that failed on every attempt, to be ingested again when the run is resumed
+    failed_keys: tuple[str, ...]
+    # Size in bytes of the raw objects converted in this run
+    ingested_bytes: int
+    # Wall time of the run in seconds
+    elapsed_seconds: float
+
+    @property
+    def throughput_mb_per_second(self) -> float:
+        """Size of the converted raw objects in MB per second of wall time."""
+        if self.elapsed_seconds <= 0.0:
+            return 0.0
+        return self.ingested_bytes / 1e6 / self.elapsed_seconds
+
+
+def output_file_name(key: str, suffix: str = RAW_OBJECT_SUFFIX) -> str:
+    """Name of the parquet file of a raw object, unique for each key.
+
+    The key is percent-encoded, so its "/" separators are escaped and keys such as "a/b_c" and
+    "a_b/c" have different names.
+    """
+    return quote(key.removesuffix(suffix).removesuffix(".csv"), safe="") + ".parquet"
+
+
+def convert_raw_file(raw_file: Path, output_file: Path) -> None:
+    """Convert a raw ADS-B CSV file to a parquet file of the columns used for flight processing.
+
+    The parquet file is written under a temporary name and renamed, so an interrupted conversion
+    never leaves a partial file that is read as input.
+
+    Args:
+        raw_file: Raw CSV file, optionally gzip compressed.
+        output_file: Parquet file to write.
+    """
+    temporary_file = output_file.with_name(f".{output_file.name}.tmp")
+    pl.scan_csv(raw_file, schema=ADS_B_CSV_SCHEMA).select(
+        list(ADS_B_PARQUET_INPUT_SCHEMA)
+    ).sink_parquet(temporary_file)
+    temporary_file.replace(output_file)
+
+
+def scan_raw_ads_b_files(raw_files: Sequence[Path]) -> pl.LazyFrame:
+    """Lazily scan raw ADS-B CSV files into the datapoints used for flight identification.
+
+    The fused alternative to `convert_raw_file` and reading the parquet files back: the dtypes are
+    cast by the CSV reader, only the columns of `ADS_B_PARQUET_INPUT_SCHEMA` are kept and the
+    timestamps are parsed in the same query, so each batch is parsed once as it is read.
+
+    Args:
+        raw_files: Raw CSV files, optionally gzip compressed, concatenated in the given order.
+
+    Returns:
+        LazyFrame of the ADS-B datapoints with a datetime timestamp column.
+    """
+    return pl.scan_csv(list(raw_files), schema=ADS_B_CSV_SCHEMA).select(
+        pl.col(column).str.to_datetime(format=ADS_B_INPUT_TIMESTAMP_FORMAT)
+        if column == "timestamp"
+        else pl.col(column)
+        for column in ADS_B_PARQUET_INPUT_SCHEMA
+    )
+
+
+def ingest_raw_object(
+    source: RawObjectSource,
+    raw_object: RawObject,
+    output_dir: Path,
+    scratch_dir: Path,
+    attempts: int = DEFAULT_ATTEMPTS,
+) -> None:
+    """Fetch and convert one raw object, retrying with a growing delay if it fails.
+
+    Args:
+        source: Source of the raw object.
+        raw_object: Raw object to ingest.
+        output_dir: Directory of the parquet files.
+        scratch_dir: Directory for downloaded raw objects, which are removed once converted.
+        attempts: Number of attempts before the error is raised.
+    """
+    output_file = output_dir / output_file_name(raw_object.key, source.suffix)
+    for attempt in range(1, attempts + 1):
+        try:
+            raw_file = source.fetch(raw_object.key, scratch_dir)
+            try:
+                convert_raw_file(raw_file, output_file)
+            finally:
+                if raw_file.parent == scratch_dir:
+                    raw_file.unlink(missing_ok=True)
+        # any error of the object store or of the conversion is retried
+        except Exception as error:
+            if attempt == attempts:
+                raise
+            delay = RETRY_DELAY_SECONDS * 2 ** (attempt - 1)
+            logger.warning(
+                "Attempt %d of %d to ingest %s failed (%s), retrying in %.1f s",
+                attempt,
+                attempts,
+                raw_object.key,
+                error,
+                delay,
+            )
+            time.sleep(delay)
+        else:
+            return
+
+
+def read_manifest(manifest_file: Path) -> set[str]:
+    """Keys in a manifest of converted keys, none if it does not exist."""
+    if not manifest_file.exists():
+        return set()
+    return {key for key in manifest_file.read_text().splitlines() if key}
+
+
+def ingest_raw_ads_b_data(
+    source: RawObjectSource,
+    output_dir: Path,
+    *,
+    workers: int = DEFAULT_WORKERS,
+    attempts: int = DEFAULT_ATTEMPTS,
+    max_objects: int | None = None,
+) -> IngestionReport:
+    """Convert the raw ADS-B CSV objects of a source to one parquet file each.
+
+    The objects are fetched and converted by a pool of worker threads, so at most `workers`
+    objects are downloaded or in memory at the same time. Each converted key is appended to a
+    manifest in output_dir as soon as its parquet file is written, and the keys in the manifest
+    are skipped, so an interrupted or partly failed run is resumed by running it again.
+
+    Args:
+        source: Source of the raw objects, a local directory or an S3-compatible bucket.
+        output_dir: Directory of the parquet files, created if needed.
+        workers: Number of objects fetched and converted at the same time.
+        attempts: Number of attempts to ingest each object.
+        max_objects: If given, only the first max_objects objects of the source are ingested.
+
+    Returns:
+        Report of the converted and failed keys and the throughput.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_file = output_dir / MANIFEST_FILE_NAME
+    already_converted_keys = read_manifest(manifest_file)
+    raw_objects = [
+        raw_object
+        for raw_object in source.list_objects(max_objects)
+        if raw_object.key not in already_converted_keys
+    ]
+    logger.info(
+        "Ingesting %d raw objects (%.1f MB) with %d workers, %d already converted",
+        len(raw_objects),
+        sum(raw_object.size for raw_object in raw_objects) / 1e6,
+        workers,
+        len(already_converted_keys),
+    )
+
+    start = default_timer()
+    converted_keys: list[str] = []
+    failed_keys: list[str] = []
+    ingested_bytes = 0
+    with (
+        tempfile.TemporaryDirectory(prefix=".ingestion-", dir=output_dir) as scratch_dir,
+        ThreadPoolExecutor(max_workers=workers) as executor,
+        manifest_file.open("a") as manifest,
+    ):
+        futures = {
+            executor.submit(
+                ingest_raw_object, source, raw_object, output_dir, Path(scratch_dir), attempts
+            ): raw_object
+            for raw_object in raw_objects
+        }
+        for future in as_completed(futures):
+            raw_object = futures[future]
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Failed to ingest %s after %d attempts", raw_object.key, attempts)
+                failed_keys.append(raw_object.key)
+                continue
+            manifest.write(f"{raw_object.key}\n")
+            manifest.flush()
+            converted_keys.append(raw_object.key)
+            ingested_bytes += raw_object.size
+            logger.debug("Converted %s", raw_object.key)
+
+    report = IngestionReport(
+        converted_keys=tuple(converted_keys),
+        failed_keys=tuple(failed_keys),
+        ingested_bytes=ingested_bytes,
+        elapsed_seconds=default_timer() - start,
+    )
+    logger.info(
+        "Ingested %d raw objects, %.1f MB in %.1f s (%.1f MB/s), %d failed",
+        len(report.converted_keys),
+        report.ingested_bytes / 1e6,
+        report.elapsed_seconds,
+        report.throughput_mb_per_second,
+        len(report.failed_keys),
+    )
+    return report
+
+
+def ingested_parquet_files(output_dir: Path, suffix: str = RAW_OBJECT_SUFFIX) -> list[Path]:
+    """Parquet files of the keys in the manifest of an ingestion, in order of their keys.
+
+    Args:
+        output_dir: Output directory of `ingest_raw_ads_b_data`.
+        suffix: Suffix of the raw object keys.
+
+    Returns:
+        Paths of the converted parquet files.
+    """
+    return [
+        output_dir / output_file_name(key, suffix)
+        for key in sorted(read_manifest(output_dir / MANIFEST_FILE_NAME))
+    ]
+
+
+def partition_ads_b_parquet_files(
+    parquet_files: Sequence[Path],
+    output_dir: Path,
+    max_rows_per_file: int = ROWS_PER_PARTITIONED_FILE,
+) -> None:
+    """Stream parquet files, in order, into numbered files of at most max_rows_per_file rows.
+
+    The raw objects vary in size, so the flight identification, which segments a number of input
+    files at a time, reads these row bounded files instead of one file per raw object. The files
+    are written to a temporary sibling directory, which then replaces output_dir.
+
+    Args:
+        parquet_files: Parquet files of ADS-B datapoints, in chronological order.
+        output_dir: Directory of the partitioned files, replaced if it exists.
+        max_rows_per_file: Maximum number of rows of each file.
+    """
+    temporary_dir = output_dir.with_name(f".{output_dir.name}.{os.getpid()}.tmp")
+    previous_dir = output_dir.with_name(f".{output_dir.name}.{os.getpid()}.old")
+    pl.scan_parquet(list(parquet_files)).sink_parquet(
+        pl.PartitionBy(temporary_dir, max_rows_per_file=max_rows_per_file), mkdir=True
+    )
+    if output_dir.exists():
+        output_dir.replace(previous_dir)
+    temporary_dir.replace(output_dir)
+    shutil.rmtree(previous_dir, ignore_errors=True)
+    logger.info(
+        "Partitioned %d parquet files into %d files of at most %d rows in %s",
+        len(parquet_files),
+        len(list(output_dir.glob("*.parquet"))),
+        max_rows_per_file,
+        output_dir,
+    )
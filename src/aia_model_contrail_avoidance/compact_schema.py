@@ -0,0 +1,370 @@
+"""Compact encodings of flight data columns.
+
+In the compact ICAO encoding the ICAO 24-bit aircraft address is held as an unsigned integer and
+the departure and arrival airports as an enum of the airport registry, so each value is a small
+integer in memory and in parquet, and joins, group_bys and filters on them compare integers.
+
+The compact schema profile narrows the numeric columns to the dtypes of COMPACT_NUMERIC_DTYPES.
+"""
+
+from __future__ import annotations
+
+__all__ = (
+    "airport_icao_dtype",
+    "airports_as_categorical",
+    "apply_schema_profile",
+    "compact_icao_schema",
+    "decode_icao_columns",
+    "encode_icao_columns",
+    "flight_key",
+    "icao_address_from_integer",
+    "icao_address_to_integer",
+    "is_icao_encoded",
+    "normalise_icao_columns",
+    "read_flight_parquet",
+    "scan_flight_parquet",
+    "widen_compact_numeric_columns",
+    "write_flight_parquet",
+)
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
+
+import polars as pl
+
+from aia_model_contrail_avoidance.config import (
+    AIRPORT_ICAO_COLUMNS,
+    COMPACT_NUMERIC_DTYPES,
+    ICAO_ADDRESS_COLUMN,
+    ICAO_ADDRESS_COMPACT_DTYPE,
+    SchemaProfile,
+)
+from aia_model_contrail_avoidance.core_model.airports import get_airport_registry
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+    from polars.type_aliases import PolarsDataType
+
+# Number of hexadecimal digits of an ICAO 24-bit aircraft address
+ICAO_ADDRESS_HEX_DIGITS = 6
+HEX_DIGITS = "0123456789abcdef"
+# Bits given to each airport in the packed flight key, the aircraft address takes the top 24 bits
+AIRPORT_KEY_BITS = 20
+
+
+def airport_icao_dtype() -> pl.Enum:
+    """Enum of the ICAO codes in the airport registry, the dtype of compact airport columns."""
+    return get_airport_registry().icao_enum
+
+
+def compact_icao_schema(schema: Mapping[str, PolarsDataType]) -> dict[str, PolarsDataType]:
+    """Copy of a flight data schema with the ICAO columns in the compact encoding.
+
+    Args:
+        schema: Schema such as ADS_B_SCHEMA_CLEANED, with string ICAO columns.
+
+    Returns:
+        Schema with an integer icao_address and enum airport columns, where present.
+    """
+    compact_schema = dict(schema)
+    if ICAO_ADDRESS_COLUMN in compact_schema:
+        compact_schema[ICAO_ADDRESS_COLUMN] = ICAO_ADDRESS_COMPACT_DTYPE
+    for column in AIRPORT_ICAO_COLUMNS:
+        if column in compact_schema:
+            compact_schema[column] = airport_icao_dtype()
+    return compact_schema
+
+
+def icao_address_to_integer(icao_address: pl.Expr) -> pl.Expr:
+    """Parse hexadecimal ICAO 24-bit aircraft addresses to integers, null if not an address."""
+    parsed_address = icao_address.str.to_integer(base=16, strict=False)
+    return (
+        pl.when(parsed_address < 2 ** (4 * ICAO_ADDRESS_HEX_DIGITS))
+        .then(parsed_address)
+        .cast(ICAO_ADDRESS_COMPACT_DTYPE)
+    )
+
+
+def icao_address_from_integer(icao_address: pl.Expr) -> pl.Expr:
+    """Format integer ICAO 24-bit aircraft addresses as six lowercase hexadecimal digits."""
+    return pl.concat_str(
+        [
+            pl.lit(HEX_DIGITS).str.slice((icao_address // 16**position) % 16, 1)
+            for position in reversed(range(ICAO_ADDRESS_HEX_DIGITS))
+        ]
+    )
+
+
+def is_icao_encoded(schema: Mapping[str, PolarsDataType]) -> bool:
+    """Whether the ICAO columns of a schema use the compact encoding, as `flight_key` needs.
+
+    The icao_address column must be the compact integer and both airport columns the airport
+    enum. String addresses with categorical airports, as `airports_as_categorical` leaves them
+    when written without encoding the address, are not encoded.
+    """
+    return schema.get(ICAO_ADDRESS_COLUMN) == ICAO_ADDRESS_COMPACT_DTYPE and all(
+        schema.get(column) == airport_icao_dtype() for column in AIRPORT_ICAO_COLUMNS
+    )
+
+
+def normalise_icao_columns[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+) -> FlightFrame:
+    """Normalise string ICAO columns to the values that round trip through the compact encoding.
+
+    Aircraft addresses are written as six lowercase hexadecimal digits, as decoded by
+    `icao_address_from_integer`, and airport codes that are not in the airport registry are
+    null, as encoded by `encode_icao_columns`. Values that are not aircraft addresses are null.
+    So flight data gives the same flights in either encoding.
+
+    Args:
+        flight_dataframe: DataFrame or LazyFrame with any of the string icao_address,
+            departure_airport_icao and arrival_airport_icao columns.
+
+    Returns:
+        DataFrame or LazyFrame with the normalised string ICAO columns.
+    """
+    schema = flight_dataframe.collect_schema()
+    normalised_columns = []
+    if schema.get(ICAO_ADDRESS_COLUMN) == pl.String:
+        icao_address = (
+            pl.col(ICAO_ADDRESS_COLUMN).str.to_lowercase().str.zfill(ICAO_ADDRESS_HEX_DIGITS)
+        )
+        normalised_columns.append(
+            pl.when(icao_address.str.contains(f"^[0-9a-f]{{{ICAO_ADDRESS_HEX_DIGITS}}}$"))
+            .then(icao_address)
+            .alias(ICAO_ADDRESS_COLUMN)
+        )
+    normalised_columns.extend(
+        pl.col(column).cast(airport_icao_dtype(), strict=False).cast(pl.String)
+        for column in AIRPORT_ICAO_COLUMNS
+        if schema.get(column) == pl.String
+    )
+    if not normalised_columns:
+        return flight_dataframe
+    return flight_dataframe.with_columns(normalised_columns)
+
+
+def encode_icao_columns[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+) -> FlightFrame:
+    """Convert the string ICAO columns of flight data to the compact encoding.
+
+    Columns that are absent or already encoded are left unchanged, categorical airport columns (as
+    written by `write_flight_parquet`) are converted to the airport enum. Aircraft addresses that
+    are not hexadecimal 24-bit addresses and airport codes that are not in the airport registry
+    are null, see `normalise_icao_columns` for the matching string values.
+
+    Args:
+        flight_dataframe: DataFrame or LazyFrame with any of the icao_address,
+            departure_airport_icao and arrival_airport_icao columns.
+
+    Returns:
+        DataFrame or LazyFrame with the compact ICAO columns.
+    """
+    schema = flight_dataframe.collect_schema()
+    encoded_columns = []
+    if schema.get(ICAO_ADDRESS_COLUMN) == pl.String:
+        encoded_columns.append(icao_address_to_integer(pl.col(ICAO_ADDRESS_COLUMN)))
+    encoded_columns.extend(
+        pl.col(column).cast(pl.String).cast(airport_icao_dtype(), strict=False)
+        for column in AIRPORT_ICAO_COLUMNS
+        if schema.get(column) in (pl.String, pl.Categorical)
+    )
+    if not encoded_columns:
+        return flight_dataframe
+    return flight_dataframe.with_columns(encoded_columns)
+
+
+def decode_icao_columns[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+) -> FlightFrame:
+    """Convert the compact ICAO columns of flight data back to strings.
+
+    Args:
+        flight_dataframe: DataFrame or LazyFrame with any of the icao_address,
+            departure_airport_icao and arrival_airport_icao columns.
+
+    Returns:
+        DataFrame or LazyFrame with string ICAO columns.
+    """
+    schema = flight_dataframe.collect_schema()
+    decoded_columns = []
+    if ICAO_ADDRESS_COLUMN in schema and schema[ICAO_ADDRESS_COLUMN] != pl.String:
+        decoded_columns.append(
+            icao_address_from_integer(pl.col(ICAO_ADDRESS_COLUMN)).alias(ICAO_ADDRESS_COLUMN)
+        )
+    decoded_columns.extend(
+        pl.col(column).cast(pl.String)
+        for column in AIRPORT_ICAO_COLUMNS
+        if column in schema and schema[column] != pl.String
+    )
+    if not decoded_columns:
+        return flight_dataframe
+    return flight_dataframe.with_columns(decoded_columns)
+
+
+def flight_key(
+    icao_address: str = ICAO_ADDRESS_COLUMN,
+    departure_airport_icao: str = AIRPORT_ICAO_COLUMNS[0],
+    arrival_airport_icao: str = AIRPORT_ICAO_COLUMNS[1],
+) -> pl.Expr:
+    """Pack a compact aircraft address and airport pair into one UInt64 key.
+
+    The address takes the top 24 bits and each airport enum code 20 bits, so the key is unique per
+    aircraft and origin-destination pair, and null when any of them is null.
+
+    Args:
+        icao_address: Name of the integer icao_address column.
+        departure_airport_icao: Name of the enum departure airport column.
+        arrival_airport_icao: Name of the enum arrival airport column.
+
+    Returns:
+        Expression of the packed key.
+    """
+    return (
+        pl.col(icao_address).cast(pl.UInt64) * (1 << (2 * AIRPORT_KEY_BITS))
+        + pl.col(departure_airport_icao).to_physical().cast(pl.UInt64) * (1 << AIRPORT_KEY_BITS)
+        + pl.col(arrival_airport_icao).to_physical().cast(pl.UInt64)
+    )
+
+
+def apply_schema_profile[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+    schema_profile: SchemaProfile,
+) -> FlightFrame:
+    """Cast the numeric columns of flight data to the dtypes of a schema profile.
+
+    The standard profile leaves the dtypes unchanged. The compact profile casts the columns of
+    COMPACT_NUMERIC_DTYPES that are present, and keeps the time zone of the timestamps.
+
+    Args:
+        flight_dataframe: DataFrame or LazyFrame of processed flight data, with or without ef.
+        schema_profile: Schema profile to apply.
+
+    Returns:
+        DataFrame or LazyFrame with the numeric dtypes of the profile.
+    """
+    if schema_profile is SchemaProfile.STANDARD:
+        return flight_dataframe
+    schema = flight_dataframe.collect_schema()
+    return flight_dataframe.with_columns(
+        pl.col(column).dt.cast_time_unit(dtype.time_unit)
+        if isinstance(dtype, pl.Datetime)
+        else pl.col(column).cast(dtype)
+        for column, dtype in COMPACT_NUMERIC_DTYPES.items()
+        if column in schema
+    )
+
+
+def widen_compact_numeric_columns[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+    columns: Sequence[str] | None = None,
+) -> FlightFrame:
+    """Cast Float32 columns of the compact profile to Float64, so sums accumulate in Float64.
+
+    Grouped sums of Float32 columns accumulate in Float32, which drifts by around 0.1% over a
+    month of datapoints.
+
+    Args:
+        flight_dataframe: DataFrame or LazyFrame of flight data in either schema profile.
+        columns: Columns to widen, defaults to every Float32 column of COMPACT_NUMERIC_DTYPES.
+
+    Returns:
+        DataFrame or LazyFrame with the columns as Float64.
+    """
+    if columns is None:
+        columns = [
+            column for column, dtype in COMPACT_NUMERIC_DTYPES.items() if dtype == pl.Float32
+        ]
+    schema = flight_dataframe.collect_schema()
+    return flight_dataframe.with_columns(
+        pl.col(column).cast(pl.Float64) for column in columns if schema.get(column) == pl.Float32
+    )
+
+
+def airports_as_categorical[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+) -> FlightFrame:
+    """Cast enum airport columns to categoricals before writing them to parquet.
+
+    A parquet file of an enum column stores every code in the airport registry in its schema,
+    about half a megabyte per file. A categorical column only stores a dictionary of the airports
+    that occur in the file, and readers that do not use `read_flight_parquet` still see codes.
+
+    Args:
+        flight_dataframe: DataFrame or LazyFrame of flight data.
+
+    Returns:
+        DataFrame or LazyFrame with categorical instead of enum airport columns.
+    """
+    schema = flight_dataframe.collect_schema()
+    return flight_dataframe.with_columns(
+        pl.col(column).cast(pl.Categorical)
+        for column in AIRPORT_ICAO_COLUMNS
+        if isinstance(schema.get(column), pl.Enum)
+    )
+
+
+def write_flight_parquet(
+    flight_dataframe: pl.DataFrame,
+    path: str | Path,
+    *,
+    compact: bool = True,
+    compression: Literal["lz4", "uncompressed", "snappy", "gzip", "brotli", "zstd"] = "zstd",
+) -> None:
+    """Write flight data to parquet, in the compact ICAO encoding by default.
+
+    Compact airport columns are written as categoricals, see `airports_as_categorical`.
+
+    Args:
+        flight_dataframe: DataFrame of flight data with string or compact ICAO columns.
+        path: Path of the parquet file.
+        compact: If True, write the compact encoding, otherwise write string ICAO columns.
+        compression: Parquet compression codec.
+    """
+    if compact:
+        flight_dataframe = airports_as_categorical(encode_icao_columns(flight_dataframe))
+    else:
+        flight_dataframe = decode_icao_columns(flight_dataframe)
+    flight_dataframe.write_parquet(path, compression=compression)
+
+
+def scan_flight_parquet(
+    source: str | Path | Sequence[str | Path],
+    *,
+    compact: bool = True,
+) -> pl.LazyFrame:
+    """Lazily read flight data parquet files written with or without the compact ICAO encoding.
+
+    Each file is converted to the requested encoding before the files are concatenated, so files
+    with string and compact ICAO columns can be read together.
+
+    Args:
+        source: Path of a parquet file, or a sequence of paths.
+        compact: If True, return compact ICAO columns, otherwise return string ICAO columns.
+
+    Returns:
+        LazyFrame of the flight data.
+    """
+    paths = [source] if isinstance(source, (str, Path)) else list(source)
+    convert = encode_icao_columns if compact else decode_icao_columns
+    return pl.concat([convert(pl.scan_parquet(Path(path))) for path in paths], how="vertical")
+
+
+def read_flight_parquet(
+    source: str | Path | Sequence[str | Path],
+    *,
+    compact: bool = True,
+) -> pl.DataFrame:
+    """Read flight data parquet files written with or without the compact ICAO encoding.
+
+    Args:
+        source: Path of a parquet file, or a sequence of paths.
+        compact: If True, return compact ICAO columns, otherwise return string ICAO columns.
+
+    Returns:
+        DataFrame of the flight data.
+    """
+    return scan_flight_parquet(source, compact=compact).collect()
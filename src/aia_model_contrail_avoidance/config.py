@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import enum
 from typing import TYPE_CHECKING
 
 import polars as pl
@@ -11,6 +12,73 @@ if TYPE_CHECKING:
 
     from polars.type_aliases import PolarsDataType
 
+# Columns re-encoded by the compact schema mode (see compact_schema), the ICAO 24-bit aircraft
+# address as an integer and the airports as an enum of the airport registry
+ICAO_ADDRESS_COLUMN = "icao_address"
+AIRPORT_ICAO_COLUMNS = ("departure_airport_icao", "arrival_airport_icao")
+ICAO_ADDRESS_COMPACT_DTYPE = pl.UInt32
+
+
+class SchemaProfile(enum.Enum):
+    """Enum for selecting the numeric dtypes of processed flight data and energy forcing."""
+
+    STANDARD = "standard"
+    COMPACT = "compact"
+
+
+# Numeric dtypes of the compact schema profile (see compact_schema.apply_schema_profile). Float32
+# resolves positions to about a metre and energy forcing to seven significant figures, far finer
+# than the one degree environment grid, and flight levels are whole numbers after cleaning
+COMPACT_NUMERIC_DTYPES: dict[str, PolarsDataType] = {
+    "timestamp": pl.Datetime("ms"),
+    "latitude": pl.Float32,
+    "longitude": pl.Float32,
+    "flight_level": pl.Int16,
+    "distance_flown_in_segment": pl.Float32,
+    "ef": pl.Float32,
+}
+
+# Schema of the raw ADS-B CSV files, of which the columns of ADS_B_PARQUET_INPUT_SCHEMA are kept
+ADS_B_CSV_SCHEMA: dict[str, PolarsDataType] = {
+    "timestamp": pl.String,
+    "source": pl.String,
+    "callsign": pl.String,
+    "icao_address": pl.String,
+    "latitude": pl.Float64,
+    "longitude": pl.Float64,
+    "altitude_baro": pl.Int32,
+    "altitude_gnss": pl.Int32,
+    "on_ground": pl.Boolean,
+    "heading": pl.Float32,
+    "speed": pl.Int32,
+    "vertical_rate": pl.Int32,
+    "squawk": pl.String,
+    "aircraft_type_icao": pl.String,
+    "aircraft_type_iata": pl.String,
+    "tail_number": pl.String,
+    "aircraft_type_name": pl.String,
+    "airline_iata": pl.String,
+    "airline_name": pl.String,
+    "flight_number": pl.String,
+    "departure_airport_icao": pl.String,
+    "departure_airport_iata": pl.String,
+    "arrival_airport_icao": pl.String,
+    "arrival_airport_iata": pl.String,
+    "departure_scheduled_time": pl.String,
+    "arrival_scheduled_time": pl.String,
+    "takeoff_time": pl.String,
+    "landing_time": pl.String,
+    "arrival_utc_offset": pl.Int32,
+    "departure_utc_offset": pl.Int32,
+}
+
+# Format of the timestamp strings in the raw ADS-B files
+ADS_B_INPUT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S%.f %Z"
+
+# Columns of ADS_B_PARQUET_INPUT_SCHEMA that parquet files converted before they were kept lack,
+# with the value they are read as from those files. Aircraft are taken to be in the air
+ADS_B_PARQUET_INPUT_OPTIONAL_COLUMNS: dict[str, bool] = {"on_ground": False}
+
 ADS_B_PARQUET_INPUT_SCHEMA: dict[str, PolarsDataType] = {
     "timestamp": pl.String,
     "icao_address": pl.String,
@@ -18,6 +86,7 @@ ADS_B_PARQUET_INPUT_SCHEMA: dict[str, PolarsDataType] = {
     "longitude": pl.Float64,
     "altitude_baro": pl.Int32,
     "altitude_gnss": pl.Int32,
+    "on_ground": pl.Boolean,
     "heading": pl.Float32,
     "aircraft_type_icao": pl.String,
     "aircraft_type_name": pl.String,
@@ -34,6 +103,7 @@ ADS_B_PARQUET_OUTPUT_SCHEMA_WITH_FLIGHT_ID: dict[str, PolarsDataType] = {
     "longitude": pl.Float64,
     "altitude_baro": pl.Int32,
     "altitude_gnss": pl.Int32,
+    "on_ground": pl.Boolean,
     "heading": pl.Float32,
     "aircraft_type_icao": pl.String,
     "aircraft_type_name": pl.String,
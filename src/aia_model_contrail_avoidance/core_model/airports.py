@@ -3,25 +3,146 @@
 from __future__ import annotations
 
 __all__ = [
+    "AirportRegistry",
     "airport_icao_code_to_location",
+    "airport_icao_codes_to_locations",
     "airport_name_from_icao_code",
+    "get_airport_registry",
+    "great_circle_distance_between_airports",
     "list_of_uk_airports",
     "uk_regional_flights",
 ]
 
-from typing import overload
+import functools
+from pathlib import Path
+from typing import TYPE_CHECKING, overload
 
+import numpy as np
 import polars as pl
 
+from aia_model_contrail_avoidance.core_model.flights import flight_distance_from_location_vectorized
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+AIRPORT_DATA_PATH = Path("data/airport_data/airports.parquet")
+
+
+class AirportRegistry:
+    """Airport data held in memory with an index from ICAO code to row.
+
+    Use `get_airport_registry` to load the registry once per process.
+    """
+
+    def __init__(self, airport_data: pl.DataFrame) -> None:
+        """Index airport data.
+
+        Args:
+            airport_data: DataFrame with unique icao codes and name, lat, lon and iso_country
+                columns.
+        """
+        self.airport_data = airport_data
+        self.icao_codes: list[str] = airport_data["icao"].to_list()
+        self.names: list[str] = airport_data["name"].to_list()
+        self.latitudes = airport_data["lat"].to_numpy()
+        self.longitudes = airport_data["lon"].to_numpy()
+        self.row_of_icao_code = {icao: row for row, icao in enumerate(self.icao_codes)}
+        # physical code of each airport in the compact flight data schema is its row
+        self.icao_enum = pl.Enum(self.icao_codes)
+        # UK airports in file order, and as a set for membership tests
+        self.uk_airports = tuple(
+            airport_data.filter(pl.col("iso_country") == "GB")["icao"].to_list()
+        )
+        self.uk_airport_set = frozenset(self.uk_airports)
+
+    @classmethod
+    def from_parquet(cls, path: str | Path) -> AirportRegistry:
+        """Load a registry from an airport data parquet file."""
+        return cls(pl.read_parquet(path))
+
+    def row_of(self, airport_icao_code: str) -> int:
+        """Row of an airport, raising a ValueError for an unknown ICAO code."""
+        row = self.row_of_icao_code.get(airport_icao_code)
+        if row is None:
+            msg = f"Airport code {airport_icao_code} not found."
+            raise ValueError(msg)
+        return row
+
+    def rows_of(
+        self, airport_icao_codes: pl.Series | np.ndarray | Sequence[str | None]
+    ) -> np.ndarray:
+        """Rows of airports in input order, -1 for unknown ICAO codes.
+
+        The codes are cast to `icao_enum`, whose physical code of each airport is its row.
+        """
+        return (
+            pl.Series("icao", airport_icao_codes, dtype=pl.String)
+            .cast(self.icao_enum, strict=False)
+            .to_physical()
+            .cast(pl.Int64)
+            .fill_null(-1)
+            .to_numpy()
+        )
+
+    def locations(
+        self, airport_icao_codes: pl.Series | np.ndarray | Sequence[str | None]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Latitudes and longitudes of many airports with a single join.
+
+        Args:
+            airport_icao_codes: ICAO codes, may contain duplicates, nulls and unknown codes.
+
+        Returns:
+            Tuple of float64 latitude and longitude arrays aligned with the input codes, NaN for
+            unknown codes.
+        """
+        airport_locations = (
+            pl.Series("icao", airport_icao_codes, dtype=pl.String)
+            .to_frame()
+            .join(
+                self.airport_data.select(["icao", "lat", "lon"]),
+                on="icao",
+                how="left",
+                maintain_order="left",
+            )
+            .select(pl.col("lat", "lon").cast(pl.Float64).fill_null(np.nan))
+        )
+        return airport_locations["lat"].to_numpy(), airport_locations["lon"].to_numpy()
+
+    def location(self, airport_icao_code: str) -> tuple[float, float]:
+        """Latitude and longitude of an airport."""
+        row = self.row_of(airport_icao_code)
+        return (float(self.latitudes[row]), float(self.longitudes[row]))
+
+    def name(self, airport_icao_code: str) -> str:
+        """Name of an airport."""
+        return self.names[self.row_of(airport_icao_code)]
+
+    def is_uk_airport(self, airport_icao_code: str) -> bool:
+        """Whether an airport is in the UK."""
+        return airport_icao_code in self.uk_airport_set
+
+
+def get_airport_registry(path: Path = AIRPORT_DATA_PATH) -> AirportRegistry:
+    """Airport registry loaded once per process and path.
+
+    The path is resolved, so the relative default refers to the working directory of each call.
+    """
+    return _load_airport_registry(path.resolve())
+
+
+@functools.cache
+def _load_airport_registry(resolved_path: Path) -> AirportRegistry:
+    """Load the airport registry of a resolved path once per process."""
+    return AirportRegistry.from_parquet(resolved_path)
+
 
 def list_of_uk_airports() -> list[str]:
     """Filter the airport data to include only UK airports.
 
     returns: list[str]: List of ICAO codes for UK airports.
     """
-    airport_data = pl.read_parquet("data/airport_data/airports.parquet")
-    uk_airports = airport_data.filter(pl.col("iso_country") == "GB")
-    return uk_airports["icao"].to_list()
+    return list(get_airport_registry().uk_airports)
 
 
 def uk_regional_flights(flight_data: pl.DataFrame) -> pl.DataFrame:
@@ -50,27 +171,64 @@ def airport_icao_code_to_location(
         airport_icao_code (str | list[str]): ICAO code(s) of the airport.
 
     Returns:
-        tuple[float, float] | list[tuple[float, float]]: (latitude, longitude) of the airport(s).
+        tuple[float, float] | list[tuple[float, float]]: (latitude, longitude) of the airport(s),
+            in input order, skipping unknown codes.
     """
-    airport_data = pl.read_parquet("data/airport_data/airports.parquet")
+    airport_registry = get_airport_registry()
 
     if isinstance(airport_icao_code, str):
-        airport_info = airport_data.filter(pl.col("icao") == airport_icao_code).select(
-            ["lat", "lon"]
-        )
-        if airport_info.is_empty():
-            msg = f"Airport code {airport_icao_code} not found."
-            raise ValueError(msg)
-        # explicit casts to float so mypy knows the return types
-        return (float(airport_info["lat"][0]), float(airport_info["lon"][0]))
+        return airport_registry.location(airport_icao_code)
 
-    airport_info = airport_data.filter(pl.col("icao").is_in(airport_icao_code)).select(
-        ["icao", "lat", "lon"]
-    )
-    if airport_info.is_empty():
+    rows = airport_registry.rows_of(airport_icao_code)
+    rows = rows[rows >= 0]
+    if rows.size == 0:
         msg = f"No airports found for codes: {airport_icao_code}"
         raise ValueError(msg)
-    return [(float(row["lat"]), float(row["lon"])) for row in airport_info.iter_rows(named=True)]
+    return list(
+        zip(
+            airport_registry.latitudes[rows].tolist(),
+            airport_registry.longitudes[rows].tolist(),
+            strict=True,
+        )
+    )
+
+
+def airport_icao_codes_to_locations(
+    airport_icao_codes: pl.Series | np.ndarray | Sequence[str | None],
+) -> tuple[np.ndarray, np.ndarray]:
+    """Get the latitudes and longitudes of a column of airport codes.
+
+    Args:
+        airport_icao_codes: ICAO codes, for example a departure_airport_icao column.
+
+    Returns:
+        Tuple of latitude and longitude arrays aligned with the input codes, NaN for unknown codes.
+    """
+    return get_airport_registry().locations(airport_icao_codes)
+
+
+def great_circle_distance_between_airports(
+    departure_airport_icao_codes: pl.Series | np.ndarray | Sequence[str | None],
+    arrival_airport_icao_codes: pl.Series | np.ndarray | Sequence[str | None],
+) -> np.ndarray:
+    """Great circle distance between pairs of airports, for example every flight in a day.
+
+    Args:
+        departure_airport_icao_codes: ICAO codes of the departure airports.
+        arrival_airport_icao_codes: ICAO codes of the arrival airports.
+
+    Returns:
+        Array of distances in nautical miles, NaN where either code is unknown.
+    """
+    departure_latitudes, departure_longitudes = airport_icao_codes_to_locations(
+        departure_airport_icao_codes
+    )
+    arrival_latitudes, arrival_longitudes = airport_icao_codes_to_locations(
+        arrival_airport_icao_codes
+    )
+    return flight_distance_from_location_vectorized(
+        departure_latitudes, departure_longitudes, arrival_latitudes, arrival_longitudes
+    )
 
 
 @overload
@@ -78,46 +236,37 @@ def airport_name_from_icao_code(airport_icao_code: str) -> str: ...
 
 
 @overload
-def airport_name_from_icao_code(airport_icao_code: list[str] | pl.Series) -> list[str]: ...
+def airport_name_from_icao_code(
+    airport_icao_code: list[str] | pl.Series,
+) -> list[str | None]: ...
 
 
 def airport_name_from_icao_code(
     airport_icao_code: str | list[str] | pl.Series,
-) -> str | list[str]:
+) -> str | list[str | None]:
     """Get the name of the airport(s) given ICAO code(s).
 
     Args:
         airport_icao_code (str | list[str] | pl.Series): ICAO code(s) of the airport(s).
 
     Returns:
-        str | list[str]: Name(s) of the airport(s).
+        str | list[str | None]: Name(s) of the airport(s), in input order and None for unknown
+            codes.
     """
-    airport_data = pl.read_parquet("data/airport_data/airports.parquet")
+    airport_registry = get_airport_registry()
 
     if isinstance(airport_icao_code, str):
-        airport_info = airport_data.filter(pl.col("icao") == airport_icao_code).select(["name"])
-        if airport_info.is_empty():
-            msg = f"Airport code {airport_icao_code} not found."
-            raise ValueError(msg)
-        return str(airport_info["name"][0])
+        return airport_registry.name(airport_icao_code)
 
     codes = (
         airport_icao_code.to_list()
         if isinstance(airport_icao_code, pl.Series)
         else airport_icao_code
     )
-    # join the airport data with the input codes to get the names
-    airport_info = (
-        pl.DataFrame({"icao": codes})
-        .join(
-            airport_data.select(["icao", "name"]),
-            on="icao",
-            how="left",
-        )
-        .select(["name"])
-    )
-
-    if airport_info.is_empty():
+    if len(codes) == 0:
         msg = f"No airports found for codes: {codes}"
         raise ValueError(msg)
-    return pl.Series(airport_info["name"]).to_list()
+    return [
+        airport_registry.names[row] if row >= 0 else None
+        for row in airport_registry.rows_of(codes).tolist()
+    ]
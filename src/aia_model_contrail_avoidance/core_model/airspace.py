@@ -2,9 +2,23 @@
 
 from __future__ import annotations
 
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from timeit import default_timer
+from typing import TYPE_CHECKING
+
+import numpy as np
 import polars as pl
 import shapely
-from traffic.data import eurofirs
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
 
 ENVIRONMENTAL_BOUNDS_UK_AIRSPACE = {
     "lat_min": 45.0,
@@ -13,88 +27,438 @@ ENVIRONMENTAL_BOUNDS_UK_AIRSPACE = {
     "lon_max": 5.0,
 }
 
+# Directory for cached airspace data derived from the FIR geometries
+AIRSPACE_DATA_DIRECTORY = Path("data/airspace_data")
+# Designators of the Great Britain FIRs, in the order they are tested
+GB_FIR_DESIGNATORS = ("EGTT", "EGPX", "EGGX")
+# Cache of the GB FIR names and geometries, so traffic is only imported to build it
+GB_AIRSPACES_CACHE_PATH = AIRSPACE_DATA_DIRECTORY / "gb_airspaces.parquet"
+# Size in degrees of the cells of the airspace raster
+DEFAULT_AIRSPACE_RASTER_RESOLUTION = 0.01
+# Raster value of cells with no airspace, cells in an airspace hold its index plus one
+RASTER_NO_AIRSPACE = 0
+# Raster value of cells crossed by an airspace boundary, classified with exact polygon tests
+RASTER_BOUNDARY = 255
+
+
+@dataclass(frozen=True)
+class FlightInformationRegion:
+    """Name and polygonal geometry of a flight information region."""
+
+    designator: str
+    name: str
+    shape: shapely.Polygon | shapely.MultiPolygon
+
+
+# GB FIRs loaded in this process, by cache path
+_GB_AIRSPACES: dict[Path, list[FlightInformationRegion]] = {}
+
+
+def get_gb_airspaces(cache_path: Path | None = None) -> list[FlightInformationRegion]:
+    """Retrieve airspace data for Great Britain FIRs.
+
+    The FIRs are read from a parquet cache of their names and WKB geometries, which is built from
+    `traffic.data.eurofirs` on first use, and are kept in memory for the rest of the process.
+
+    Args:
+        cache_path: Path of the parquet cache, defaults to `GB_AIRSPACES_CACHE_PATH`.
+
+    Returns:
+        List of the GB FIRs.
+    """
+    cache_path = GB_AIRSPACES_CACHE_PATH if cache_path is None else cache_path
+    if cache_path not in _GB_AIRSPACES:
+        if cache_path.exists():
+            _GB_AIRSPACES[cache_path] = read_airspaces(cache_path)
+        else:
+            return refresh_gb_airspaces(cache_path)
+    return _GB_AIRSPACES[cache_path]
+
+
+def refresh_gb_airspaces(cache_path: Path | None = None) -> list[FlightInformationRegion]:
+    """Rebuild the cache of the GB FIRs from `traffic.data.eurofirs`.
+
+    Args:
+        cache_path: Path of the parquet cache, defaults to `GB_AIRSPACES_CACHE_PATH`.
 
-def get_gb_airspaces() -> list:  # type: ignore[type-arg]
-    """Retrieve airspace data for Great Britain FIRs."""
-    # Select FIRs by their 'designator' attribute
-    selected = []
+    Returns:
+        List of the GB FIRs.
+    """
+    # importing traffic takes seconds, so it is only imported to build the cache
+    from traffic.data import eurofirs  # noqa: PLC0415
+
+    cache_path = GB_AIRSPACES_CACHE_PATH if cache_path is None else cache_path
+    # Select FIRs by their 'designator' attribute, skipping FIRs without one
+    gb_airspaces = []
     for fir in eurofirs:
-        if getattr(fir, "designator", None) in ["EGTT", "EGPX", "EGGX"]:
-            selected.append(fir)  # noqa: PERF401
-    return selected
+        designator = getattr(fir, "designator", None)
+        if designator is None or designator not in GB_FIR_DESIGNATORS:
+            continue
+        if not isinstance(fir.shape, shapely.Polygon | shapely.MultiPolygon):
+            msg = f"FIR {designator} has a {fir.shape.geom_type} shape, not a polygon"
+            raise TypeError(msg)
+        gb_airspaces.append(FlightInformationRegion(designator, fir.name, fir.shape))
+    write_airspaces(gb_airspaces, cache_path)
+    logger.info("Saved %d GB FIRs to %s", len(gb_airspaces), cache_path)
+    _GB_AIRSPACES[cache_path] = gb_airspaces
+    return gb_airspaces
 
 
-def find_uk_airspace_of_flight_segment(
-    flight_dataframe: pl.DataFrame,
-) -> pl.DataFrame:
-    """Check if a given flight segment is within any of the UK airspaces."""
-    gb_airspaces = get_gb_airspaces()
-    # remove datapoints outside of UK environment
-    flight_dataframe_within_uk = flight_dataframe.filter(
-        pl.col("longitude").is_between(
-            ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lon_min"], ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lon_max"]
-        )
-        & pl.col("latitude").is_between(
-            ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lat_min"], ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lat_max"]
+def write_airspaces(airspaces: list[FlightInformationRegion], path: Path) -> None:
+    """Write airspaces to a parquet file of designators, names and WKB geometries."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write then rename, so concurrent processes never read a partly written file
+    temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+    pl.DataFrame(
+        {
+            "designator": [airspace.designator for airspace in airspaces],
+            "name": [airspace.name for airspace in airspaces],
+            "geometry": [shapely.to_wkb(airspace.shape) for airspace in airspaces],
+        },
+        schema={"designator": pl.String, "name": pl.String, "geometry": pl.Binary},
+    ).write_parquet(temporary_path)
+    temporary_path.replace(path)
+
+
+def read_airspaces(path: Path) -> list[FlightInformationRegion]:
+    """Read airspaces written by `write_airspaces`, in the same order."""
+    airspace_dataframe = pl.read_parquet(path)
+    shapes = shapely.from_wkb(airspace_dataframe["geometry"].to_numpy())
+    return [
+        FlightInformationRegion(designator, name, shape)
+        for designator, name, shape in zip(
+            airspace_dataframe["designator"], airspace_dataframe["name"], shapes, strict=True
         )
-    )
-    # add airspace information to dataframe
-    datapoints_within_uk = find_airspace_of_flight_segment(flight_dataframe_within_uk, gb_airspaces)
-
-    flight_dataframe_outside_uk = flight_dataframe.filter(
-        ~(
-            pl.col("longitude").is_between(
-                ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lon_min"],
-                ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lon_max"],
-            )
-            & pl.col("latitude").is_between(
-                ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lat_min"],
-                ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lat_max"],
-            )
+    ]
+
+
+def find_uk_airspace_of_flight_segment[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+    raster_resolution: float | None = DEFAULT_AIRSPACE_RASTER_RESOLUTION,
+    airspaces: list[FlightInformationRegion] | None = None,
+) -> FlightFrame:
+    """Check if a given flight segment is within any of the UK airspaces.
+
+    Adds a categorical 'airspace' column in a single pass, keeping the row order. Only the
+    datapoints within the UK environment bounds are classified, the others have no airspace. Works
+    on LazyFrames, so it can run inside a streaming plan.
+
+    Args:
+        flight_dataframe: Flight dataframe with longitude and latitude columns.
+        raster_resolution: Cell size in degrees of the cached airspace raster used to classify
+            points, or None to test every point against the airspace polygons.
+        airspaces: Airspaces to classify points into, defaults to the GB FIRs.
+
+    Returns:
+        Flight dataframe with an additional 'airspace' column.
+    """
+    airspaces = get_gb_airspaces() if airspaces is None else airspaces
+    index_of_airspace: Callable[[np.ndarray, np.ndarray], np.ndarray]
+    if raster_resolution is None:
+        index_of_airspace = partial(_index_of_airspace_of_points, airspaces=airspaces)
+    else:
+        index_of_airspace = load_or_build_airspace_raster(
+            airspaces, raster_resolution
+        ).index_of_airspace
+
+    return flight_dataframe.with_columns(
+        pl.struct("longitude", "latitude")
+        .map_batches(
+            partial(
+                _uk_airspace_of_coordinates,
+                index_of_airspace=index_of_airspace,
+                airspaces=airspaces,
+            ),
+            return_dtype=pl.Categorical,
+            is_elementwise=True,
         )
-    )
-    # add airspace column with None for datapoints outside of UK environment
-    flight_dataframe_outside_uk = flight_dataframe_outside_uk.with_columns(
-        pl.lit(None).alias("airspace")
+        .alias("airspace")
     )
 
-    # add airspace information to original dataframe, filling in None for datapoints outside of UK environment
-    return pl.concat(
-        [
-            datapoints_within_uk,
-            flight_dataframe_outside_uk,
-        ]
+
+def _uk_airspace_of_coordinates(
+    coordinates: pl.Series,
+    index_of_airspace: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    airspaces: list[FlightInformationRegion],
+) -> pl.Series:
+    """Classify the coordinates within the UK environment bounds and scatter back in row order."""
+    longitudes = coordinates.struct.field("longitude").to_numpy()
+    latitudes = coordinates.struct.field("latitude").to_numpy()
+    within_uk = (
+        (longitudes >= ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lon_min"])
+        & (longitudes <= ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lon_max"])
+        & (latitudes >= ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lat_min"])
+        & (latitudes <= ENVIRONMENTAL_BOUNDS_UK_AIRSPACE["lat_max"])
     )
+    airspace_index = np.full(longitudes.shape, -1, dtype=np.int64)
+    airspace_index[within_uk] = index_of_airspace(longitudes[within_uk], latitudes[within_uk])
+    return _airspace_series_from_indices(airspace_index, airspaces)
 
 
 def find_airspace_of_flight_segment(
     flight_dataframe: pl.DataFrame,
-    airspaces: list,  # type: ignore[type-arg]
+    airspaces: list[FlightInformationRegion],
 ) -> pl.DataFrame:
     """Check if a given flight segment is within any of the provided airspaces.
 
     Args:
         flight_dataframe: Flight dataframe
-        airspaces: List of airspace objects with 'shape' attribute.
+        airspaces: List of airspaces to check, in order.
 
     Returns:
-        Polars DataFrame with an additional column 'airspace' indicating the name of the airspace
-        if the point is within any airspace, otherwise None.
+        Polars DataFrame with an additional categorical column 'airspace' indicating the name of
+        the airspace if the point is within any airspace, otherwise None.
     """
-    points = shapely.points(flight_dataframe["longitude"], flight_dataframe["latitude"])
-
     # add new column indicating the name of the airspace if the point is within any airspace
     return flight_dataframe.with_columns(
-        pl.Series("airspace", name_of_airspace_of_point(points, airspaces))  # type: ignore[arg-type]
+        classify_airspace_of_points(
+            flight_dataframe["longitude"].to_numpy(),
+            flight_dataframe["latitude"].to_numpy(),
+            airspaces,
+        )
     )
 
 
-def name_of_airspace_of_point(points: list[shapely.Point], airspaces: list) -> list[str | None]:  # type: ignore[type-arg]
+def classify_airspace_of_points(
+    longitudes: np.ndarray,
+    latitudes: np.ndarray,
+    airspaces: list[FlightInformationRegion],
+) -> pl.Series:
+    """Find the name of the airspace containing each point, testing all points at once.
+
+    Each airspace shape is prepared and tested against the coordinate arrays with
+    `shapely.contains_xy`, only for the points not already found in an earlier airspace. Gives the
+    same names as `name_of_airspace_of_point`.
+
+    Args:
+        longitudes: Longitudes of the points.
+        latitudes: Latitudes of the points.
+        airspaces: List of airspaces to check, in order.
+
+    Returns:
+        Categorical Series named 'airspace' with the name of the first airspace containing each
+        point, or None if the point is not in any airspace.
+    """
+    return _airspace_series_from_indices(
+        _index_of_airspace_of_points(longitudes, latitudes, airspaces), airspaces
+    )
+
+
+def _index_of_airspace_of_points(
+    longitudes: np.ndarray,
+    latitudes: np.ndarray,
+    airspaces: list[FlightInformationRegion],
+) -> np.ndarray:
+    """Find the index of the first airspace containing each point, -1 if there is none."""
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    airspace_index = np.full(longitudes.shape, -1, dtype=np.int64)
+
+    for index, airspace in enumerate(airspaces):
+        shapely.prepare(airspace.shape)
+        unassigned = np.flatnonzero(airspace_index == -1)
+        inside = shapely.contains_xy(airspace.shape, longitudes[unassigned], latitudes[unassigned])
+        airspace_index[unassigned[inside]] = index
+    return airspace_index
+
+
+def _airspace_series_from_indices(
+    airspace_index: np.ndarray,
+    airspaces: list[FlightInformationRegion],
+) -> pl.Series:
+    """Categorical 'airspace' Series of airspace names from airspace indices, -1 is None."""
+    airspace_names = pl.Series(
+        "airspace", [airspace.name for airspace in airspaces], dtype=pl.Categorical
+    )
+    return airspace_names.gather(pl.Series(airspace_index).replace(-1, None))
+
+
+@dataclass(frozen=True)
+class AirspaceRaster:
+    """Grid of airspace indices over a bounding box, for classifying points by array lookups.
+
+    Cells inside a single airspace hold its index plus one, cells outside every airspace hold
+    `RASTER_NO_AIRSPACE`, and cells crossed by an airspace boundary hold `RASTER_BOUNDARY`. Points
+    in boundary cells or outside the raster fall back to exact polygon tests.
+    """
+
+    mask: np.ndarray  # uint8 array of shape (number of latitude cells, number of longitude cells)
+    airspaces: list[FlightInformationRegion]
+    resolution: float
+    lon_min: float
+    lat_min: float
+
+    def classify(self, longitudes: np.ndarray, latitudes: np.ndarray) -> pl.Series:
+        """Find the name of the airspace containing each point.
+
+        Args:
+            longitudes: Longitudes of the points.
+            latitudes: Latitudes of the points.
+
+        Returns:
+            Categorical Series named 'airspace', the same as `classify_airspace_of_points`.
+        """
+        return _airspace_series_from_indices(
+            self.index_of_airspace(longitudes, latitudes), self.airspaces
+        )
+
+    def index_of_airspace(self, longitudes: np.ndarray, latitudes: np.ndarray) -> np.ndarray:
+        """Find the index of the airspace containing each point, -1 if there is none."""
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        number_of_lat_cells, number_of_lon_cells = self.mask.shape
+        lon_index = np.floor((longitudes - self.lon_min) / self.resolution)
+        lat_index = np.floor((latitudes - self.lat_min) / self.resolution)
+        in_raster = (
+            (lon_index >= 0)
+            & (lon_index < number_of_lon_cells)
+            & (lat_index >= 0)
+            & (lat_index < number_of_lat_cells)
+        )
+
+        cell_values = np.full(longitudes.shape, RASTER_BOUNDARY, dtype=np.uint8)
+        cell_values[in_raster] = self.mask[
+            lat_index[in_raster].astype(np.int64), lon_index[in_raster].astype(np.int64)
+        ]
+        airspace_index = cell_values.astype(np.int64) - 1
+
+        needs_exact_test = np.flatnonzero(cell_values == RASTER_BOUNDARY)
+        airspace_index[needs_exact_test] = _index_of_airspace_of_points(
+            longitudes[needs_exact_test], latitudes[needs_exact_test], self.airspaces
+        )
+        return airspace_index
+
+
+def build_airspace_raster(
+    airspaces: list[FlightInformationRegion],
+    resolution: float = DEFAULT_AIRSPACE_RASTER_RESOLUTION,
+    bounds: dict[str, float] = ENVIRONMENTAL_BOUNDS_UK_AIRSPACE,
+) -> AirspaceRaster:
+    """Rasterize airspaces over a bounding box.
+
+    Boundary cells are found from the airspace boundaries, densified to vertices at most half a
+    cell apart, by marking the cells holding a vertex and their neighbours. Every other cell lies
+    inside or outside each airspace as a whole and is classified by its centre.
+
+    Args:
+        airspaces: List of airspaces to check, in order.
+        resolution: Cell size in degrees.
+        bounds: Bounding box with lat_min, lat_max, lon_min and lon_max keys.
+
+    Returns:
+        AirspaceRaster over the bounding box.
+    """
+    if len(airspaces) >= RASTER_BOUNDARY:
+        msg = f"An airspace raster holds at most {RASTER_BOUNDARY - 1} airspaces."
+        raise ValueError(msg)
+    # round before ceil so floating point error does not add a cell
+    number_of_lon_cells = int(
+        np.ceil(round((bounds["lon_max"] - bounds["lon_min"]) / resolution, 9))
+    )
+    number_of_lat_cells = int(
+        np.ceil(round((bounds["lat_max"] - bounds["lat_min"]) / resolution, 9))
+    )
+
+    # boundary vertices marked in a raster padded by one cell, then dilated to their neighbours
+    padded_boundary_vertices = np.zeros((number_of_lat_cells + 2, number_of_lon_cells + 2), bool)
+    for airspace in airspaces:
+        vertices = shapely.get_coordinates(
+            shapely.segmentize(shapely.boundary(airspace.shape), resolution / 2)
+        )
+        lon_index = np.floor((vertices[:, 0] - bounds["lon_min"]) / resolution).astype(np.int64) + 1
+        lat_index = np.floor((vertices[:, 1] - bounds["lat_min"]) / resolution).astype(np.int64) + 1
+        in_padded_raster = (
+            (lon_index >= 0)
+            & (lon_index < number_of_lon_cells + 2)
+            & (lat_index >= 0)
+            & (lat_index < number_of_lat_cells + 2)
+        )
+        padded_boundary_vertices[lat_index[in_padded_raster], lon_index[in_padded_raster]] = True
+    is_boundary = np.zeros((number_of_lat_cells, number_of_lon_cells), bool)
+    for lat_offset in range(3):
+        for lon_offset in range(3):
+            is_boundary |= padded_boundary_vertices[
+                lat_offset : lat_offset + number_of_lat_cells,
+                lon_offset : lon_offset + number_of_lon_cells,
+            ]
+
+    mask = np.full(is_boundary.shape, RASTER_BOUNDARY, dtype=np.uint8)
+    lat_index, lon_index = np.nonzero(~is_boundary)
+    mask[lat_index, lon_index] = (
+        _index_of_airspace_of_points(
+            bounds["lon_min"] + (lon_index + 0.5) * resolution,
+            bounds["lat_min"] + (lat_index + 0.5) * resolution,
+            airspaces,
+        )
+        + 1
+    )
+    return AirspaceRaster(mask, airspaces, resolution, bounds["lon_min"], bounds["lat_min"])
+
+
+# Airspace rasters loaded in this process, by hash of their airspaces, resolution and bounds
+_AIRSPACE_RASTERS: dict[str, AirspaceRaster] = {}
+
+
+def load_or_build_airspace_raster(
+    airspaces: list[FlightInformationRegion],
+    resolution: float = DEFAULT_AIRSPACE_RASTER_RESOLUTION,
+    bounds: dict[str, float] = ENVIRONMENTAL_BOUNDS_UK_AIRSPACE,
+    cache_directory: Path = AIRSPACE_DATA_DIRECTORY,
+) -> AirspaceRaster:
+    """Load an airspace raster from the disk cache, building and saving it on the first use.
+
+    The cache file name holds a hash of the airspace names and geometries, the resolution and the
+    bounds, so a raster is rebuilt whenever the FIR geometries change.
+
+    Args:
+        airspaces: List of airspaces to check, in order.
+        resolution: Cell size in degrees.
+        bounds: Bounding box with lat_min, lat_max, lon_min and lon_max keys.
+        cache_directory: Directory of the cached raster files.
+
+    Returns:
+        AirspaceRaster over the bounding box.
+    """
+    digest = hashlib.sha256(repr((resolution, sorted(bounds.items()))).encode())
+    for airspace in airspaces:
+        digest.update(airspace.name.encode())
+        digest.update(shapely.to_wkb(airspace.shape))
+    raster_hash = digest.hexdigest()[:16]
+    if raster_hash in _AIRSPACE_RASTERS:
+        return _AIRSPACE_RASTERS[raster_hash]
+
+    cache_path = cache_directory / f"airspace_raster_{raster_hash}.npy"
+    if cache_path.exists():
+        raster = AirspaceRaster(
+            np.load(cache_path), airspaces, resolution, bounds["lon_min"], bounds["lat_min"]
+        )
+    else:
+        start = default_timer()
+        raster = build_airspace_raster(airspaces, resolution, bounds)
+        cache_directory.mkdir(parents=True, exist_ok=True)
+        # write then rename, so concurrent processes never read a partly written file
+        temporary_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with temporary_path.open("wb") as file:
+            np.save(file, raster.mask)
+        temporary_path.replace(cache_path)
+        logger.info(
+            "Built airspace raster of shape %s in %.1f s, saved to %s",
+            raster.mask.shape,
+            default_timer() - start,
+            cache_path,
+        )
+    _AIRSPACE_RASTERS[raster_hash] = raster
+    return raster
+
+
+def name_of_airspace_of_point(
+    points: list[shapely.Point], airspaces: list[FlightInformationRegion]
+) -> list[str | None]:
     """Check if points are within any of the provided airspaces.
 
     Args:
         points: List of shapely Points to check.
-        airspaces: List of airspace objects with 'shape' attribute.
+        airspaces: List of airspaces to check, in order.
 
     Returns:
         List of airspace names or None if the point is not in any airspace.
@@ -104,7 +468,7 @@ def name_of_airspace_of_point(points: list[shapely.Point], airspaces: list) -> l
         found_name = None
         for airspace in airspaces:
             if shapely.contains(airspace.shape, point):
-                found_name = getattr(airspace, "name", "?")
+                found_name = airspace.name
                 break
         names.append(found_name)
     return names
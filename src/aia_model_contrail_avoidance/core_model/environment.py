@@ -3,35 +3,107 @@
 from __future__ import annotations
 
 __all__ = (
+    "EnvironmentInterpolation",
+    "calculate_energy_forcing_per_flight",
     "calculate_total_energy_forcing",
     "create_grid_environment",
+    "energy_forcing_aggregations",
     "run_flight_data_through_environment",
+    "total_energy_forcing_aggregation",
 )
+import enum
+
 import polars as pl
 import xarray as xr
 
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridLookup
+
 # Conversion factor from nautical miles to meters
 NAUTICAL_MILES_TO_METERS = 1852.0
 
 
+class EnvironmentInterpolation(enum.Enum):
+    """Enum for selecting how environment values are sampled at flight datapoints."""
+
+    NEAREST = "nearest"
+    LINEAR = "linear"
+
+
+def total_energy_forcing_aggregation() -> pl.Expr:
+    """Aggregation of the total energy forcing of a flight, which needs only the ef column."""
+    # accumulates in Float64 for the Float32 ef column of the compact schema profile
+    return pl.col("ef").cast(pl.Float64).sum().alias("total_energy_forcing")
+
+
+def energy_forcing_aggregations() -> list[pl.Expr]:
+    """Aggregations of the energy forcing summaries of a flight, for a group_by on flight_id.
+
+    Segments with positive energy forcing are counted as forming contrails.
+
+    Returns:
+        Aggregations of total_energy_forcing, distance_forming_contrails (nautical miles),
+            max_segment_energy_forcing and number_of_contrail_forming_segments, from the ef and
+            distance_flown_in_segment columns.
+    """
+    forms_contrail = pl.col("ef") > 0.0
+    return [
+        total_energy_forcing_aggregation(),
+        pl.col("distance_flown_in_segment")
+        .cast(pl.Float64)
+        .filter(forms_contrail)
+        .sum()
+        .alias("distance_forming_contrails"),
+        pl.col("ef").max().alias("max_segment_energy_forcing"),
+        forms_contrail.sum().alias("number_of_contrail_forming_segments"),
+    ]
+
+
 def calculate_total_energy_forcing(
     flight_id: int | list[int], flight_dataset_with_energy_forcing: pl.DataFrame
 ) -> float | list[float]:
-    """Calculates total energy forcing for a flight or list of flights."""
-    if isinstance(flight_id, int):
-        return float(
-            flight_dataset_with_energy_forcing.filter(pl.col("flight_id") == flight_id)["ef"].sum()
+    """Calculates total energy forcing for a flight or list of flights.
+
+    A reduction of the summaries of `calculate_energy_forcing_per_flight` over the requested
+    flights, flights without data have zero total energy forcing.
+    """
+    flight_ids = [flight_id] if isinstance(flight_id, int) else flight_id
+
+    energy_forcing_per_flight = calculate_energy_forcing_per_flight(
+        flight_dataset_with_energy_forcing.filter(pl.col("flight_id").is_in(flight_ids))
+    )
+    total_energy_forcing_by_flight_id = dict(
+        zip(
+            energy_forcing_per_flight["flight_id"],
+            energy_forcing_per_flight["total_energy_forcing"],
+            strict=True,
         )
+    )
+    total_energy_forcing_list = [
+        float(total_energy_forcing_by_flight_id.get(fid, 0.0)) for fid in flight_ids
+    ]
 
-    total_energy_forcing_list = []
-    for fid in flight_id:
-        total_energy_forcing = flight_dataset_with_energy_forcing.filter(
-            pl.col("flight_id") == fid
-        )["ef"].sum()
-        total_energy_forcing_list.append(total_energy_forcing)
+    if isinstance(flight_id, int):
+        return total_energy_forcing_list[0]
     return total_energy_forcing_list
 
 
+def calculate_energy_forcing_per_flight(
+    flight_dataset_with_energy_forcing: pl.DataFrame,
+) -> pl.DataFrame:
+    """Calculates energy forcing summaries for every flight in one grouped reduction.
+
+    Args:
+        flight_dataset_with_energy_forcing: DataFrame containing flight data with flight_id, ef and
+            distance_flown_in_segment columns.
+
+    Returns:
+        DataFrame with one row per flight_id and the columns of `energy_forcing_aggregations`.
+    """
+    return flight_dataset_with_energy_forcing.group_by("flight_id").agg(
+        energy_forcing_aggregations()
+    )
+
+
 def create_grid_environment(environment_file_name: str) -> xr.DataArray:
     """Creates grid environment from COSIP grid data."""
     environment_dataset = xr.open_dataset(
@@ -46,47 +118,52 @@ def create_grid_environment(environment_file_name: str) -> xr.DataArray:
 
 
 def run_flight_data_through_environment(
-    flight_dataset: pl.DataFrame, environment: xr.DataArray
+    flight_dataset: pl.DataFrame,
+    environment: xr.DataArray | GridLookup,
+    interpolation: EnvironmentInterpolation = EnvironmentInterpolation.NEAREST,
 ) -> pl.DataFrame:
     """Runs flight data through environment to assign effective radiative forcing values.
 
+    Each datapoint takes the energy forcing per meter of the nearest grid point, or a linear
+    interpolation in longitude, latitude, pressure level and time. The lookup indexes directly into
+    a NumPy copy of the grid. A DataArray is copied on every call, so to run several datasets
+    through the same environment build its GridLookup once and pass that instead.
+
     Args:
         flight_dataset: DataFrame containing flight data with latitude, longitude, timestamp, and
             flight level.
-        environment: xarray DataArray containing environmental data with energy forcing per meter
-            values.
+        environment: GridLookup, or xarray DataArray to build one from, containing environmental
+            data with energy forcing per meter values.
+        interpolation: How to sample the environment at each datapoint.
 
     """
     flight_dataset = flight_dataset.clone()
-
-    longitude_vector = xr.DataArray(flight_dataset["longitude"].to_numpy(), dims=["points"])
-    latitude_vector = xr.DataArray(flight_dataset["latitude"].to_numpy(), dims=["points"])
+    if not isinstance(environment, GridLookup):
+        environment = GridLookup.from_data_array(environment)
 
     # Convert flight level (in hundreds of feet) to pressure altitude (hPa) using standard atmosphere
     # Flight Level 250 = 25,000 feet
+    # Float64 so Int16 flight levels of the compact schema profile do not overflow
     flight_level_feet = (
-        flight_dataset["flight_level"].to_numpy() * 100
+        flight_dataset["flight_level"].cast(pl.Float64).to_numpy() * 100
     )  # Convert from FL units to feet
     flight_level_meters = flight_level_feet * 0.3048  # Convert feet to meters
     # Barometric formula: P = P0 * (1 - L*h/T0)^(g*M/R/L)
     flight_level_hpa = 1013.25 * (1 - 0.0065 * flight_level_meters / 288.15) ** 5.255
-    flight_level_vector = xr.DataArray(flight_level_hpa, dims=["points"])
 
-    time_vector = xr.DataArray(flight_dataset["timestamp"].to_numpy(), dims=["points"])
-
-    distance_flown_in_segment_vector = (
-        xr.DataArray(flight_dataset["distance_flown_in_segment"].to_numpy(), dims=["points"])
-        * NAUTICAL_MILES_TO_METERS
-    )
-
-    nearest_environment = environment.sel(
-        longitude=longitude_vector,
-        latitude=latitude_vector,
-        level=flight_level_vector,
-        time=time_vector,
-        method="nearest",
+    coordinates = {
+        "longitude": flight_dataset["longitude"].to_numpy(),
+        "latitude": flight_dataset["latitude"].to_numpy(),
+        "level": flight_level_hpa,
+        "time": flight_dataset["timestamp"].to_numpy(),
+    }
+    if interpolation is EnvironmentInterpolation.LINEAR:
+        sampled_environment = environment.sample_linear(coordinates)
+    else:
+        sampled_environment = environment.sample_nearest(coordinates)
+
+    ef_values = sampled_environment.astype(float) * (
+        flight_dataset["distance_flown_in_segment"].to_numpy() * NAUTICAL_MILES_TO_METERS
     )
 
-    ef_values = nearest_environment.astype(float) * distance_flown_in_segment_vector
-
-    return flight_dataset.with_columns(pl.Series("ef", ef_values.values))
+    return flight_dataset.with_columns(pl.Series("ef", ef_values))
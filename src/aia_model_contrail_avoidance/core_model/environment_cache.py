@@ -0,0 +1,142 @@
+"""Process-level cache of loaded energy forcing environments."""
+
+from __future__ import annotations
+
+__all__ = ("ENVIRONMENT_CACHE", "EnvironmentCache")
+
+import logging
+from collections import OrderedDict
+from timeit import default_timer
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from aia_model_contrail_avoidance.core_model.environment import create_grid_environment
+from aia_model_contrail_avoidance.core_model.environment_store import (
+    ENERGY_FORCING_DATA_DIRECTORY,
+    environment_file_path,
+    is_memory_mapped_environment_current,
+    load_memory_mapped_environment,
+)
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridLookup
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Memory budget for environments held in memory, memory-mapped environments do not count
+DEFAULT_MEMORY_BUDGET_BYTES = 8 * 1024**3
+
+
+class EnvironmentCache:
+    """Least recently used cache of environment lookups keyed by NetCDF path and modification time.
+
+    Environments are loaded from their NetCDF file, or on request from a memory-mapped store in
+    the energy forcing data directory (see `environment_store`) converted from the current NetCDF
+    file. Rewriting the NetCDF file changes its modification time, so the stale entry is reloaded
+    on the next request and a store converted before the rewrite is ignored. Use
+    `ENVIRONMENT_CACHE` to share environments between every caller in a process.
+    """
+
+    def __init__(self, memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES) -> None:
+        """Create an empty cache.
+
+        Args:
+            memory_budget_bytes: Maximum total size of the in-memory environment values. Least
+                recently used environments are evicted to stay within it.
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+        self._environments: OrderedDict[tuple[Path, int, bool], GridLookup] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Number of cached environments."""
+        return len(self._environments)
+
+    @property
+    def memory_usage_bytes(self) -> int:
+        """Total size of the in-memory values of the cached environments."""
+        return sum(_memory_usage_bytes(environment) for environment in self._environments.values())
+
+    def get(self, environment_file_name: str, *, memory_mapped: bool = False) -> GridLookup:
+        """Get the environment for a file name, loading it on a cache miss.
+
+        Args:
+            environment_file_name: Name of the environment in the energy forcing data directory,
+                without the `.nc` extension.
+            memory_mapped: Load the memory-mapped store of the environment instead of the NetCDF
+                file. Falls back to the NetCDF file if the store is missing or stale.
+
+        Returns:
+            GridLookup over the environment.
+        """
+        # resolved, so the same name in another working directory is another environment
+        environment_path = environment_file_path(environment_file_name).resolve()
+        key = (environment_path, environment_path.stat().st_mtime_ns, memory_mapped)
+        if key in self._environments:
+            self._environments.move_to_end(key)
+            self.hits += 1
+            logger.info("Environment cache hit: %s", environment_file_name)
+            return self._environments[key]
+
+        self.misses += 1
+        for stale_key in [
+            k for k in self._environments if k[0] == environment_path and k[1] != key[1]
+        ]:
+            del self._environments[stale_key]
+
+        start = default_timer()
+        environment = _load_environment(environment_file_name, memory_mapped=memory_mapped)
+        logger.info(
+            "Environment cache miss: loaded %s in %.2f s",
+            environment_file_name,
+            default_timer() - start,
+        )
+
+        size = _memory_usage_bytes(environment)
+        if size > self.memory_budget_bytes:
+            logger.warning(
+                "Environment %s (%d bytes) exceeds the cache memory budget, not caching it.",
+                environment_file_name,
+                size,
+            )
+            return environment
+        while self._environments and self.memory_usage_bytes + size > self.memory_budget_bytes:
+            evicted_key, _ = self._environments.popitem(last=False)
+            logger.info("Evicted environment %s from cache", evicted_key[0].name)
+        self._environments[key] = environment
+        return environment
+
+    def clear(self) -> None:
+        """Remove all cached environments."""
+        self._environments.clear()
+
+
+def _memory_usage_bytes(environment: GridLookup) -> int:
+    """Size of the values held in memory, zero for memory-mapped values."""
+    return 0 if isinstance(environment.values, np.memmap) else int(environment.values.nbytes)
+
+
+def _load_environment(environment_file_name: str, *, memory_mapped: bool) -> GridLookup:
+    """Load an environment from its NetCDF file, or its memory-mapped store if requested and current."""
+    if memory_mapped:
+        store_directory = ENERGY_FORCING_DATA_DIRECTORY / environment_file_name
+        if is_memory_mapped_environment_current(
+            store_directory, environment_file_path(environment_file_name)
+        ):
+            return load_memory_mapped_environment(store_directory)
+        logger.warning(
+            "Loading %s from its NetCDF file, the memory-mapped store %s is missing or stale.",
+            environment_file_name,
+            store_directory,
+        )
+    environment = create_grid_environment(environment_file_name)
+    lookup = GridLookup.from_data_array(environment)
+    environment.close()
+    return lookup
+
+
+# Environments of this process, shared by every run in it and by the days a worker process handles
+ENVIRONMENT_CACHE = EnvironmentCache()
@@ -0,0 +1,190 @@
+"""Memory-mapped store of gridded energy forcing environments."""
+
+from __future__ import annotations
+
+__all__ = (
+    "convert_grid_environment_to_memory_map",
+    "environment_file_path",
+    "is_memory_mapped_environment_current",
+    "load_memory_mapped_environment",
+    "source_fingerprint",
+    "write_memory_mapped_environment",
+)
+
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from aia_model_contrail_avoidance.core_model.environment import create_grid_environment
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridAxis, GridLookup
+
+if TYPE_CHECKING:
+    import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+ENERGY_FORCING_DATA_DIRECTORY = Path("data/energy_forcing_data")
+VALUES_FILE_NAME = "values.npy"
+METADATA_FILE_NAME = "metadata.json"
+# Time is the slowest varying dimension, so the flights of one day only touch the pages of the
+# grid covering that day
+STORE_DIMENSION_ORDER = ("time", "level", "latitude", "longitude")
+# Number of time steps read from the source and written to the store at once
+DEFAULT_TIME_CHUNK_SIZE = 24
+
+
+def environment_file_path(environment_file_name: str) -> Path:
+    """Path of a CoCiP grid NetCDF file in the energy forcing data directory."""
+    return ENERGY_FORCING_DATA_DIRECTORY / f"{environment_file_name}.nc"
+
+
+def source_fingerprint(source_path: str | Path) -> dict[str, str | int]:
+    """Resolved path and modification time in nanoseconds of the file a store is converted from."""
+    source_path = Path(source_path).resolve()
+    return {
+        "source_path": str(source_path),
+        "source_modification_time_ns": source_path.stat().st_mtime_ns,
+    }
+
+
+def write_memory_mapped_environment(
+    environment: xr.DataArray,
+    store_directory: str | Path,
+    time_chunk_size: int = DEFAULT_TIME_CHUNK_SIZE,
+    source_path: str | Path | None = None,
+) -> None:
+    """Write a gridded environment to a directory of raw `.npy` files that can be memory-mapped.
+
+    The directory holds the values in time, level, latitude, longitude order with increasing
+    coordinates, one `.npy` sidecar per coordinate and a JSON metadata file. The values are
+    copied one block of time steps at a time, so the environment is never fully in memory.
+
+    The store is written to a temporary sibling directory and then moved into place, so an
+    interrupted write never leaves a partial store, and processes that have the values of a
+    previous store mapped keep reading the previous, unlinked, files.
+
+    Args:
+        environment: Gridded DataArray with longitude, latitude, level and time dimensions.
+        store_directory: Directory to write the store to, replaced if it exists.
+        time_chunk_size: Number of time steps copied at once.
+        source_path: File the environment was read from, whose path and modification time are
+            recorded in the metadata so a store older than its source can be detected.
+    """
+    store_directory = Path(store_directory)
+    store_directory.parent.mkdir(parents=True, exist_ok=True)
+    temporary_directory = store_directory.with_name(f".{store_directory.name}.{os.getpid()}.tmp")
+    shutil.rmtree(temporary_directory, ignore_errors=True)
+    temporary_directory.mkdir()
+    environment = environment.transpose(*STORE_DIMENSION_ORDER).sortby(list(STORE_DIMENSION_ORDER))
+
+    values = np.lib.format.open_memmap(
+        temporary_directory / VALUES_FILE_NAME,
+        mode="w+",
+        dtype=environment.dtype,
+        shape=environment.shape,
+    )
+    has_missing_values = False
+    for start in range(0, environment.sizes["time"], time_chunk_size):
+        time_slice = slice(start, start + time_chunk_size)
+        chunk = environment.isel(time=time_slice).to_numpy()
+        values[time_slice] = chunk
+        if np.issubdtype(chunk.dtype, np.floating):
+            has_missing_values = has_missing_values or bool(np.isnan(chunk).any())
+    values.flush()
+    del values
+
+    for dim in STORE_DIMENSION_ORDER:
+        np.save(temporary_directory / f"{dim}.npy", environment[dim].to_numpy())
+    metadata = {
+        "name": environment.name,
+        "dims": list(STORE_DIMENSION_ORDER),
+        "shape": list(environment.shape),
+        "dtype": str(environment.dtype),
+        "has_missing_values": has_missing_values,
+        **(source_fingerprint(source_path) if source_path is not None else {}),
+    }
+    (temporary_directory / METADATA_FILE_NAME).write_text(json.dumps(metadata, indent=2))
+
+    # a directory can only replace an empty one, so move the previous store aside first
+    previous_directory = store_directory.with_name(f".{store_directory.name}.{os.getpid()}.old")
+    if store_directory.exists():
+        store_directory.replace(previous_directory)
+    temporary_directory.replace(store_directory)
+    shutil.rmtree(previous_directory, ignore_errors=True)
+    logger.info(
+        "Wrote memory-mapped environment of shape %s to %s", environment.shape, store_directory
+    )
+
+
+def convert_grid_environment_to_memory_map(
+    environment_file_name: str,
+    store_directory: str | Path | None = None,
+    time_chunk_size: int = DEFAULT_TIME_CHUNK_SIZE,
+) -> Path:
+    """Convert a CoCiP grid NetCDF file from the energy forcing data directory to a memory map.
+
+    Args:
+        environment_file_name: Name of the NetCDF file without the `.nc` extension.
+        store_directory: Directory to write the store to, defaults to a directory with the same
+            name as the NetCDF file in the energy forcing data directory.
+        time_chunk_size: Number of time steps copied at once.
+
+    Returns:
+        Path of the store directory.
+    """
+    if store_directory is None:
+        store_directory = ENERGY_FORCING_DATA_DIRECTORY / environment_file_name
+    environment = create_grid_environment(environment_file_name)
+    write_memory_mapped_environment(
+        environment,
+        store_directory,
+        time_chunk_size,
+        source_path=environment_file_path(environment_file_name),
+    )
+    environment.close()
+    return Path(store_directory)
+
+
+def is_memory_mapped_environment_current(
+    store_directory: str | Path, source_path: str | Path
+) -> bool:
+    """Whether a store exists and was converted from the current version of its source file.
+
+    Args:
+        store_directory: Directory written by `write_memory_mapped_environment`.
+        source_path: File the store should have been converted from.
+
+    Returns:
+        True if the store metadata records the resolved path and modification time of the source
+        file, False if there is no store, it has no source recorded, or the source has changed.
+    """
+    metadata_path = Path(store_directory) / METADATA_FILE_NAME
+    if not metadata_path.exists():
+        return False
+    metadata = json.loads(metadata_path.read_text())
+    expected = source_fingerprint(source_path)
+    return all(metadata.get(key) == value for key, value in expected.items())
+
+
+def load_memory_mapped_environment(store_directory: str | Path) -> GridLookup:
+    """Load an environment store as a GridLookup over read-only memory-mapped values.
+
+    Only the pages of the values touched by lookups are read from disk, and processes loading the
+    same store share the pages in the operating system page cache.
+
+    Args:
+        store_directory: Directory written by `write_memory_mapped_environment`.
+
+    Returns:
+        GridLookup over the memory-mapped values.
+    """
+    store_directory = Path(store_directory)
+    metadata = json.loads((store_directory / METADATA_FILE_NAME).read_text())
+    values = np.load(store_directory / VALUES_FILE_NAME, mmap_mode="r")
+    axes = {dim: GridAxis(np.load(store_directory / f"{dim}.npy")) for dim in metadata["dims"]}
+    return GridLookup(values, axes, has_missing_values=metadata["has_missing_values"])
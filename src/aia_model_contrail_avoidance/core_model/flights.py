@@ -2,7 +2,11 @@
 
 from __future__ import annotations
 
-__all__ = ("flight_distance_from_location", "flight_distance_from_location_vectorized")
+__all__ = (
+    "flight_distance_expression",
+    "flight_distance_from_location",
+    "flight_distance_from_location_vectorized",
+)
 
 import numpy as np
 import polars as pl
@@ -117,6 +121,39 @@ def flight_distance_from_location(
     return float(result[0]) if result.size == 1 else result
 
 
+def flight_distance_expression(
+    departure_latitude: pl.Expr,
+    departure_longitude: pl.Expr,
+    arrival_latitude: pl.Expr,
+    arrival_longitude: pl.Expr,
+) -> pl.Expr:
+    """Distance between columns of locations using the Haversine formula, as a polars expression.
+
+    The columnar counterpart of `flight_distance_from_location_vectorized`, evaluated by polars
+    without converting the columns to NumPy.
+
+    Args:
+        departure_latitude: Expression of departure latitudes in degrees.
+        departure_longitude: Expression of departure longitudes in degrees.
+        arrival_latitude: Expression of arrival latitudes in degrees.
+        arrival_longitude: Expression of arrival longitudes in degrees.
+
+    Returns:
+        Expression of distances in nautical miles, null where any location is null.
+    """
+    earth_radius = 3443.92  # Radius of the Earth in nautical miles
+
+    departure_latitude = departure_latitude.radians()
+    arrival_latitude = arrival_latitude.radians()
+    dlat = arrival_latitude - departure_latitude
+    dlon = arrival_longitude.radians() - departure_longitude.radians()
+    a = (dlat / 2).sin() ** 2 + departure_latitude.cos() * arrival_latitude.cos() * (
+        dlon / 2
+    ).sin() ** 2
+
+    return 2 * earth_radius * a.sqrt().arcsin()
+
+
 def read_ads_b_flight_dataframe() -> pl.DataFrame:
     """Read the pre-processed ADS-B flight data from a parquet file."""
     parquet_file = "data/contrails_model_data/2024_01_01_sample_processed.parquet"
@@ -0,0 +1,279 @@
+"""Direct-index lookup of values on a rectilinear environment grid."""
+
+from __future__ import annotations
+
+__all__ = ("GridAxis", "GridLookup")
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    import xarray as xr
+
+# Relative tolerance when checking whether a floating point axis has a constant spacing
+REGULAR_AXIS_TOLERANCE = 1e-9
+
+
+class GridAxis:
+    """Coordinates of one grid dimension, converted to indices by arithmetic or binary search.
+
+    Axes with constant spacing find the nearest coordinate arithmetically, other axes (such as
+    pressure levels) fall back to `np.searchsorted`. Datetime axes are handled as integer
+    nanoseconds. Ties between two coordinates go to the larger coordinate, and values outside the
+    axis go to the nearest end, the same as `xarray.DataArray.sel(method="nearest")`.
+    """
+
+    def __init__(self, coordinates: np.ndarray) -> None:
+        """Create an axis from increasing coordinate values.
+
+        Args:
+            coordinates: Strictly increasing numeric or datetime64 coordinate values.
+        """
+        self.is_datetime = np.issubdtype(coordinates.dtype, np.datetime64)
+        self.coordinates = self._as_numeric(coordinates)
+        if self.coordinates.size > 1 and not np.all(np.diff(self.coordinates) > 0):
+            msg = "Grid axis coordinates must be strictly increasing."
+            raise ValueError(msg)
+
+        self.start = self.coordinates[0]
+        self.step = self.coordinates[1] - self.coordinates[0] if len(self) > 1 else 0
+        steps = np.diff(self.coordinates)
+        if self.is_datetime:
+            self.is_regular = len(self) > 1 and bool(np.all(steps == self.step))
+        else:
+            self.is_regular = len(self) > 1 and bool(
+                np.allclose(steps, self.step, rtol=REGULAR_AXIS_TOLERANCE, atol=0.0)
+            )
+
+    def __len__(self) -> int:
+        """Number of coordinates on the axis."""
+        return int(self.coordinates.size)
+
+    def _as_numeric(self, values: np.ndarray) -> np.ndarray:
+        """Convert values to int64 nanoseconds for datetime axes and float64 otherwise."""
+        values = np.asarray(values)
+        if self.is_datetime:
+            return values.astype("datetime64[ns]").astype(np.int64)
+        return values.astype(np.float64)
+
+    def _datetime_offsets(self, values: np.ndarray) -> tuple[np.ndarray, int]:
+        """Offsets of datetime values from the start of a regular axis, and the step of the axis.
+
+        The offsets are in the unit of the values when the start and step are whole multiples of
+        it, which saves converting every value to nanoseconds, and in nanoseconds otherwise.
+        """
+        values = np.asarray(values)
+        if np.issubdtype(values.dtype, np.datetime64):
+            unit, count = np.datetime_data(values.dtype)
+            unit_nanoseconds = int(
+                np.array(count, dtype=f"timedelta64[{unit}]")
+                .astype("timedelta64[ns]")
+                .view(np.int64)
+            )
+            if self.start % unit_nanoseconds == 0 and self.step % unit_nanoseconds == 0:
+                offsets = values.view(np.int64) - self.start // unit_nanoseconds
+                return offsets, int(self.step // unit_nanoseconds)
+        return self._as_numeric(values) - self.start, int(self.step)
+
+    def nearest_indices(self, values: np.ndarray) -> np.ndarray:
+        """Find the index of the nearest coordinate for each value.
+
+        Args:
+            values: Values to look up, in the same units as the coordinates.
+
+        Returns:
+            Array of int64 indices into the axis.
+        """
+        if len(self) == 1:
+            return np.zeros(np.shape(values), dtype=np.int64)
+
+        if self.is_regular:
+            # in place, as each temporary array costs as much as the arithmetic on it
+            if self.is_datetime:
+                # integer arithmetic for floor(offset / step + 0.5) to keep nanosecond precision
+                indices, step = self._datetime_offsets(values)
+                indices *= 2
+                indices += step
+                indices //= 2 * step
+            else:
+                indices = np.subtract(values, self.start, dtype=np.float64)
+                indices /= self.step
+                indices += 0.5
+                np.floor(indices, out=indices)
+            np.clip(indices, 0, len(self) - 1, out=indices)
+            return indices.astype(np.int64, copy=False)
+
+        values = self._as_numeric(values)
+        right = np.clip(np.searchsorted(self.coordinates, values, side="left"), 1, len(self) - 1)
+        left = right - 1
+        use_left = (values - self.coordinates[left]) < (self.coordinates[right] - values)
+        return np.where(use_left, left, right).astype(np.int64)
+
+    def linear_weights(self, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Find the coordinate below each value and the fractional distance to the next one.
+
+        Values outside the axis are clamped to the nearest end.
+
+        Args:
+            values: Values to look up, in the same units as the coordinates.
+
+        Returns:
+            Tuple of the int64 index of the lower coordinate and the float64 weight of the upper
+            coordinate, between 0 and 1.
+        """
+        values = self._as_numeric(values)
+        if len(self) == 1:
+            return np.zeros(values.shape, dtype=np.int64), np.zeros(values.shape)
+
+        if self.is_regular:
+            position = (values - self.start) / self.step
+            lower = np.clip(np.floor(position), 0, len(self) - 2).astype(np.int64)
+            upper_weight = position - lower
+        else:
+            lower = np.clip(
+                np.searchsorted(self.coordinates, values, side="right") - 1, 0, len(self) - 2
+            )
+            upper_weight = (values - self.coordinates[lower]) / (
+                self.coordinates[lower + 1] - self.coordinates[lower]
+            )
+        return lower, np.clip(upper_weight, 0.0, 1.0)
+
+
+class GridLookup:
+    """Nearest-neighbour or linear sampling of a gridded DataArray by gathering from a NumPy array.
+
+    The grid values are copied once into a contiguous array with increasing coordinates, so each
+    lookup is index arithmetic plus a single gather, without building xarray indexes per call.
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        axes: Mapping[str, GridAxis],
+        *,
+        has_missing_values: bool | None = None,
+    ) -> None:
+        """Create a lookup from grid values and one axis per dimension.
+
+        Args:
+            values: Grid values with one array dimension per axis, in the same order as `axes`. May
+                be a read-only memory map.
+            axes: Mapping of dimension name to axis.
+            has_missing_values: Whether values contains NaN. Scans the values when None, pass it
+                for memory-mapped values to avoid reading the whole grid.
+        """
+        if values.shape != tuple(len(axis) for axis in axes.values()):
+            msg = "Grid values shape does not match the lengths of the axes."
+            raise ValueError(msg)
+        self.values = values
+        self.axes = dict(axes)
+        if has_missing_values is None:
+            has_missing_values = bool(
+                np.issubdtype(values.dtype, np.floating) and np.isnan(values).any()
+            )
+        self.has_missing_values = has_missing_values
+
+    @property
+    def dims(self) -> tuple[str, ...]:
+        """Names of the grid dimensions."""
+        return tuple(self.axes)
+
+    @classmethod
+    def from_data_array(cls, data_array: xr.DataArray) -> GridLookup:
+        """Create a lookup from a DataArray with a coordinate for each dimension.
+
+        Dimensions with decreasing coordinates are flipped so every axis is increasing.
+
+        Args:
+            data_array: Gridded DataArray, for example the output of `create_grid_environment`.
+
+        Returns:
+            GridLookup over the values of the DataArray.
+        """
+        data_array = data_array.sortby(list(data_array.dims))
+        axes = {str(dim): GridAxis(data_array[dim].to_numpy()) for dim in data_array.dims}
+        return cls(np.ascontiguousarray(data_array.to_numpy()), axes)
+
+    def nearest_indices(self, coordinates: Mapping[str, np.ndarray]) -> tuple[np.ndarray, ...]:
+        """Find the indices of the nearest grid point for each point.
+
+        Args:
+            coordinates: Mapping of dimension name to an array of point coordinates. All arrays
+                have the same length.
+
+        Returns:
+            Tuple of index arrays, one per dimension, usable to index `values`.
+        """
+        self._check_coordinates(coordinates)
+        return tuple(axis.nearest_indices(coordinates[dim]) for dim, axis in self.axes.items())
+
+    def sample_nearest(self, coordinates: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Sample the grid value nearest to each point.
+
+        Args:
+            coordinates: Mapping of dimension name to an array of point coordinates. All arrays
+                have the same length.
+
+        Returns:
+            Array of grid values, one per point.
+        """
+        strides = np.cumprod((1, *self.values.shape[:0:-1]))[::-1]
+        *leading_indices, flat_index = self.nearest_indices(coordinates)
+        for indices, stride in zip(leading_indices, strides, strict=False):
+            flat_index += np.multiply(indices, stride, out=indices)
+        # one gather from the flat values is faster than indexing with an array per dimension
+        return self.values.reshape(-1).take(flat_index)
+
+    def sample_linear(self, coordinates: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Linearly interpolate the grid at each point.
+
+        Each point is a weighted sum over the corners of its grid cell, two per dimension. The
+        corner weights are built up as a tensor product one dimension at a time, and each corner is
+        a whole-array gather at a fixed offset from the flat index of the lower corner. When the
+        grid has missing values, corners with zero weight are skipped so points exactly on the grid
+        give the nearest value.
+
+        Args:
+            coordinates: Mapping of dimension name to an array of point coordinates. All arrays
+                have the same length.
+
+        Returns:
+            Array of float64 interpolated values, one per point.
+        """
+        self._check_coordinates(coordinates)
+        strides = np.cumprod((1, *self.values.shape[:0:-1]))[::-1]
+        flat_values = self.values.reshape(-1)
+
+        lower_flat_index: np.ndarray | int = 0
+        corners: list[tuple[int, np.ndarray | float]] = [(0, 1.0)]
+        for (dim, axis), stride in zip(self.axes.items(), strides, strict=True):
+            lower, upper_weight = axis.linear_weights(coordinates[dim])
+            lower_flat_index = lower_flat_index + lower * stride
+            upper_offset = int(stride) if len(axis) > 1 else 0
+            corners = [
+                (offset + corner_offset, weight * corner_weight)
+                for offset, weight in corners
+                for corner_offset, corner_weight in (
+                    (0, 1.0 - upper_weight),
+                    (upper_offset, upper_weight),
+                )
+            ]
+
+        interpolated = np.zeros(np.shape(lower_flat_index))
+        for offset, weight in corners:
+            corner_values = flat_values[lower_flat_index + offset]
+            if self.has_missing_values:
+                interpolated += np.where(weight > 0.0, weight * corner_values, 0.0)
+            else:
+                interpolated += weight * corner_values
+        return interpolated
+
+    def _check_coordinates(self, coordinates: Mapping[str, np.ndarray]) -> None:
+        """Raise a ValueError if a grid dimension has no coordinates."""
+        missing = set(self.axes) - set(coordinates)
+        if missing:
+            msg = f"Missing coordinates for grid dimensions: {sorted(missing)}"
+            raise ValueError(msg)
@@ -0,0 +1,251 @@
+"""Daily partitioned datasets of flight data, written as part files without appending."""
+
+from __future__ import annotations
+
+__all__ = (
+    "DAY_FILE_PREFIX",
+    "compact_day_partition",
+    "daily_flight_data_sources",
+    "day_partition_directories_in_date_order",
+    "day_partition_directory",
+    "day_partitions",
+    "remove_chunk_parts",
+    "remove_compacted_parts",
+    "write_day_partitions",
+)
+
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, cast
+
+import polars as pl
+
+from aia_model_contrail_avoidance.compact_schema import write_flight_parquet
+
+if TYPE_CHECKING:
+    import datetime
+
+    from polars.io.partition import FileProviderArgs
+
+logger = logging.getLogger(__name__)
+
+# Stem of the daily flight data files, followed by the zero padded ordinal day
+DAY_FILE_PREFIX = "UK_flights_day_"
+# Column with the ordinal day that the datasets are partitioned by
+DAY_COLUMN = "flight_day"
+# Suffix of the part file of a compacted day partition, after the last chunk index it contains
+COMPACTED_PART_FILE_SUFFIX = "-compacted.parquet"
+
+
+def day_partition_directory(dataset_dir: Path, day: int) -> Path:
+    """Directory of the part files of one ordinal day, `dataset_dir/day=NNN`."""
+    return dataset_dir / f"day={day:03d}"
+
+
+def day_partition_directories_in_date_order(dataset_dir: Path) -> list[Path]:
+    """Day partitions of a dataset with part files, in the order of the dates of their data.
+
+    The partitions are named after the ordinal day, so across the end of a year `day=001` of the
+    next year sorts before `day=366`. They are ordered by their earliest timestamp instead, read
+    from one part file as the days do not overlap.
+
+    Args:
+        dataset_dir: Directory of the partitioned dataset.
+
+    Returns:
+        Directories of the day partitions, from the earliest day to the latest.
+    """
+
+    def earliest_timestamp(day_directory: Path) -> datetime.datetime:
+        part_file = min(day_directory.glob("part-*.parquet"))
+        return cast(
+            "datetime.datetime",
+            pl.scan_parquet(part_file, hive_partitioning=False)
+            .select(pl.col("timestamp").min())
+            .collect()
+            .item(),
+        )
+
+    return sorted(
+        (
+            day_directory
+            for day_directory in dataset_dir.glob("day=*")
+            if any(day_directory.glob("part-*.parquet"))
+        ),
+        key=earliest_timestamp,
+    )
+
+
+def _part_file_name(chunk_index: int, index_in_partition: int = 0) -> str:
+    """Name of a part file written by one chunk, in the order the chunks were written."""
+    return f"part-{chunk_index:05d}-{index_in_partition:05d}.parquet"
+
+
+def _compacted_part_file_name(last_chunk_index: int) -> str:
+    """Name of the part file merged from the parts of the chunks up to last_chunk_index.
+
+    It sorts before the part files of later chunks, so the day reads back in time order.
+    """
+    return f"part-{last_chunk_index:05d}{COMPACTED_PART_FILE_SUFFIX}"
+
+
+def _chunk_index(part_file: Path) -> int:
+    """Index of the chunk of a part file, or of the last chunk merged into a compacted part file.
+
+    Part files without a chunk index in their name are taken to be from the first chunk.
+    """
+    chunk_index = part_file.name.removeprefix("part-").split("-")[0]
+    return int(chunk_index) if chunk_index.isdigit() else 0
+
+
+def write_day_partitions(
+    flight_dataframe: pl.DataFrame,
+    dataset_dir: Path,
+    chunk_index: int,
+    *,
+    compact: bool = False,
+    compression: Literal["lz4", "uncompressed", "snappy", "gzip", "brotli", "zstd"] = "zstd",
+) -> None:
+    """Write a chunk of flight data as a new part file in the partition of each of its days.
+
+    Existing part files are never read or rewritten, so writing a year of chunks is linear in the
+    size of the data.
+
+    Args:
+        flight_dataframe: DataFrame of flight data with a flight_day column.
+        dataset_dir: Directory of the partitioned dataset.
+        chunk_index: Index of the chunk, which orders the part files of a day.
+        compact: If True, write the compact ICAO encoding, see `write_flight_parquet`.
+        compression: Parquet compression codec.
+    """
+    for (day,), day_dataframe in flight_dataframe.partition_by(DAY_COLUMN, as_dict=True).items():
+        day_directory = day_partition_directory(dataset_dir, day)
+        day_directory.mkdir(parents=True, exist_ok=True)
+        write_flight_parquet(
+            day_dataframe,
+            day_directory / _part_file_name(chunk_index),
+            compact=compact,
+            compression=compression,
+        )
+
+
+def day_partitions(dataset_dir: Path, chunk_index: int) -> pl.PartitionBy:
+    """Partitioning of a sink into a new part file in the partition of each day.
+
+    The lazy counterpart of `write_day_partitions`, for `LazyFrame.sink_parquet`.
+
+    Args:
+        dataset_dir: Directory of the partitioned dataset.
+        chunk_index: Index of the chunk, which orders the part files of a day.
+
+    Returns:
+        Partitioning by the flight_day column.
+    """
+
+    def part_file_path(partition: FileProviderArgs) -> Path:
+        day = partition.partition_keys.item()
+        return day_partition_directory(Path(), day) / _part_file_name(
+            chunk_index, partition.index_in_partition
+        )
+
+    return pl.PartitionBy(
+        dataset_dir, key=DAY_COLUMN, include_key=True, file_path_provider=part_file_path
+    )
+
+
+def compact_day_partition(
+    day_directory: Path,
+    compression: Literal["lz4", "uncompressed", "snappy", "gzip", "brotli", "zstd"] = "zstd",
+    *,
+    last_chunk_index: int | None = None,
+) -> None:
+    """Merge the part files of a day partition into one part file.
+
+    Only compact days that no more chunks are written to, or give the last chunk whose parts are
+    merged, so parts that are being written by later chunks are left as they are. The merged file
+    is named after the last chunk it contains and written under a temporary name that is not read
+    as part of the partition, and renamed before the parts are removed, so the partition is never
+    missing data. If the removal is interrupted, `remove_chunk_parts` removes the parts left.
+
+    Args:
+        day_directory: Directory of the part files of one day.
+        compression: Parquet compression codec.
+        last_chunk_index: Index of the last chunk whose part files are merged, all if None.
+    """
+    part_files = sorted(
+        part_file
+        for part_file in day_directory.glob("part-*.parquet")
+        if last_chunk_index is None or _chunk_index(part_file) <= last_chunk_index
+    )
+    if len(part_files) <= 1:
+        return
+    compacted_file = day_directory / _compacted_part_file_name(
+        max(_chunk_index(part_file) for part_file in part_files)
+    )
+    temporary_file = day_directory / f".{compacted_file.name}.tmp"
+    pl.scan_parquet(part_files, hive_partitioning=False).sink_parquet(
+        temporary_file, compression=compression
+    )
+    temporary_file.replace(compacted_file)
+    for part_file in part_files:
+        if part_file != compacted_file:
+            part_file.unlink()
+    logger.info("Compacted %d part files in %s", len(part_files), day_directory.name)
+
+
+def remove_compacted_parts(day_directory: Path) -> None:
+    """Remove part files left by an interrupted compaction of a day partition.
+
+    These are the parts of chunks up to the last chunk of the latest compacted part file, which
+    already contains their rows.
+
+    Args:
+        day_directory: Directory of the part files of one day.
+    """
+    compacted_files = sorted(day_directory.glob(f"part-*{COMPACTED_PART_FILE_SUFFIX}"))
+    if not compacted_files:
+        return
+    compacted_file = compacted_files[-1]
+    last_chunk_index = _chunk_index(compacted_file)
+    for part_file in day_directory.glob("part-*.parquet"):
+        if part_file != compacted_file and _chunk_index(part_file) <= last_chunk_index:
+            logger.info("Removing %s, already in %s", part_file, compacted_file.name)
+            part_file.unlink()
+
+
+def daily_flight_data_sources(directory: Path) -> dict[str, Path]:
+    """Find the daily flight data in a directory of daily files or of day partitions.
+
+    Daily files are returned as they are, day partitions as a glob of their part files, which
+    polars reads as one file. The names are the stems of the daily files, also for partitions, so
+    the outputs of later stages are named the same for both layouts.
+
+    Args:
+        directory: Directory with `UK_flights_day_NNN.parquet` files or `day=NNN` partitions.
+
+    Returns:
+        Paths to read the flight data of each day from, by name and in order of the names.
+    """
+    sources = {path.stem: path for path in directory.glob("*.parquet")}
+    for day_directory in directory.glob("day=*"):
+        day = int(day_directory.name.removeprefix("day="))
+        sources[f"{DAY_FILE_PREFIX}{day:03d}"] = day_directory / "*.parquet"
+    return dict(sorted(sources.items()))
+
+
+def remove_chunk_parts(dataset_dir: Path, first_chunk_index: int) -> None:
+    """Remove the part files written by chunks from first_chunk_index on.
+
+    Used before processing these chunks again, so the parts written by an interrupted run are not
+    read as well as the new ones. The parts left by an interrupted compaction are removed too,
+    see `remove_compacted_parts`.
+
+    Args:
+        dataset_dir: Directory of the partitioned dataset.
+        first_chunk_index: Index of the first chunk whose part files are removed.
+    """
+    for day_directory in dataset_dir.glob("day=*"):
+        remove_compacted_parts(day_directory)
+    for part_file in dataset_dir.glob("day=*/part-*.parquet"):
+        if _chunk_index(part_file) >= first_chunk_index:
+            part_file.unlink()
@@ -6,14 +6,32 @@ import datetime
 import enum
 import logging
 import math
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 import numpy as np
 import polars as pl
 
-from aia_model_contrail_avoidance.config import ADS_B_SCHEMA_CLEANED
+from aia_model_contrail_avoidance.compact_schema import (
+    airports_as_categorical,
+    apply_schema_profile,
+    encode_icao_columns,
+)
+from aia_model_contrail_avoidance.config import (
+    ADS_B_SCHEMA_CLEANED,
+    AIRPORT_ICAO_COLUMNS,
+    ICAO_ADDRESS_COLUMN,
+    SchemaProfile,
+)
 from aia_model_contrail_avoidance.core_model.airports import list_of_uk_airports
 from aia_model_contrail_avoidance.core_model.flights import flight_distance_from_location_vectorized
 
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from polars.io.partition import FileProviderArgs
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 
@@ -24,12 +42,40 @@ logger = logging.getLogger(__name__)
 # Global constants and enums for flight data processing
 MAX_DISTANCE_BETWEEN_FLIGHT_TIMESTAMPS = 3.0  # nautical miles
 LOW_FLIGHT_LEVEL_THRESHOLD = 20.0  # flight level 20 = 2000 feet
+# Target number of input rows per flight_id batch of the streaming pipeline, which bounds the rows
+# the per-flight sorts and window expressions of a batch hold in memory
+STREAMING_ROWS_PER_FLIGHT_ID_BATCH = 5_000_000
 
 # Set to True to merge datapoints that are very close together in space
 BOOL_MERGE_CLOSE_POINTS = True
 # Set to True to interpolate new datapoints for flights with large distance flown in segment
 BOOL_INTERPOLATE_LARGE_DISTANCE_FLIGHTS = True
 
+# Per-flight columns of the flight info database, computed in one group_by over flight_id
+FLIGHT_INFO_AGGREGATIONS = [
+    pl.col("icao_address").first(),
+    pl.col("departure_airport_icao").first(),
+    pl.col("arrival_airport_icao").first(),
+    pl.col("timestamp").min().alias("first_message_timestamp"),
+    pl.col("timestamp").max().alias("last_message_timestamp"),
+    pl.len().alias("number_of_messages"),
+    pl.col("distance_flown_in_segment").cast(pl.Float64).sum().alias("total_distance_flown"),
+    pl.col("flight_level").max().alias("max_flight_level"),
+    pl.col("flight_level").min().alias("min_flight_level"),
+]
+
+# Columns of the ADS-B data needed for processing
+NEEDED_COLUMNS = [
+    "timestamp",
+    "latitude",
+    "longitude",
+    "altitude_baro",
+    "flight_id",
+    "icao_address",
+    "departure_airport_icao",
+    "arrival_airport_icao",
+]
+
 
 class FlightDepartureAndArrivalSubset(enum.Enum):
     """Enum for selecting subsets of flight data based on departure and arrival airports."""
@@ -59,12 +105,16 @@ class TemporalFlightSubset(enum.Enum):
     DECEMBER = ("december", 12, "12", 31, 336, 366)
 
 
-def process_ads_b_flight_data(
+def process_ads_b_flight_data(  # noqa: PLR0913
     parquet_file_path: str,
     path_to_save_file: str,
     path_to_info_file: str,
     departure_and_arrival_subset: FlightDepartureAndArrivalSubset,
     temporal_subset: TemporalFlightSubset,
+    *,
+    streaming: bool = False,
+    compact_icao: bool = False,
+    schema_profile: SchemaProfile = SchemaProfile.STANDARD,
 ) -> None:
     """Processes ADS-B flight data from a parquet file and saves the cleaned DataFrame.
 
@@ -74,13 +124,35 @@ def process_ads_b_flight_data(
         path_to_info_file: Path to save the flight info parquet file.
         departure_and_arrival_subset: Enum specifying the departure and arrival airport subset.
         temporal_subset: Enum specifying the temporal subset of the data.
+        streaming: If True, build a single lazy query from the parquet scan to both output files
+            and run it with the streaming engine instead of loading the whole file.
+        compact_icao: If True, process and save the ICAO address and airport columns in the
+            compact integer and enum encoding of `compact_schema`.
+        schema_profile: Numeric dtypes of the saved datapoints, applied after cleaning so the
+            distances and interpolation are computed in Float64.
     """
+    if streaming:
+        process_ads_b_flight_data_streaming(
+            parquet_file_path,
+            path_to_save_file,
+            path_to_info_file,
+            departure_and_arrival_subset,
+            temporal_subset,
+            compact_icao=compact_icao,
+            schema_profile=schema_profile,
+        )
+        return
+
     dataframe = generate_flight_dataframe_from_ads_b_data(parquet_file_path)
+    if compact_icao:
+        dataframe = encode_icao_columns(dataframe)
 
     selected_dataframe = select_subset_of_ads_b_flight_data(
         dataframe, departure_and_arrival_subset, temporal_subset
     )
-    cleaned_dataframe = clean_ads_b_flight_dataframe(selected_dataframe)
+    cleaned_dataframe = apply_schema_profile(
+        clean_ads_b_flight_dataframe(selected_dataframe), schema_profile
+    )
 
     process_ads_b_flight_data_for_environment(cleaned_dataframe, path_to_save_file)
 
@@ -91,6 +163,132 @@ def process_ads_b_flight_data(
     generate_flight_info_database(path_to_save_file, flight_info_database_save_path)
 
 
+def process_ads_b_flight_data_streaming(  # noqa: PLR0913
+    parquet_file_path: str,
+    path_to_save_file: str,
+    path_to_info_file: str,
+    departure_and_arrival_subset: FlightDepartureAndArrivalSubset,
+    temporal_subset: TemporalFlightSubset,
+    *,
+    compact_icao: bool = False,
+    schema_profile: SchemaProfile = SchemaProfile.STANDARD,
+    rows_per_flight_id_batch: int = STREAMING_ROWS_PER_FLIGHT_ID_BATCH,
+) -> None:
+    """Processes ADS-B flight data from a parquet file as lazy queries over batches of flights.
+
+    The per-flight sorts and window expressions of the cleaning hold all the rows they see in
+    memory, so the flights are split into batches by flight_id modulo the number of batches, which
+    is the row count of the file from its metadata divided by rows_per_flight_id_batch. The file is
+    scanned once, with the month and airport filters pushed down into the scan, and streamed into a
+    part file per batch. Each batch is then processed by its own query, which writes the processed
+    datapoints and the flight info from the same plan, and the batches are streamed into the two
+    output files.
+
+    Args:
+        parquet_file_path: Path to the parquet file containing ADS-B flight data.
+        path_to_save_file: Path to save the processed parquet file.
+        path_to_info_file: Path to save the flight info parquet file.
+        departure_and_arrival_subset: Enum specifying the departure and arrival airport subset.
+        temporal_subset: Enum specifying the temporal subset of the data.
+        compact_icao: If True, process and save the ICAO address and airport columns in the
+            compact integer and enum encoding of `compact_schema`.
+        schema_profile: Numeric dtypes of the saved datapoints, applied after cleaning.
+        rows_per_flight_id_batch: Target number of input rows of each batch of flights.
+    """
+    if rows_per_flight_id_batch < 1:
+        msg = f"rows_per_flight_id_batch must be at least 1, got {rows_per_flight_id_batch}"
+        raise ValueError(msg)
+
+    number_of_rows = pl.scan_parquet(parquet_file_path).select(pl.len()).collect().item()
+    number_of_flight_id_batches = max(1, math.ceil(number_of_rows / rows_per_flight_id_batch))
+    flight_info_database_save_path = str(path_to_info_file).replace(
+        ".parquet", "_flight_info.parquet"
+    )
+
+    with tempfile.TemporaryDirectory(
+        prefix=".streaming-", dir=Path(path_to_save_file).parent
+    ) as scratch_dir:
+        batches_dir = Path(scratch_dir) / "batches"
+        selected_lazy_flight_dataframe = select_subset_of_ads_b_flight_data(
+            scan_flight_dataframe_from_ads_b_data(parquet_file_path),
+            departure_and_arrival_subset,
+            temporal_subset,
+        )
+        selected_lazy_flight_dataframe.sink_parquet(
+            _flight_id_batches(batches_dir, number_of_flight_id_batches),
+            mkdir=True,
+            engine="streaming",
+        )
+        # without any selected datapoints, an empty batch writes the empty output files
+        batches = [
+            pl.scan_parquet(batch_dir / "*.parquet", hive_partitioning=False)
+            for batch_dir in sorted(batches_dir.glob("flight_id_batch=*"))
+        ] or [selected_lazy_flight_dataframe.clear()]
+
+        datapoint_parts = []
+        flight_info_parts = []
+        for batch, lazy_flight_dataframe in enumerate(batches):
+            if compact_icao:
+                lazy_flight_dataframe = encode_icao_columns(lazy_flight_dataframe)  # noqa: PLW2901
+
+            cleaned_lazy_flight_dataframe = apply_schema_profile(
+                clean_ads_b_flight_dataframe(lazy_flight_dataframe), schema_profile
+            )
+            processed_lazy_flight_dataframe = remove_low_flight_level_datapoints(
+                cleaned_lazy_flight_dataframe
+            )
+
+            datapoint_parts.append(Path(scratch_dir) / f"datapoints-{batch:05d}.parquet")
+            flight_info_parts.append(Path(scratch_dir) / f"flight_info-{batch:05d}.parquet")
+            # both sinks share the processed plan of the batch, which is only computed once
+            pl.collect_all(
+                [
+                    airports_as_categorical(processed_lazy_flight_dataframe).sink_parquet(
+                        datapoint_parts[-1], lazy=True
+                    ),
+                    airports_as_categorical(
+                        create_flight_info_dataframe(processed_lazy_flight_dataframe)
+                    ).sink_parquet(flight_info_parts[-1], lazy=True),
+                ],
+                engine="streaming",
+            )
+
+        pl.scan_parquet(datapoint_parts).sink_parquet(path_to_save_file)
+        pl.scan_parquet(flight_info_parts).sink_parquet(flight_info_database_save_path)
+    logger.info(
+        "Streamed processed flight data in %d flight_id batches to %s",
+        len(batches),
+        path_to_save_file,
+    )
+
+
+def _flight_id_batches(batches_dir: Path, number_of_flight_id_batches: int) -> pl.PartitionBy:
+    """Partitioning of a sink into the part files of each batch of flights, by flight_id modulo."""
+
+    def part_file_path(partition: FileProviderArgs) -> str:
+        batch = partition.partition_keys.item()
+        return f"flight_id_batch={batch:05d}/part-{partition.index_in_partition:05d}.parquet"
+
+    return pl.PartitionBy(
+        batches_dir,
+        key=(pl.col("flight_id") % number_of_flight_id_batches).alias("flight_id_batch"),
+        include_key=False,
+        file_path_provider=part_file_path,
+    )
+
+
+def scan_flight_dataframe_from_ads_b_data(parquet_file_path: str) -> pl.LazyFrame:
+    """Lazily scans ADS-B flight data and selects the columns needed for processing.
+
+    Args:
+        parquet_file_path: Path to the parquet file containing ADS-B flight data.
+
+    Returns:
+        LazyFrame containing ADS-B flight data.
+    """
+    return pl.scan_parquet(parquet_file_path).select(NEEDED_COLUMNS)
+
+
 def generate_flight_dataframe_from_ads_b_data(parquet_file_path: str) -> pl.DataFrame:
     """Reads ADS-B flight data into a DataFrame and removes unnecessary columns.
 
@@ -101,35 +299,25 @@ def generate_flight_dataframe_from_ads_b_data(parquet_file_path: str) -> pl.Data
         DataFrame containing ADS-B flight data.
     """
     flight_dataframe = pl.read_parquet(parquet_file_path)
-    needed_columns = [
-        "timestamp",
-        "latitude",
-        "longitude",
-        "altitude_baro",
-        "flight_id",
-        "icao_address",
-        "departure_airport_icao",
-        "arrival_airport_icao",
-    ]
     logger.info("Loaded flight dataframe with %d rows.", len(flight_dataframe))
 
-    return flight_dataframe.select(needed_columns)
+    return flight_dataframe.select(NEEDED_COLUMNS)
 
 
-def select_subset_of_ads_b_flight_data(
-    flight_dataframe: pl.DataFrame,
+def select_subset_of_ads_b_flight_data[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
     departure_and_arrival_subset: FlightDepartureAndArrivalSubset,
     temporal_subset: TemporalFlightSubset,
-) -> pl.DataFrame:
+) -> FlightFrame:
     """Selects a subset of columns from the ADS-B flight data DataFrame.
 
     Args:
-        flight_dataframe: DataFrame containing ADS-B flight data.
+        flight_dataframe: DataFrame or LazyFrame containing ADS-B flight data.
         departure_and_arrival_subset: Enum specifying the departure and arrival airport subset.
         temporal_subset: Enum specifying the temporal subset of the data.
 
     Returns:
-        DataFrame containing a subset of the original ADS-B flight data.
+        DataFrame or LazyFrame containing a subset of the original ADS-B flight data.
     """
     if temporal_subset != TemporalFlightSubset.ALL:
         name, month_num, month_padded, days_in_month = temporal_subset.value[:4]
@@ -155,11 +343,16 @@ def select_subset_of_ads_b_flight_data(
             & pl.col("departure_airport_icao").is_in(uk_airport_icaos)
         )
 
-    logger.info("After selecting subsets, the flight dataframe has %d rows.", len(flight_dataframe))
+    if isinstance(flight_dataframe, pl.DataFrame):
+        logger.info(
+            "After selecting subsets, the flight dataframe has %d rows.", len(flight_dataframe)
+        )
     return flight_dataframe
 
 
-def clean_ads_b_flight_dataframe(flight_dataframe: pl.DataFrame) -> pl.DataFrame:
+def clean_ads_b_flight_dataframe[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+) -> FlightFrame:
     """Cleans the flight DataFrame by adding necessary columns and removing unnecessary ones.
 
     New columns added:
@@ -173,10 +366,10 @@ def clean_ads_b_flight_dataframe(flight_dataframe: pl.DataFrame) -> pl.DataFrame
         no segment exceeds the threshold.
 
     Args:
-        flight_dataframe: DataFrame containing ADS-B flight data.
+        flight_dataframe: DataFrame or LazyFrame containing ADS-B flight data.
 
     Returns:
-        Cleaned DataFrame with added columns.
+        Cleaned DataFrame or LazyFrame with added columns.
     """
     # Divide altitude_baro by 100 to convert from pha to flight level
     flight_dataframe = flight_dataframe.with_columns(
@@ -186,30 +379,7 @@ def clean_ads_b_flight_dataframe(flight_dataframe: pl.DataFrame) -> pl.DataFrame
     # Drop the original altitude_baro column
     flight_dataframe = flight_dataframe.drop("altitude_baro")
 
-    # order by flight id and timestamp
-    flight_dataframe = flight_dataframe.sort(["flight_id", "timestamp"])
-
-    # Calculate distance_flown_in_segment using window functions
-    flight_dataframe = flight_dataframe.with_columns(
-        [
-            pl.col("latitude").shift(1).over("flight_id").alias("prev_lat"),
-            pl.col("longitude").shift(1).over("flight_id").alias("prev_lon"),
-            pl.col("timestamp").shift(1).over("flight_id").alias("prev_timestamp"),
-        ]
-    )
-
-    # Calculate distances traveled in each segment using datafames
-    flight_dataframe = flight_dataframe.with_columns(
-        pl.Series(
-            "distance_flown_in_segment",
-            flight_distance_from_location_vectorized(
-                flight_dataframe["latitude"].to_numpy(),
-                flight_dataframe["longitude"].to_numpy(),
-                flight_dataframe["prev_lat"].to_numpy(),
-                flight_dataframe["prev_lon"].to_numpy(),
-            ),
-        )
-    )
+    flight_dataframe = add_distance_flown_in_segment(flight_dataframe)
 
     # remove columns where distance_flown_in_segment is zero
     flight_dataframe = flight_dataframe.filter(pl.col("distance_flown_in_segment") > 0)
@@ -241,8 +411,9 @@ def clean_ads_b_flight_dataframe(flight_dataframe: pl.DataFrame) -> pl.DataFrame
             flight_dataframe, max_distance=MAX_DISTANCE_BETWEEN_FLIGHT_TIMESTAMPS
         )
 
-    length_after_cleaning = len(flight_dataframe)
-    logger.info("After cleaning, the flight dataframe has %d rows.", length_after_cleaning)
+    if isinstance(flight_dataframe, pl.DataFrame):
+        length_after_cleaning = len(flight_dataframe)
+        logger.info("After cleaning, the flight dataframe has %d rows.", length_after_cleaning)
 
     # reorganise columns
     flight_dataframe = flight_dataframe.select(
@@ -266,31 +437,100 @@ def clean_ads_b_flight_dataframe(flight_dataframe: pl.DataFrame) -> pl.DataFrame
             flight_dataframe, MAX_DISTANCE_BETWEEN_FLIGHT_TIMESTAMPS
         )
 
-        length_after_merging = len(flight_dataframe)
-        logger.info(
-            "After merging very close points, the flight dataframe has %d rows.",
-            length_after_merging,
-        )
-        logger.info(
-            "Total of %d rows removed by merging very close points.",
-            length_after_cleaning - length_after_merging,
-        )
+        if isinstance(flight_dataframe, pl.DataFrame):
+            length_after_merging = len(flight_dataframe)
+            logger.info(
+                "After merging very close points, the flight dataframe has %d rows.",
+                length_after_merging,
+            )
+            logger.info(
+                "Total of %d rows removed by merging very close points.",
+                length_after_cleaning - length_after_merging,
+            )
 
     return flight_dataframe
 
 
-def generate_interpolated_rows_of_large_distance_flights(
-    flight_dataframe: pl.DataFrame, max_distance: float = 15.0
-) -> pl.DataFrame:
+def add_distance_flown_in_segment[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+) -> FlightFrame:
+    """Adds the previous datapoint and the distance flown since it to each row of a flight.
+
+    New columns added:
+    - prev_lat, prev_lon, prev_timestamp: Location and time of the previous datapoint of the flight
+    - distance_flown_in_segment: Distance in nautical miles from the previous datapoint
+
+    Args:
+        flight_dataframe: DataFrame or LazyFrame containing ADS-B flight data.
+
+    Returns:
+        DataFrame or LazyFrame sorted by flight_id and timestamp with the new columns added.
+    """
+    # order by flight id and timestamp
+    flight_dataframe = flight_dataframe.sort(["flight_id", "timestamp"])
+
+    # Calculate distance_flown_in_segment using window functions
+    flight_dataframe = flight_dataframe.with_columns(
+        [
+            pl.col("latitude").shift(1).over("flight_id").alias("prev_lat"),
+            pl.col("longitude").shift(1).over("flight_id").alias("prev_lon"),
+            pl.col("timestamp").shift(1).over("flight_id").alias("prev_timestamp"),
+        ]
+    )
+
+    # Calculate distances traveled in each segment in batches of datapoints
+    return flight_dataframe.with_columns(
+        pl.struct("latitude", "longitude", "prev_lat", "prev_lon")
+        .map_batches(
+            _distance_from_previous_datapoint, return_dtype=pl.Float64, is_elementwise=True
+        )
+        .alias("distance_flown_in_segment")
+    )
+
+
+def _distance_from_previous_datapoint(datapoints: pl.Series) -> pl.Series:
+    """Calculates the great circle distance of a batch of datapoints from their previous datapoint.
+
+    Args:
+        datapoints: Struct series with latitude, longitude, prev_lat and prev_lon fields.
+
+    Returns:
+        Series of distances in nautical miles, NaN where there is no previous datapoint.
+    """
+    return pl.Series(
+        flight_distance_from_location_vectorized(
+            datapoints.struct.field("latitude").to_numpy(),
+            datapoints.struct.field("longitude").to_numpy(),
+            datapoints.struct.field("prev_lat").to_numpy(),
+            datapoints.struct.field("prev_lon").to_numpy(),
+        ),
+        dtype=pl.Float64,
+    )
+
+
+def generate_interpolated_rows_of_large_distance_flights[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame, max_distance: float = 15.0, *, vectorized: bool = True
+) -> FlightFrame:
     """Generates interpolated rows for flights with large distance flown in segment.
 
+    Each segment longer than `max_distance` is replaced by `ceil(distance / max_distance)` rows
+    spaced linearly between the previous and current datapoint. The vectorized mode builds all new
+    rows in a single pass by exploding a per-segment step index, the per-row mode is kept as a
+    reference implementation.
+
     Args:
-        flight_dataframe: DataFrame containing ADS-B flight data.
+        flight_dataframe: DataFrame or LazyFrame containing ADS-B flight data.
         max_distance: Maximum distance in nautical miles before interpolation is needed.
+        vectorized: If True, generate all interpolated rows with columnar expressions, otherwise
+            loop over each long segment. Only the vectorized mode supports LazyFrames.
 
     Returns:
-        DataFrame with interpolated rows added.
+        DataFrame or LazyFrame with interpolated rows added.
     """
+    if not vectorized and isinstance(flight_dataframe, pl.LazyFrame):
+        msg = "Per-row interpolation requires a DataFrame, use vectorized=True for a LazyFrame."
+        raise TypeError(msg)
+
     flight_dataframe = flight_dataframe.sort(["flight_id", "timestamp"])
 
     # filter out rows where distance_flown_in_segment exceeds max_distance
@@ -305,6 +545,145 @@ def generate_interpolated_rows_of_large_distance_flights(
         | pl.col("prev_lon").is_null()
     ).drop(["prev_lat", "prev_lon", "prev_timestamp"])
 
+    if vectorized:
+        rows_to_add = _interpolate_large_distance_segments(
+            flight_dataframe_with_large_distances, max_distance
+        )
+        flight_dataframe = pl.concat([flight_dataframe, rows_to_add], how="vertical")
+    elif isinstance(flight_dataframe, pl.DataFrame):
+        flight_dataframe = _interpolate_large_distance_segments_per_row(
+            flight_dataframe, flight_dataframe_with_large_distances, max_distance
+        )
+
+    # sort by flight_id and timestamp
+    return flight_dataframe.sort(["flight_id", "timestamp"])
+
+
+def _interpolate_large_distance_segments[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe_with_large_distances: FlightFrame, max_distance: float
+) -> FlightFrame:
+    """Generates interpolated rows for all long segments at once.
+
+    Args:
+        flight_dataframe_with_large_distances: DataFrame or LazyFrame of segments longer than
+            max_distance, including prev_lat, prev_lon and prev_timestamp columns.
+        max_distance: Maximum distance in nautical miles before interpolation is needed.
+
+    Returns:
+        DataFrame or LazyFrame of interpolated rows with the ADS_B_SCHEMA_CLEANED schema.
+    """
+    num_new_rows = pl.col("num_new_rows")
+    step_index = pl.col("step_index")
+
+    def linspace(previous: str, current: str) -> pl.Expr:
+        # same arithmetic as np.linspace(previous, current, num_new_rows)
+        step = (pl.col(current) - pl.col(previous)) / (num_new_rows - 1)
+        return (
+            pl.when(step_index == num_new_rows - 1)
+            .then(pl.col(current))
+            .otherwise(step_index * step + pl.col(previous))
+        )
+
+    # one row per new datapoint, indexed by its step along the segment
+    segments = (
+        flight_dataframe_with_large_distances.with_columns(
+            (pl.col("distance_flown_in_segment") / max_distance)
+            .ceil()
+            .cast(pl.Int64)
+            .alias("num_new_rows")
+        )
+        .with_columns(pl.int_ranges(0, num_new_rows).alias("step_index"))
+        .explode("step_index")
+    )
+
+    microseconds_since_previous = pl.struct(
+        (pl.col("timestamp") - pl.col("prev_timestamp"))
+        .dt.total_microseconds()
+        .alias("segment_microseconds"),
+        num_new_rows,
+        step_index,
+    ).map_batches(
+        _microseconds_since_previous_datapoint, return_dtype=pl.Int64, is_elementwise=True
+    )
+
+    cleaned_schema = _cleaned_schema_with_icao_dtypes_of(
+        flight_dataframe_with_large_distances.collect_schema()
+    )
+    return segments.select(
+        (pl.col("prev_timestamp") + pl.duration(microseconds=microseconds_since_previous)).alias(
+            "timestamp"
+        ),
+        linspace("prev_lat", "latitude").alias("latitude"),
+        linspace("prev_lon", "longitude").alias("longitude"),
+        "flight_level",
+        "flight_id",
+        "icao_address",
+        "departure_airport_icao",
+        "arrival_airport_icao",
+        (pl.col("distance_flown_in_segment") / (num_new_rows + 1)).alias(
+            "distance_flown_in_segment"
+        ),
+    ).cast(cleaned_schema)
+
+
+def _cleaned_schema_with_icao_dtypes_of(schema: pl.Schema) -> pl.Schema:
+    """ADS_B_SCHEMA_CLEANED with the ICAO columns kept in the string or compact encoding of schema."""
+    return pl.Schema(
+        {
+            column: schema[column]
+            if column in (ICAO_ADDRESS_COLUMN, *AIRPORT_ICAO_COLUMNS)
+            else dtype
+            for column, dtype in ADS_B_SCHEMA_CLEANED.items()
+        },
+        # the cleaned schema keeps the time unit of timestamps open
+        check_dtypes=False,
+    )
+
+
+def _microseconds_since_previous_datapoint(segments: pl.Series) -> pl.Series:
+    """Calculates the time offset of interpolated datapoints from the start of their segment.
+
+    Offsets are computed in numpy and rounded to microseconds the same way as datetime.timedelta,
+    as polars may fuse the multiply and subtract, which changes the rounding.
+
+    Args:
+        segments: Struct series with segment_microseconds, num_new_rows and step_index fields.
+
+    Returns:
+        Series of offsets in microseconds.
+    """
+    time_step_seconds = (
+        segments.struct.field("segment_microseconds").to_numpy()
+        / 1e6
+        / (segments.struct.field("num_new_rows").to_numpy() + 1)
+    )
+    fractional_seconds, whole_seconds = np.modf(
+        segments.struct.field("step_index").to_numpy() * time_step_seconds
+    )
+    return pl.Series(
+        whole_seconds.astype(np.int64) * 1_000_000
+        + np.round(fractional_seconds * 1e6).astype(np.int64),
+        dtype=pl.Int64,
+    )
+
+
+def _interpolate_large_distance_segments_per_row(
+    flight_dataframe: pl.DataFrame,
+    flight_dataframe_with_large_distances: pl.DataFrame,
+    max_distance: float,
+) -> pl.DataFrame:
+    """Generates interpolated rows one long segment at a time and appends them to the dataframe.
+
+    Args:
+        flight_dataframe: DataFrame of segments that do not need interpolation.
+        flight_dataframe_with_large_distances: DataFrame of segments longer than max_distance,
+            including prev_lat, prev_lon and prev_timestamp columns.
+        max_distance: Maximum distance in nautical miles before interpolation is needed.
+
+    Returns:
+        DataFrame with interpolated rows appended.
+    """
+    cleaned_schema = _cleaned_schema_with_icao_dtypes_of(flight_dataframe.schema)
     for row in flight_dataframe_with_large_distances.iter_rows(named=True):
         # calculate intervals for each row
         num_new_rows = math.ceil(row["distance_flown_in_segment"] / max_distance)
@@ -329,14 +708,13 @@ def generate_interpolated_rows_of_large_distance_flights(
                 "arrival_airport_icao": [row["arrival_airport_icao"]] * num_new_rows,
                 "distance_flown_in_segment": [distance_flown_in_segment_step] * num_new_rows,
             },
-            schema=ADS_B_SCHEMA_CLEANED,
+            schema=cleaned_schema,
         )
 
         # add new rows to dataframe
         flight_dataframe = pl.concat([flight_dataframe, rows_to_add], how="vertical")
 
-    # sort by flight_id and timestamp
-    return flight_dataframe.sort(["flight_id", "timestamp"])
+    return flight_dataframe
 
 
 def process_ads_b_flight_data_for_environment(
@@ -350,67 +728,81 @@ def process_ads_b_flight_data_for_environment(
         generated_dataframe: DataFrame containing raw ADS-B flight data.
         save_path: Path to save the processed parquet file.
     """
-    # Remove datapoints where flight level is none or negative
-    dataframe_processed = generated_dataframe.filter(
-        pl.col("flight_level").is_not_null()
-        & (pl.col("flight_level") >= LOW_FLIGHT_LEVEL_THRESHOLD)
-    )
+    dataframe_processed = remove_low_flight_level_datapoints(generated_dataframe)
 
     # percentage of datapoints removed
     percentage_removed = 100 * (1 - len(dataframe_processed) / len(generated_dataframe))
     logger.info("Removed %.2f%% of datapoints due to low flight level", percentage_removed)
     # Save processed dataframe to parquet
-    dataframe_processed.write_parquet(save_path)
+    airports_as_categorical(dataframe_processed).write_parquet(save_path)
+
+
+def remove_low_flight_level_datapoints[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+) -> FlightFrame:
+    """Removes datapoints with low flight levels (near or on ground).
+
+    Args:
+        flight_dataframe: DataFrame or LazyFrame containing cleaned ADS-B flight data.
+
+    Returns:
+        DataFrame or LazyFrame without datapoints below the low flight level threshold.
+    """
+    # Remove datapoints where flight level is none or negative
+    return flight_dataframe.filter(
+        pl.col("flight_level").is_not_null()
+        & (pl.col("flight_level") >= LOW_FLIGHT_LEVEL_THRESHOLD)
+    )
 
 
 def generate_flight_info_database(processed_parquet_path: str, save_path: str) -> None:
     """Generates a flight information database from processed ADS-B data."""
     flight_dataframe = pl.read_parquet(processed_parquet_path)
 
-    # Extract unique flight information
-    flight_info_dataframe = flight_dataframe.select(
-        [
-            "flight_id",
-            "icao_address",
-            "departure_airport_icao",
-            "arrival_airport_icao",
-        ]
-    ).unique()
-
-    # add new colums for first message timestamp and last message timestamp
-    first_timestamps = flight_dataframe.group_by("flight_id").agg(
-        pl.col("timestamp").min().alias("first_message_timestamp")
-    )
-    last_timestamps = flight_dataframe.group_by("flight_id").agg(
-        pl.col("timestamp").max().alias("last_message_timestamp")
-    )
-    number_of_messages = flight_dataframe.group_by("flight_id").agg(
-        pl.count().alias("number_of_messages")
-    )
-    flight_info_dataframe = (
-        flight_info_dataframe.join(first_timestamps, on="flight_id")
-        .join(last_timestamps, on="flight_id")
-        .join(number_of_messages, on="flight_id")
-    )
+    flight_info_dataframe = create_flight_info_dataframe(flight_dataframe)
 
     # Save flight information database to parquet
     flight_info_dataframe.write_parquet(save_path)
 
 
-def merge_close_datapoints_of_flight(
-    flight_dataframe: pl.DataFrame,
+def create_flight_info_dataframe[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
+    additional_aggregations: Sequence[pl.Expr] = (),
+) -> FlightFrame:
+    """Creates a flight information dataframe with one row per flight in a single aggregation.
+
+    Args:
+        flight_dataframe: DataFrame or LazyFrame containing processed ADS-B flight data.
+        additional_aggregations: Extra per-flight aggregation expressions, each with an alias, to
+            compute in the same pass as the FLIGHT_INFO_AGGREGATIONS columns.
+
+    Returns:
+        DataFrame or LazyFrame with one row per flight_id and one column per aggregation.
+    """
+    return flight_dataframe.group_by("flight_id").agg(
+        *FLIGHT_INFO_AGGREGATIONS, *additional_aggregations
+    )
+
+
+def merge_close_datapoints_of_flight[FlightFrame: (pl.DataFrame, pl.LazyFrame)](
+    flight_dataframe: FlightFrame,
     distance_threshold: float,
-) -> pl.DataFrame:
+) -> FlightFrame:
     """Merges close datapoints of a flight based on distance threshold.
 
     Args:
-        flight_dataframe: DataFrame containing ADS-B flight data.
+        flight_dataframe: DataFrame or LazyFrame containing ADS-B flight data.
         distance_threshold: Distance threshold in nautical miles for merging datapoints.
 
     Returns:
-        DataFrame with merged datapoints.
+        DataFrame or LazyFrame with merged datapoints.
     """
-    flight_dataframe = flight_dataframe.sort(["flight_id", "timestamp"])
+    # the first interpolated datapoint of a long segment (step 0) is placed at prev_timestamp, the
+    # timestamp of the datapoint before the segment, so break ties on distance to keep the merge
+    # independent of the incoming row order
+    flight_dataframe = flight_dataframe.sort(
+        ["flight_id", "timestamp", "distance_flown_in_segment"]
+    )
     flight_dataframe = flight_dataframe.with_columns(
         pl.col("distance_flown_in_segment")
         .shift(1)
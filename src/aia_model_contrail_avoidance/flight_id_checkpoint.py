@@ -0,0 +1,182 @@
+"""Checkpoints of the state carried between chunks of input files when assigning flight IDs."""
+
+from __future__ import annotations
+
+__all__ = ("FlightIdCheckpoint",)
+
+import json
+import logging
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING
+
+import polars as pl
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE_NAME = "state.json"
+
+
+@dataclass(frozen=True)
+class FlightIdCheckpoint:
+    """State of flight identification after the chunks of input files processed so far.
+
+    The state is what the next chunk depends on: the flight info of the latest flights, to continue
+    flights that are still in progress, and the next flight ID. The manifest of processed input
+    files is used to skip them when resuming.
+    """
+
+    # Number of input files per chunk, resuming with another chunk size would change the flights
+    files_per_chunk: int
+    # Parameters of flight segmentation by name, resuming with other parameters would too
+    segmentation_config: Mapping[str, float | bool] = field(default_factory=dict)
+    # Whether ICAO columns are written encoded, resuming otherwise would mix encodings in the output
+    compact_icao: bool = False
+    # Names of the processed input files, in order
+    processed_input_files: tuple[str, ...] = ()
+    # Number of processed chunks, which is the index of the next chunk
+    processed_chunks: int = 0
+    # Flight ID of the first new flight of the next chunk
+    next_flight_id: int = 0
+    # Flight info of the latest flights of the last processed chunk
+    flight_info: pl.DataFrame = field(default_factory=pl.DataFrame)
+
+    def after_chunk(
+        self,
+        file_chunk: Sequence[Path],
+        flight_info: pl.DataFrame,
+        next_flight_id: int,
+    ) -> FlightIdCheckpoint:
+        """The state after processing one more chunk of input files."""
+        return replace(
+            self,
+            processed_input_files=(
+                *self.processed_input_files,
+                *(path.name for path in file_chunk),
+            ),
+            processed_chunks=self.processed_chunks + 1,
+            next_flight_id=next_flight_id,
+            flight_info=flight_info,
+        )
+
+    def remaining_input_files(self, input_files: Sequence[Path]) -> list[Path]:
+        """The input files that are not processed yet.
+
+        Args:
+            input_files: All input files, in the order they are processed.
+
+        Returns:
+            The input files after the processed ones.
+
+        Raises:
+            ValueError: If the processed files are not the first of the input files.
+        """
+        processed_input_files = tuple(path.name for path in input_files)[
+            : len(self.processed_input_files)
+        ]
+        if processed_input_files != self.processed_input_files:
+            msg = "The processed input files of the checkpoint are not the first input files."
+            raise ValueError(msg)
+        return list(input_files[len(self.processed_input_files) :])
+
+    def save(self, checkpoint_dir: Path) -> None:
+        """Save the checkpoint atomically, replacing the previous checkpoint.
+
+        The flight info is written to a new file, then the state file that refers to it replaces
+        the previous state file in one rename, so an interrupted save leaves the previous checkpoint.
+
+        Args:
+            checkpoint_dir: Directory of the checkpoint, created if needed.
+        """
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        flight_info_file_name = f"flight_info-{self.processed_chunks:05d}.parquet"
+        temporary_flight_info_file = checkpoint_dir / f"{flight_info_file_name}.tmp"
+        self.flight_info.write_parquet(temporary_flight_info_file)
+        temporary_flight_info_file.replace(checkpoint_dir / flight_info_file_name)
+
+        state = {
+            "files_per_chunk": self.files_per_chunk,
+            "segmentation_config": dict(self.segmentation_config),
+            "compact_icao": self.compact_icao,
+            "processed_input_files": list(self.processed_input_files),
+            "processed_chunks": self.processed_chunks,
+            "next_flight_id": self.next_flight_id,
+            "flight_info_file": flight_info_file_name,
+        }
+        temporary_state_file = checkpoint_dir / f"{STATE_FILE_NAME}.tmp"
+        temporary_state_file.write_text(json.dumps(state, indent=2))
+        temporary_state_file.replace(checkpoint_dir / STATE_FILE_NAME)
+
+        for flight_info_file in checkpoint_dir.glob("flight_info-*.parquet"):
+            if flight_info_file.name != flight_info_file_name:
+                flight_info_file.unlink()
+
+    @classmethod
+    def load(
+        cls,
+        checkpoint_dir: Path,
+        files_per_chunk: int,
+        segmentation_config: Mapping[str, float | bool] | None = None,
+        *,
+        compact_icao: bool = False,
+    ) -> FlightIdCheckpoint:
+        """Load the checkpoint in a directory, or start from the first chunk if there is none.
+
+        Args:
+            checkpoint_dir: Directory of the checkpoint.
+            files_per_chunk: Number of input files per chunk.
+            segmentation_config: Parameters of flight segmentation by name.
+            compact_icao: Whether ICAO columns are written encoded.
+
+        Returns:
+            The saved checkpoint, or the state before the first chunk.
+
+        Raises:
+            ValueError: If the checkpoint was saved with another number of files per chunk, other
+                segmentation parameters or another encoding of the ICAO columns.
+        """
+        segmentation_config = dict(segmentation_config or {})
+        state_file = checkpoint_dir / STATE_FILE_NAME
+        if not state_file.exists():
+            return cls(
+                files_per_chunk=files_per_chunk,
+                segmentation_config=segmentation_config,
+                compact_icao=compact_icao,
+            )
+        state = json.loads(state_file.read_text())
+        if state["files_per_chunk"] != files_per_chunk:
+            msg = (
+                f"The checkpoint was saved with {state['files_per_chunk']} files per chunk, "
+                f"not {files_per_chunk}."
+            )
+            raise ValueError(msg)
+        # checkpoints saved before these were recorded cannot be checked, so are refused too
+        if state.get("segmentation_config") != segmentation_config:
+            msg = (
+                f"The checkpoint was saved with segmentation config "
+                f"{state.get('segmentation_config')}, not {segmentation_config}."
+            )
+            raise ValueError(msg)
+        if state.get("compact_icao") != compact_icao:
+            msg = (
+                f"The checkpoint was saved with compact_icao={state.get('compact_icao')}, "
+                f"not {compact_icao}."
+            )
+            raise ValueError(msg)
+        logger.info(
+            "Loaded checkpoint after %d chunks, next flight_id %d",
+            state["processed_chunks"],
+            state["next_flight_id"],
+        )
+        return cls(
+            files_per_chunk=files_per_chunk,
+            segmentation_config=segmentation_config,
+            compact_icao=compact_icao,
+            processed_input_files=tuple(state["processed_input_files"]),
+            processed_chunks=state["processed_chunks"],
+            next_flight_id=state["next_flight_id"],
+            flight_info=pl.read_parquet(checkpoint_dir / state["flight_info_file"]),
+        )
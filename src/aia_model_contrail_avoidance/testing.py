@@ -5,6 +5,7 @@ from __future__ import annotations
 __all__ = [
     "create_flight_info_list_with_time_offset",
     "create_synthetic_grid_environment",
+    "generate_synthetic_ads_b_dataframe",
     "generate_synthetic_flight",
     "generate_synthetic_flight_database",
 ]
@@ -162,3 +163,67 @@ def create_flight_info_list_with_time_offset(  # noqa: PLR0913
         }
         flight_info_list.append(new_flight)
     return flight_info_list
+
+
+def generate_synthetic_ads_b_dataframe(
+    number_of_flights: int, datapoints_per_flight: int, seed: int = 0
+) -> pl.DataFrame:
+    """Generate a day of synthetic ADS-B datapoints with the columns used for flight processing.
+
+    Flights cruise at a constant speed and heading from random positions over UK airspace. Most
+    datapoints are a few seconds apart, but some have gaps of several minutes, producing segments
+    that need interpolation.
+
+    Args:
+        number_of_flights: Number of flights in the dataframe.
+        datapoints_per_flight: Number of datapoints per flight.
+        seed: Seed for the random number generator.
+
+    Returns:
+        DataFrame with timestamp, latitude, longitude, altitude_baro, flight_id, icao_address,
+            departure_airport_icao and arrival_airport_icao columns.
+    """
+    rng = np.random.default_rng(seed)
+    number_of_datapoints = number_of_flights * datapoints_per_flight
+    cruise_speed = 0.125  # nautical miles per second
+    large_gap_probability = 0.02
+
+    flight_id = np.repeat(np.arange(number_of_flights, dtype=np.int32), datapoints_per_flight)
+    time_steps = np.where(
+        rng.random(number_of_datapoints) < large_gap_probability,
+        rng.uniform(300.0, 900.0, number_of_datapoints),
+        rng.uniform(2.0, 20.0, number_of_datapoints),
+    ).reshape(number_of_flights, datapoints_per_flight)
+    time_steps[:, 0] = 0.0
+    seconds_since_departure = np.cumsum(time_steps, axis=1)
+    departure_seconds = rng.uniform(0.0, 12 * 3600.0, number_of_flights)
+    seconds_of_day = (seconds_since_departure + departure_seconds[:, None]).ravel()
+
+    heading = rng.uniform(0.0, 2 * np.pi, number_of_flights)[:, None]
+    distance_in_degrees = seconds_since_departure * cruise_speed / 60.0
+    latitudes = (
+        rng.uniform(50.0, 58.0, number_of_flights)[:, None]
+    ) + distance_in_degrees * np.cos(heading)
+    longitudes = (
+        rng.uniform(-6.0, 1.0, number_of_flights)[:, None]
+    ) + distance_in_degrees * np.sin(heading)
+
+    airports = np.array(["EGLL", "EGKK", "EGPH", "EGCC", "EGSS", "EGBB"])
+    departure_airports = rng.choice(airports, number_of_flights)
+    arrival_airports = rng.choice(airports, number_of_flights)
+
+    return pl.DataFrame(
+        {
+            "timestamp": (
+                np.datetime64("2024-01-01T00:00:00", "us")
+                + (seconds_of_day * 1e6).astype("timedelta64[us]")
+            ),
+            "latitude": latitudes.ravel(),
+            "longitude": longitudes.ravel(),
+            "altitude_baro": np.full(number_of_datapoints, 35000, dtype=np.int32),
+            "flight_id": flight_id,
+            "icao_address": np.char.mod("%06x", flight_id),
+            "departure_airport_icao": departure_airports[flight_id],
+            "arrival_airport_icao": arrival_airports[flight_id],
+        }
+    )
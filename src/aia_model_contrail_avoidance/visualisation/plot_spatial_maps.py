@@ -12,6 +12,7 @@ import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import polars as pl
+import shapely
 import xarray as xr
 from shapely.geometry import box
 
@@ -25,6 +26,7 @@ if TYPE_CHECKING:
     import datetime
 
     from cartopy.mpl.geoaxes import GeoAxes
+    from numpy.typing import NDArray
 
 
 # --- Constants for UK Airspace Map ---
@@ -44,6 +46,28 @@ center_lat = (SOUTH + NORTH) / 2
 center_lon = (WEST + EAST) / 2 - 5  # Shift west
 
 
+def exterior_coordinates(shape: shapely.Polygon | shapely.MultiPolygon) -> NDArray[np.float64]:
+    """Coordinates of the exterior of a polygon, or of each polygon of a multipolygon.
+
+    The exteriors of a multipolygon are separated by a row of NaN, which plotly draws as a gap.
+
+    Args:
+        shape: Polygon or multipolygon, such as the shape of an airspace.
+
+    Returns:
+        Array of longitude and latitude columns.
+    """
+    polygons = shape.geoms if isinstance(shape, shapely.MultiPolygon) else [shape]
+    gap = np.full((1, 2), np.nan)
+    return np.concatenate(
+        [
+            part
+            for polygon in polygons
+            for part in (gap, np.asarray(polygon.exterior.coords, dtype=np.float64)[:, :2])
+        ][1:]
+    )
+
+
 def plot_uk_airspace_map(
     output_file: str | Path,
 ) -> None:
@@ -144,7 +168,7 @@ def plot_uk_airspace_map(
     colors = ["rgba(255, 0, 0, 0.2)", "rgba(0, 255, 0, 0.2)", "rgba(0, 0, 255, 0.2)"]
     for i, airspace in enumerate(uk_airspaces):
         # Get the exterior coordinates from the shapely geometry
-        coords = np.array(airspace.shape.exterior.coords)
+        coords = exterior_coordinates(airspace.shape)
         lons = coords[:, 0]
         lats = coords[:, 1]
 
@@ -297,7 +321,7 @@ def plot_air_traffic_density_map(
 
     for _i, airspace in enumerate(uk_airspaces):
         # Get the exterior coordinates from the shapely geometry
-        coords = np.array(airspace.shape.exterior.coords)
+        coords = exterior_coordinates(airspace.shape)
         lons = coords[:, 0]  # type: ignore [assignment]
         lats = coords[:, 1]  # type: ignore [assignment]
 
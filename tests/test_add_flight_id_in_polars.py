@@ -0,0 +1,479 @@
+"""Tests for the assignment of flight IDs to ADS-B datapoints."""
+
+from __future__ import annotations
+
+import gzip
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from ads_b_data_pre_processing.add_flight_id_in_polars import (
+    SCRATCH_DIR_PREFIX,
+    FlightSegmentationConfig,
+    add_unique_flight_identifier,
+    assign_flight_id_to_unique_flights,
+    compact_closed_days,
+    identify_uk_flights,
+    polars_threads_of_new_processes,
+    scan_ads_b_input_files,
+    split_flight_at_datapoint,
+)
+from aia_model_contrail_avoidance.ads_b_ingestion import (
+    LocalDirectorySource,
+    ingest_raw_ads_b_data,
+)
+from aia_model_contrail_avoidance.compact_schema import (
+    decode_icao_columns,
+    normalise_icao_columns,
+)
+from aia_model_contrail_avoidance.config import ADS_B_CSV_SCHEMA, ADS_B_PARQUET_INPUT_SCHEMA
+from aia_model_contrail_avoidance.daily_partitions import (
+    daily_flight_data_sources,
+    day_partition_directory,
+    write_day_partitions,
+)
+from aia_model_contrail_avoidance.testing import generate_synthetic_ads_b_dataframe
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# Few aircraft fly many flights over three days, so flights continue across input files
+NUMBER_OF_FLIGHTS = 150
+NUMBER_OF_AIRCRAFT = 12
+DATAPOINTS_PER_INPUT_FILE = 700
+FILES_PER_CHUNK = 2
+# Start of the small frames of datapoints
+START_TIME = datetime(2024, 1, 1, 12)  # noqa: DTZ001
+
+
+def cruise_datapoints(
+    icao_address: str, departure: str | None, arrival: str, minutes: list[float]
+) -> pl.DataFrame:
+    """Datapoints of an aircraft cruising east at the same place, minutes after START_TIME."""
+    return pl.DataFrame(
+        {
+            "icao_address": icao_address,
+            "departure_airport_icao": departure,
+            "arrival_airport_icao": arrival,
+            "timestamp": [START_TIME + timedelta(minutes=minute) for minute in minutes],
+            "latitude": 52.0,
+            "longitude": -1.0,
+            "altitude_baro": 35000,
+            "on_ground": False,
+            "heading": 90.0,
+        },
+        schema_overrides={"departure_airport_icao": pl.String, "altitude_baro": pl.Int32},
+    )
+
+
+def synthetic_raw_ads_b_dataframe() -> pl.DataFrame:
+    """Synthetic raw ADS-B datapoints in time order, with the columns of the raw parquet files."""
+    flight_dataframe = generate_synthetic_ads_b_dataframe(
+        number_of_flights=NUMBER_OF_FLIGHTS, datapoints_per_flight=40, seed=1
+    )
+    return (
+        flight_dataframe.with_columns(
+            (pl.col("flight_id") % NUMBER_OF_AIRCRAFT)
+            .cast(pl.String)
+            .str.zfill(6)
+            .alias("icao_address"),
+            pl.col("timestamp") + pl.duration(hours=(pl.col("flight_id") * 7) % 72),
+            # each flight keeps its heading, in the air throughout
+            ((pl.col("flight_id") * 37) % 360).cast(pl.Float32).alias("heading"),
+            pl.lit(value=False).alias("on_ground"),
+        )
+        .sort("timestamp")
+        .select(
+            pl.col(column)
+            if column in flight_dataframe.columns or column in {"heading", "on_ground"}
+            else pl.lit(None).alias(column)
+            for column in ADS_B_PARQUET_INPUT_SCHEMA
+        )
+        .with_columns(pl.col("timestamp").dt.strftime("%Y-%m-%d %H:%M:%S%.f UTC"))
+        .cast(ADS_B_PARQUET_INPUT_SCHEMA)
+    )
+
+
+@pytest.fixture
+def input_files(tmp_path: Path) -> list[Path]:
+    """Raw ADS-B parquet files of the synthetic datapoints, split regardless of flights."""
+    input_dir = tmp_path / "ads_b"
+    input_dir.mkdir()
+    input_files = []
+    raw_dataframe = synthetic_raw_ads_b_dataframe()
+    for index, part in enumerate(raw_dataframe.iter_slices(DATAPOINTS_PER_INPUT_FILE)):
+        input_file = input_dir / f"part_{index:03d}.parquet"
+        part.write_parquet(input_file)
+        input_files.append(input_file)
+    return input_files
+
+
+def read_day_partitions(output_dir: Path) -> dict[str, pl.DataFrame]:
+    """Read the flights of each day written by `identify_uk_flights`, in the string encoding."""
+    return {
+        name: decode_icao_columns(pl.read_parquet(source, hive_partitioning=False))
+        for name, source in daily_flight_data_sources(output_dir).items()
+    }
+
+
+def assert_same_day_partitions(output_dir: Path, expected_output_dir: Path) -> None:
+    """Assert two outputs of `identify_uk_flights` have the same flights on each day."""
+    days = read_day_partitions(output_dir)
+    expected_days = read_day_partitions(expected_output_dir)
+    assert expected_days
+    assert list(days) == list(expected_days)
+    for name, expected_day in expected_days.items():
+        assert_frame_equal(days[name], expected_day)
+
+
+@pytest.mark.parametrize("compact_icao", (False, True))
+def test_streaming_matches_eager(
+    input_files: list[Path],
+    tmp_path: Path,
+    compact_icao: bool,  # noqa: FBT001
+) -> None:
+    """Test that streaming chunks of input files gives the same flights as collecting them."""
+    for streaming in (False, True):
+        identify_uk_flights(
+            input_files,
+            tmp_path / f"streaming_{streaming}",
+            config=FlightSegmentationConfig(),
+            compact_icao=compact_icao,
+            streaming=streaming,
+            files_per_chunk=FILES_PER_CHUNK,
+        )
+
+    assert len(input_files) > 2 * FILES_PER_CHUNK
+    assert_same_day_partitions(tmp_path / "streaming_True", tmp_path / "streaming_False")
+
+
+def messy_raw_ads_b_dataframe() -> pl.DataFrame:
+    """Synthetic raw datapoints with uppercase and invalid addresses and unknown airports."""
+    return (
+        synthetic_raw_ads_b_dataframe()
+        .with_row_index()
+        .select(
+            pl.when(pl.col("index") % 50 == 0)
+            .then(pl.lit("zz0001"))
+            .otherwise(pl.col("icao_address").str.replace("^00", "4C"))
+            .alias("icao_address"),
+            pl.when(pl.col("index") % 70 == 0)
+            .then(pl.lit("NOT_AN_AIRPORT"))
+            .otherwise(pl.col("departure_airport_icao"))
+            .alias("departure_airport_icao"),
+            pl.exclude("index", "icao_address", "departure_airport_icao"),
+        )
+        .select(list(ADS_B_PARQUET_INPUT_SCHEMA))
+    )
+
+
+def test_string_icao_keeps_messy_input(tmp_path: Path) -> None:
+    """Test that without compact_icao the ICAO codes are kept as they are in the input."""
+    input_file = tmp_path / "messy.parquet"
+    messy_raw_ads_b_dataframe().with_columns(
+        # every flight of one aircraft departs from an airport that is not in the registry
+        pl.when(pl.col("icao_address") == "4C0001")
+        .then(pl.lit("ZZZZ"))
+        .otherwise(pl.col("departure_airport_icao"))
+        .alias("departure_airport_icao")
+    ).write_parquet(input_file)
+    identify_uk_flights([input_file], tmp_path / "output", config=FlightSegmentationConfig())
+
+    output = pl.concat(read_day_partitions(tmp_path / "output").values())
+    assert output["icao_address"].str.starts_with("4C").all()
+    assert (output["departure_airport_icao"] == "ZZZZ").any()
+
+
+def test_compact_icao_matches_normalised_strings_on_messy_input(tmp_path: Path) -> None:
+    """Test that compact_icao gives the flights of the input with normalised ICAO columns."""
+    messy_input_file = tmp_path / "messy.parquet"
+    normalised_input_file = tmp_path / "normalised.parquet"
+    messy_raw_ads_b_dataframe().write_parquet(messy_input_file)
+    normalise_icao_columns(messy_raw_ads_b_dataframe()).filter(
+        pl.col("icao_address").is_not_null()
+    ).write_parquet(normalised_input_file)
+    identify_uk_flights(
+        [messy_input_file],
+        tmp_path / "compact",
+        config=FlightSegmentationConfig(),
+        compact_icao=True,
+    )
+    identify_uk_flights(
+        [normalised_input_file], tmp_path / "normalised", config=FlightSegmentationConfig()
+    )
+
+    assert_same_day_partitions(tmp_path / "compact", tmp_path / "normalised")
+    icao_addresses = pl.concat(read_day_partitions(tmp_path / "normalised").values())[
+        "icao_address"
+    ]
+    assert icao_addresses.str.starts_with("4c").all()
+
+
+@pytest.mark.parametrize(
+    ("workers", "compact_icao", "compact_days"), ((2, False, False), (3, True, True))
+)
+def test_parallel_matches_sequential(
+    input_files: list[Path],
+    tmp_path: Path,
+    workers: int,
+    compact_icao: bool,  # noqa: FBT001
+    compact_days: bool,  # noqa: FBT001
+) -> None:
+    """Test that segmenting chunks in parallel and stitching them gives the same flights."""
+    for run_workers in (1, workers):
+        identify_uk_flights(
+            input_files,
+            tmp_path / f"workers_{run_workers}",
+            config=FlightSegmentationConfig(),
+            compact_icao=compact_icao,
+            files_per_chunk=FILES_PER_CHUNK,
+            compact_days=compact_days,
+            workers=run_workers,
+        )
+
+    assert_same_day_partitions(tmp_path / f"workers_{workers}", tmp_path / "workers_1")
+    assert not list((tmp_path / f"workers_{workers}").glob(f"{SCRATCH_DIR_PREFIX}*"))
+    if compact_days:
+        for day_directory in (tmp_path / f"workers_{workers}").glob("day=*"):
+            assert len(list(day_directory.iterdir())) == 1
+
+
+def test_polars_threads_of_new_processes() -> None:
+    """Test that processes started in the context have the given polars thread pool size."""
+    threads = pl.thread_pool_size() + 2
+    with (
+        polars_threads_of_new_processes(threads),
+        ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor,
+    ):
+        assert executor.submit(pl.thread_pool_size).result() == threads
+
+
+@pytest.mark.parametrize(("streaming", "workers"), ((False, 1), (True, 1), (False, 2)))
+def test_resume_matches_uninterrupted_run(
+    input_files: list[Path],
+    tmp_path: Path,
+    streaming: bool,  # noqa: FBT001
+    workers: int,
+) -> None:
+    """Test that resuming a run stopped after some chunks gives the flights of one run."""
+    resumed_output_dir = tmp_path / "resumed"
+    for output_dir, run_input_files, resume in (
+        (tmp_path / "uninterrupted", input_files, False),
+        (resumed_output_dir, input_files[: 2 * FILES_PER_CHUNK], False),
+        (resumed_output_dir, input_files, True),
+    ):
+        if resume:
+            # left by a run killed while segmenting in parallel
+            (resumed_output_dir / f"{SCRATCH_DIR_PREFIX}killed").mkdir()
+        identify_uk_flights(
+            run_input_files,
+            output_dir,
+            config=FlightSegmentationConfig(),
+            streaming=streaming,
+            files_per_chunk=FILES_PER_CHUNK,
+            workers=workers,
+            resume=resume,
+        )
+
+    assert_same_day_partitions(resumed_output_dir, tmp_path / "uninterrupted")
+    assert not list(resumed_output_dir.glob(f"{SCRATCH_DIR_PREFIX}*"))
+
+
+def test_assign_flight_id_to_known_flights() -> None:
+    """Test the flight IDs of continued flights, runs of few datapoints and hard gaps."""
+    previous_flight_info_dataframe = add_unique_flight_identifier(
+        pl.DataFrame(
+            {
+                "flight_id": [7],
+                "icao_address": ["400001"],
+                "departure_airport_icao": ["EGLL"],
+                "arrival_airport_icao": ["EGCC"],
+                "last_timestamp": [START_TIME - timedelta(minutes=30)],
+            },
+            schema_overrides={"flight_id": pl.Int32},
+        )
+    )
+    flight_dataframe = pl.concat(
+        [
+            # continues flight 7 of the previous chunk
+            cruise_datapoints("400001", "EGLL", "EGCC", [0, 1, 2, 3]),
+            # a run of two datapoints is removed, the next flight is split at the 7 hour gap
+            cruise_datapoints("400002", "EGLL", "EGPH", [0, 1]),
+            cruise_datapoints("400002", "EGPH", "EGLL", [2, 3, 4, 422, 423, 424]),
+            # a run of three datapoints is removed, as is a datapoint without departure airport
+            cruise_datapoints("400003", "EGKK", "EGCC", [0, 1, 2]),
+            cruise_datapoints("400003", None, "EGKK", [3]),
+            cruise_datapoints("400003", "EGCC", "EGKK", [4, 5, 6, 7]),
+        ]
+    ).sort("timestamp", maintain_order=True)
+
+    output_dataframe = assign_flight_id_to_unique_flights(
+        flight_dataframe,
+        FlightSegmentationConfig(),
+        previous_flight_info_dataframe,
+        next_flight_id=10,
+    )
+
+    assert_frame_equal(
+        output_dataframe.select("icao_address", "timestamp", "flight_id"),
+        pl.concat(
+            [
+                cruise_datapoints("400001", "EGLL", "EGCC", [0, 1, 2, 3]).with_columns(flight_id=7),
+                cruise_datapoints("400002", "EGPH", "EGLL", [2, 3, 4]).with_columns(flight_id=10),
+                cruise_datapoints("400002", "EGPH", "EGLL", [422, 423, 424]).with_columns(
+                    flight_id=11
+                ),
+                cruise_datapoints("400003", "EGCC", "EGKK", [4, 5, 6, 7]).with_columns(
+                    flight_id=12
+                ),
+            ]
+        ).select("icao_address", "timestamp", pl.col("flight_id").cast(pl.Int32)),
+    )
+
+
+@pytest.mark.parametrize(
+    ("minutes", "latitude", "on_ground", "headings", "expected_split"),
+    (
+        # a hard gap, even in the air on the same heading
+        (7 * 60, 52.0, False, (90.0, 90.0), True),
+        (5 * 60, 52.0, False, (90.0, 90.0), False),
+        # a jump of about 670 km in a minute, but not in a 40 minute cruise gap
+        (1, 58.0, False, (0.0, 0.0), True),
+        (40, 57.4, False, (0.0, 0.0), False),
+        # a gap on the ground longer than long_ground_gap_minutes
+        (60, 52.0, True, (90.0, 90.0), True),
+        (40, 52.0, True, (90.0, 90.0), False),
+        # a U-turn in the air across a soft gap, but not within one
+        (50, 52.0, False, (90.0, 270.0), True),
+        (30, 52.0, False, (90.0, 270.0), False),
+        # the heading wraps around from 350 to 10 degrees
+        (50, 52.0, False, (350.0, 10.0), False),
+        # unknown heading or on_ground
+        (50, 52.0, False, (90.0, None), False),
+        (60, 52.0, None, (90.0, 270.0), False),
+    ),
+)
+def test_split_flight_at_datapoint(
+    minutes: float,
+    latitude: float,
+    on_ground: bool | None,  # noqa: FBT001
+    headings: tuple[float | None, float | None],
+    expected_split: bool,  # noqa: FBT001
+) -> None:
+    """Test whether a datapoint after a gap from a datapoint at latitude 52 starts a new flight."""
+    datapoints = pl.DataFrame(
+        {
+            "timestamp": [START_TIME, START_TIME + timedelta(minutes=minutes)],
+            "latitude": [52.0, latitude],
+            "longitude": [-1.0, -1.0],
+            "on_ground": [on_ground, on_ground],
+            "heading": list(headings),
+        },
+        schema_overrides={"on_ground": pl.Boolean, "heading": pl.Float32},
+    )
+
+    split = datapoints.select(split_flight_at_datapoint(FlightSegmentationConfig())).to_series()
+
+    assert split.to_list() == [False, expected_split]
+
+
+def test_raw_csv_files_match_ingested_files(input_files: list[Path], tmp_path: Path) -> None:
+    """Test that identifying flights from raw CSV files gives the flights of their parquet files."""
+    raw_dir = tmp_path / "ads_b_raw"
+    raw_dir.mkdir()
+    for input_file in input_files:
+        with gzip.open(raw_dir / f"{input_file.stem}.csv.gzip", "wb") as raw_file:
+            pl.read_parquet(input_file).select(
+                pl.col(column)
+                if column in ADS_B_PARQUET_INPUT_SCHEMA
+                else pl.lit(None).alias(column)
+                for column in ADS_B_CSV_SCHEMA
+            ).write_csv(raw_file)
+    ingest_raw_ads_b_data(LocalDirectorySource(raw_dir), tmp_path / "ingested")
+
+    raw_input_files = sorted(raw_dir.glob("*.gzip"))
+    ingested_input_files = sorted((tmp_path / "ingested").glob("*.parquet"))
+    assert len(raw_input_files) == len(ingested_input_files) == len(input_files)
+    for output_name, run_input_files in (
+        ("from_raw", raw_input_files),
+        ("from_ingested", ingested_input_files),
+    ):
+        identify_uk_flights(
+            run_input_files,
+            tmp_path / output_name,
+            config=FlightSegmentationConfig(),
+            files_per_chunk=FILES_PER_CHUNK,
+        )
+
+    assert_same_day_partitions(tmp_path / "from_raw", tmp_path / "from_ingested")
+
+
+def test_input_files_without_on_ground_are_read_in_the_air(
+    input_files: list[Path], tmp_path: Path
+) -> None:
+    """Test that parquet files converted without on_ground give the flights of files with it."""
+    old_input_dir = tmp_path / "ads_b_without_on_ground"
+    old_input_dir.mkdir()
+    old_input_files = []
+    for index, input_file in enumerate(input_files):
+        # every other file lacks the column, so files with and without it are read together
+        old_input_file = old_input_dir / input_file.name
+        input_dataframe = pl.read_parquet(input_file)
+        if index % 2 == 0:
+            input_dataframe = input_dataframe.drop("on_ground")
+        input_dataframe.write_parquet(old_input_file)
+        old_input_files.append(old_input_file)
+
+    scanned = scan_ads_b_input_files(old_input_files).collect()
+    assert scanned.columns == list(ADS_B_PARQUET_INPUT_SCHEMA)
+    assert scanned["on_ground"].null_count() == 0
+    assert not scanned["on_ground"].any()
+
+    for output_name, run_input_files in (
+        ("without_on_ground", old_input_files),
+        ("with_on_ground", input_files),
+    ):
+        identify_uk_flights(
+            run_input_files,
+            tmp_path / output_name,
+            config=FlightSegmentationConfig(),
+            files_per_chunk=FILES_PER_CHUNK,
+        )
+
+    assert_same_day_partitions(tmp_path / "without_on_ground", tmp_path / "with_on_ground")
+
+
+def test_mixed_raw_and_parquet_input_files_raise(input_files: list[Path], tmp_path: Path) -> None:
+    """Test that a list of both raw CSV and parquet files is refused rather than misread."""
+    with pytest.raises(ValueError, match="raw CSV files"):
+        scan_ads_b_input_files([tmp_path / "part_000.csv.gzip", *input_files])
+
+
+def test_compact_closed_days_across_a_year(tmp_path: Path) -> None:
+    """Test that the first day of a new year is left open and the last day of the year compacted."""
+    flights = (
+        generate_synthetic_ads_b_dataframe(number_of_flights=4, datapoints_per_flight=20)
+        .with_columns(pl.col("timestamp") + pl.duration(days=365 + pl.col("flight_id") // 2))
+        .with_columns(pl.col("timestamp").dt.ordinal_day().alias("flight_day"))
+    )
+    for chunk_index in range(2):
+        write_day_partitions(
+            flights.filter(pl.col("flight_id") % 2 == chunk_index), tmp_path, chunk_index
+        )
+
+    compact_closed_days(tmp_path)
+
+    assert [path.name for path in day_partition_directory(tmp_path, 366).iterdir()] == [
+        "part-00001-compacted.parquet"
+    ]
+    assert sorted(path.name for path in day_partition_directory(tmp_path, 1).iterdir()) == [
+        "part-00000-00000.parquet",
+        "part-00001-00000.parquet",
+    ]
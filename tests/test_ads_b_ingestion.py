@@ -0,0 +1,265 @@
+"""Tests for the ingestion of raw ADS-B CSV files."""
+
+from __future__ import annotations
+
+import gzip
+import math
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from aia_model_contrail_avoidance import ads_b_ingestion
+from aia_model_contrail_avoidance.ads_b_ingestion import (
+    MANIFEST_FILE_NAME,
+    LocalDirectorySource,
+    RawObject,
+    S3ObjectSource,
+    ingest_raw_ads_b_data,
+    ingested_parquet_files,
+    output_file_name,
+    partition_ads_b_parquet_files,
+    scan_raw_ads_b_files,
+)
+from aia_model_contrail_avoidance.config import (
+    ADS_B_CSV_SCHEMA,
+    ADS_B_INPUT_TIMESTAMP_FORMAT,
+    ADS_B_PARQUET_INPUT_SCHEMA,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+RAW_KEYS = [
+    "2024-01-01/part-0.csv.gzip",
+    "2024-01-01/part-1.csv.gzip",
+    "2024-01-02/part-0.csv.gzip",
+]
+
+
+def raw_dataframe(part: int) -> pl.DataFrame:
+    """A raw ADS-B CSV part of two rows, with every column of the raw schema."""
+    values = {
+        "timestamp": ["2024-01-01 00:00:00.000 UTC", "2024-01-01 00:01:00.500 UTC"],
+        "icao_address": [f"40000{part}", f"40000{part}"],
+        "latitude": [51.0 + part, 51.1 + part],
+        "longitude": [-1.0, -1.1],
+    }
+    return pl.DataFrame(
+        {column: values.get(column, [None, None]) for column in ADS_B_CSV_SCHEMA},
+        schema=ADS_B_CSV_SCHEMA,
+    )
+
+
+@pytest.fixture
+def raw_directory(tmp_path: Path) -> Path:
+    """Directory of gzip compressed raw CSV files."""
+    directory = tmp_path / "raw"
+    for part, key in enumerate(RAW_KEYS):
+        path = directory / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "wb") as raw_file:
+            raw_dataframe(part).write_csv(raw_file)
+    return directory
+
+
+@dataclass(frozen=True)
+class FlakySource(LocalDirectorySource):
+    """Local source whose fetches of some keys fail a number of times before they succeed."""
+
+    failures: dict[str, int] = field(default_factory=dict)
+
+    def fetch(self, key: str, scratch_dir: Path) -> Path:
+        """Fail while the key has failures left, then fetch it."""
+        if self.failures.get(key, 0) > 0:
+            self.failures[key] -= 1
+            message = f"Connection reset fetching {key}"
+            raise ConnectionError(message)
+        return super().fetch(key, scratch_dir)
+
+
+@dataclass
+class StubS3Client:
+    """In-memory stand-in for the list and download calls of a boto3 S3 client."""
+
+    # Objects of the bucket by key
+    objects: dict[str, bytes]
+    # Number of keys in each page of a listing
+    page_size: int = 2
+    # Number of pages listed so far
+    listed_pages: int = 0
+
+    def get_paginator(self, operation_name: str) -> StubS3Client:
+        """The client itself paginates the only operation used, list_objects_v2."""
+        assert operation_name == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str) -> Iterator[dict[str, Any]]:  # noqa: N803
+        """Pages of the objects under the prefix, in order of their keys."""
+        assert Bucket == "bucket"
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        for start in range(0, len(keys), self.page_size):
+            self.listed_pages += 1
+            yield {
+                "Contents": [
+                    {"Key": key, "Size": len(self.objects[key])}
+                    for key in keys[start : start + self.page_size]
+                ]
+            }
+
+    def download_file(self, Bucket: str, Key: str, Filename: str) -> None:  # noqa: N803
+        """Write an object to a local file."""
+        assert Bucket == "bucket"
+        with open(Filename, "wb") as local_file:  # noqa: PTH123
+            local_file.write(self.objects[Key])
+
+
+@pytest.fixture
+def stub_s3_client(raw_directory: Path) -> StubS3Client:
+    """Stub S3 client of a bucket with the raw files under a prefix, and an unrelated object."""
+    objects = {f"raw/{key}": (raw_directory / key).read_bytes() for key in RAW_KEYS}
+    objects["raw/README.txt"] = b"not ADS-B data"
+    return StubS3Client(objects)
+
+
+def test_s3_list_objects(stub_s3_client: StubS3Client) -> None:
+    """Test that the raw objects are listed across pages, and listing stops at max_objects."""
+    source = S3ObjectSource("bucket", prefix="raw/", client=stub_s3_client)
+
+    assert source.list_objects() == [
+        RawObject(key=f"raw/{key}", size=len(stub_s3_client.objects[f"raw/{key}"]))
+        for key in RAW_KEYS
+    ]
+    assert stub_s3_client.listed_pages == math.ceil(len(RAW_KEYS) / stub_s3_client.page_size)
+
+    stub_s3_client.listed_pages = 0
+    assert [raw_object.key for raw_object in source.list_objects(max_objects=2)] == [
+        f"raw/{key}" for key in RAW_KEYS[:2]
+    ]
+    assert stub_s3_client.listed_pages == 1
+
+
+def test_s3_ingest(stub_s3_client: StubS3Client, raw_directory: Path, tmp_path: Path) -> None:
+    """Test that fetched objects are converted like local files and removed from scratch."""
+    source = S3ObjectSource("bucket", prefix="raw/", client=stub_s3_client)
+    scratch_dir = tmp_path / "scratch"
+    scratch_dir.mkdir()
+    fetched_file = source.fetch(f"raw/{RAW_KEYS[0]}", scratch_dir)
+    assert fetched_file.parent == scratch_dir
+    assert fetched_file.read_bytes() == (raw_directory / RAW_KEYS[0]).read_bytes()
+
+    output_dir = tmp_path / "ads_b"
+    report = ingest_raw_ads_b_data(source, output_dir, workers=2)
+
+    assert sorted(report.converted_keys) == [f"raw/{key}" for key in RAW_KEYS]
+    for part, key in enumerate(RAW_KEYS):
+        assert_frame_equal(
+            pl.read_parquet(output_dir / output_file_name(f"raw/{key}")),
+            raw_dataframe(part).select(list(ADS_B_PARQUET_INPUT_SCHEMA)),
+        )
+    assert [path.name for path in output_dir.iterdir() if path.is_dir()] == []
+
+
+def test_output_file_names_are_unique() -> None:
+    """Test that keys that only differ in where they have separators have different names."""
+    keys = ["a/b_c.csv.gzip", "a_b/c.csv.gzip", "a_/b.csv.gzip", "a/_b.csv.gzip", "a/b/c.csv.gzip"]
+
+    assert len({output_file_name(key) for key in keys}) == len(keys)
+
+
+def test_ingest_local_directory(raw_directory: Path, tmp_path: Path) -> None:
+    """Test that each raw file is converted to a parquet file of the input columns."""
+    output_dir = tmp_path / "ads_b"
+
+    report = ingest_raw_ads_b_data(LocalDirectorySource(raw_directory), output_dir, workers=2)
+
+    assert sorted(report.converted_keys) == RAW_KEYS
+    assert report.failed_keys == ()
+    assert report.ingested_bytes == sum((raw_directory / key).stat().st_size for key in RAW_KEYS)
+    for part, key in enumerate(RAW_KEYS):
+        assert_frame_equal(
+            pl.read_parquet(output_dir / output_file_name(key)),
+            raw_dataframe(part).select(list(ADS_B_PARQUET_INPUT_SCHEMA)),
+        )
+    assert sorted(path.name for path in output_dir.iterdir() if path.name.startswith(".")) == [
+        MANIFEST_FILE_NAME
+    ]
+
+
+def test_ingest_resumes_from_manifest(raw_directory: Path, tmp_path: Path) -> None:
+    """Test that keys in the manifest are skipped and the others are converted."""
+    output_dir = tmp_path / "ads_b"
+    output_dir.mkdir()
+    (output_dir / MANIFEST_FILE_NAME).write_text(f"{RAW_KEYS[0]}\n")
+
+    report = ingest_raw_ads_b_data(LocalDirectorySource(raw_directory), output_dir)
+
+    assert sorted(report.converted_keys) == RAW_KEYS[1:]
+    assert not (output_dir / output_file_name(RAW_KEYS[0])).exists()
+    assert sorted((output_dir / MANIFEST_FILE_NAME).read_text().split()) == RAW_KEYS
+
+    rerun_report = ingest_raw_ads_b_data(LocalDirectorySource(raw_directory), output_dir)
+    assert rerun_report.converted_keys == ()
+    assert rerun_report.throughput_mb_per_second == 0.0
+
+
+def test_ingest_retries_failed_fetches(
+    raw_directory: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a key is retried, and left out of the manifest if every attempt fails."""
+    monkeypatch.setattr(ads_b_ingestion, "RETRY_DELAY_SECONDS", 0.0)
+    output_dir = tmp_path / "ads_b"
+    source = FlakySource(raw_directory, failures={RAW_KEYS[0]: 2, RAW_KEYS[1]: 3})
+
+    report = ingest_raw_ads_b_data(source, output_dir, attempts=3)
+
+    assert sorted(report.converted_keys) == [RAW_KEYS[0], RAW_KEYS[2]]
+    assert report.failed_keys == (RAW_KEYS[1],)
+    assert RAW_KEYS[1] not in (output_dir / MANIFEST_FILE_NAME).read_text().split()
+
+    resumed_report = ingest_raw_ads_b_data(source, output_dir, attempts=3)
+    assert resumed_report.converted_keys == (RAW_KEYS[1],)
+
+
+def test_max_objects(raw_directory: Path) -> None:
+    """Test that only the first objects of a source are listed."""
+    raw_objects = LocalDirectorySource(raw_directory).list_objects(max_objects=2)
+
+    assert [raw_object.key for raw_object in raw_objects] == RAW_KEYS[:2]
+
+
+def test_scan_raw_files_matches_converted_files(raw_directory: Path, tmp_path: Path) -> None:
+    """Test that scanning the raw files gives the datapoints read from the converted files."""
+    output_dir = tmp_path / "ads_b"
+    ingest_raw_ads_b_data(LocalDirectorySource(raw_directory), output_dir)
+
+    scanned_dataframe = scan_raw_ads_b_files([raw_directory / key for key in RAW_KEYS]).collect()
+
+    assert scanned_dataframe.schema["timestamp"] == pl.Datetime
+    assert_frame_equal(
+        scanned_dataframe,
+        pl.read_parquet([output_dir / output_file_name(key) for key in RAW_KEYS]).with_columns(
+            pl.col("timestamp").str.to_datetime(format=ADS_B_INPUT_TIMESTAMP_FORMAT)
+        ),
+    )
+
+
+def test_partition_ingested_files(raw_directory: Path, tmp_path: Path) -> None:
+    """Test that the converted files are partitioned in key order into row bounded files."""
+    converted_dir = tmp_path / "ads_b_converted"
+    output_dir = tmp_path / "ads_b"
+    ingest_raw_ads_b_data(LocalDirectorySource(raw_directory), converted_dir, workers=2)
+    converted_files = ingested_parquet_files(converted_dir)
+    assert converted_files == [converted_dir / output_file_name(key) for key in RAW_KEYS]
+
+    for max_rows_per_file, expected_number_of_files in ((4, 2), (10, 1)):
+        partition_ads_b_parquet_files(converted_files, output_dir, max_rows_per_file)
+
+        partitioned_files = sorted(output_dir.glob("*.parquet"))
+        assert len(partitioned_files) == expected_number_of_files
+        assert all(len(pl.read_parquet(path)) <= max_rows_per_file for path in partitioned_files)
+        assert_frame_equal(pl.read_parquet(partitioned_files), pl.read_parquet(converted_files))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["ads_b", "ads_b_converted", "raw"]
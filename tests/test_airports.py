@@ -2,11 +2,17 @@
 
 from __future__ import annotations
 
+import numpy as np
+import polars as pl
 import pytest
 
 from aia_model_contrail_avoidance.core_model.airports import (
+    AIRPORT_DATA_PATH,
     airport_icao_code_to_location,
+    airport_icao_codes_to_locations,
     airport_name_from_icao_code,
+    get_airport_registry,
+    great_circle_distance_between_airports,
     list_of_uk_airports,
 )
 
@@ -40,3 +46,51 @@ def test_airport_name_from_icao_code(icao_code: str, expected_name: str) -> None
     """Test that the airport_name_from_icao_code function returns correct airport name."""
     name = airport_name_from_icao_code(icao_code)
     assert name == expected_name
+
+
+def test_airport_registry_lookups_keep_input_order() -> None:
+    """Test the registry is loaded once and its lookups keep the order of the input codes."""
+    airport_registry = get_airport_registry()
+    assert get_airport_registry() is airport_registry
+    assert airport_registry.is_uk_airport("EGPH")
+    assert not airport_registry.is_uk_airport("KJFK")
+
+    # the same file by its absolute path is the same registry
+    assert get_airport_registry(AIRPORT_DATA_PATH.resolve()) is airport_registry
+
+    codes = ["EGSS", "XXXX", "EGLL", "EGSS"]
+    rows = airport_registry.rows_of(codes)
+    assert rows.dtype == np.int64
+    assert rows[1] == -1
+    np.testing.assert_array_equal(airport_registry.rows_of(pl.Series([*codes, None])), [*rows, -1])
+    assert [airport_registry.icao_codes[row] for row in rows[[0, 2, 3]]] == ["EGSS", "EGLL", "EGSS"]
+    assert airport_icao_code_to_location(codes) == [
+        airport_icao_code_to_location("EGSS"),
+        airport_icao_code_to_location("EGLL"),
+        airport_icao_code_to_location("EGSS"),
+    ]
+    assert airport_name_from_icao_code(codes) == [
+        "London Stansted Airport",
+        None,
+        "London Heathrow Airport",
+        "London Stansted Airport",
+    ]
+
+
+def test_airport_icao_codes_to_locations() -> None:
+    """Test bulk lookups are aligned with the input codes and NaN for unknown codes."""
+    codes = pl.Series(["EGPH", None, "EGLL", "XXXX", "EGPH"])
+    latitudes, longitudes = airport_icao_codes_to_locations(codes)
+
+    assert latitudes.dtype == np.float64
+    np.testing.assert_array_equal(np.isnan(latitudes), [False, True, False, True, False])
+    np.testing.assert_array_equal(np.isnan(longitudes), np.isnan(latitudes))
+    assert (latitudes[0], longitudes[0]) == airport_icao_code_to_location("EGPH")
+    assert (latitudes[2], longitudes[2]) == airport_icao_code_to_location("EGLL")
+    assert latitudes[4] == latitudes[0]
+
+    distances = great_circle_distance_between_airports(
+        np.array(["EGLL", "EGLL"]), np.array(["EGPH", "XXXX"])
+    )
+    assert distances[0] == pytest.approx(288.0, rel=0.05)
+    assert np.isnan(distances[1])
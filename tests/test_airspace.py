@@ -0,0 +1,161 @@
+"""Tests for airspace classification."""
+
+from __future__ import annotations
+
+import sys
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+import numpy as np
+import polars as pl
+import pytest
+import shapely
+from polars.testing import assert_frame_equal, assert_series_equal
+
+from aia_model_contrail_avoidance.core_model import airspace as airspace_module
+from aia_model_contrail_avoidance.core_model.airspace import (
+    RASTER_BOUNDARY,
+    FlightInformationRegion,
+    classify_airspace_of_points,
+    find_uk_airspace_of_flight_segment,
+    get_gb_airspaces,
+    load_or_build_airspace_raster,
+    name_of_airspace_of_point,
+    write_airspaces,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def generate_test_airspaces() -> list[FlightInformationRegion]:
+    """Overlapping polygon airspaces, in the order they are checked."""
+    return [
+        FlightInformationRegion("EGTT", "LONDON", shapely.box(-6.0, 49.0, 2.0, 55.0)),
+        FlightInformationRegion(
+            "EGPX", "SCOTTISH", shapely.Polygon([(-10.0, 54.0), (0.0, 54.0), (-5.0, 61.0)])
+        ),
+        FlightInformationRegion("EGGX", "SHANWICK OCEANIC", shapely.box(-30.0, 45.0, -10.0, 61.0)),
+    ]
+
+
+def test_classify_airspace_of_points_matches_per_point_loop() -> None:
+    """Test the vectorized classification gives the same names as the per-point loop."""
+    rng = np.random.default_rng(0)
+    longitudes = np.concatenate([rng.uniform(-32.0, 5.0, 2000), [2.0, -10.0, -6.0]])
+    latitudes = np.concatenate([rng.uniform(44.0, 62.0, 2000), [50.0, 50.0, 49.0]])
+    airspaces = generate_test_airspaces()
+
+    airspace = classify_airspace_of_points(longitudes, latitudes, airspaces)
+
+    assert airspace.dtype == pl.Categorical
+    assert airspace.cast(pl.String).to_list() == name_of_airspace_of_point(
+        shapely.points(longitudes, latitudes),  # type: ignore[arg-type]
+        airspaces,
+    )
+    assert set(airspace.drop_nulls().cast(pl.String)) == {"LONDON", "SCOTTISH", "SHANWICK OCEANIC"}
+
+
+def test_airspace_raster_matches_exact_classification(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the raster classifies points the same as the polygon tests and is cached on disk."""
+    monkeypatch.setattr(airspace_module, "_AIRSPACE_RASTERS", {})
+    airspaces = generate_test_airspaces()
+    rng = np.random.default_rng(1)
+    # random points, points on cell edges and points outside the raster bounds
+    longitudes = np.concatenate([rng.uniform(-31.0, 6.0, 20000), np.arange(-8.0, 3.0, 0.05)])
+    latitudes = np.concatenate([rng.uniform(44.0, 62.0, 20000), np.full(220, 54.0)])
+
+    raster = load_or_build_airspace_raster(airspaces, resolution=0.1, cache_directory=tmp_path)
+    assert raster.mask.dtype == np.uint8
+    assert (raster.mask == RASTER_BOUNDARY).mean() < 0.1  # noqa: PLR2004
+    assert_series_equal(
+        raster.classify(longitudes, latitudes),
+        classify_airspace_of_points(longitudes, latitudes, airspaces),
+        categorical_as_str=True,
+    )
+
+    (cache_file,) = tmp_path.glob("airspace_raster_*.npy")
+    monkeypatch.setattr(airspace_module, "_AIRSPACE_RASTERS", {})
+    reloaded_raster = load_or_build_airspace_raster(
+        airspaces, resolution=0.1, cache_directory=tmp_path
+    )
+    np.testing.assert_array_equal(reloaded_raster.mask, raster.mask)
+    assert list(tmp_path.iterdir()) == [cache_file]
+
+
+def test_get_gb_airspaces_reads_cache_without_traffic(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the GB FIRs are read from the parquet cache, in order, without importing traffic."""
+    monkeypatch.setattr(airspace_module, "_GB_AIRSPACES", {})
+    # importing a module set to None in sys.modules raises ImportError
+    monkeypatch.setitem(sys.modules, "traffic.data", None)
+    cache_path = tmp_path / "gb_airspaces.parquet"
+    airspaces = [
+        FlightInformationRegion("EGTT", "LONDON", shapely.box(-6.0, 49.0, 2.0, 55.0)),
+        FlightInformationRegion(
+            "EGPX", "SCOTTISH", shapely.Polygon([(-10.0, 54.0), (0.0, 54.0), (-5.0, 61.0)])
+        ),
+    ]
+    write_airspaces(airspaces, cache_path)
+
+    gb_airspaces = get_gb_airspaces(cache_path)
+    assert gb_airspaces == airspaces
+    assert get_gb_airspaces(cache_path) is gb_airspaces
+
+
+def test_get_gb_airspaces_skips_firs_without_designator(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test FIRs without a designator are left out when the cache is built from traffic."""
+    monkeypatch.setattr(airspace_module, "_GB_AIRSPACES", {})
+    london = shapely.box(-6.0, 49.0, 2.0, 55.0)
+    eurofirs = [
+        SimpleNamespace(designator="EGTT", name="LONDON", shape=london),
+        SimpleNamespace(designator=None, name="UNNAMED", shape=london),
+        SimpleNamespace(name="NO DESIGNATOR", shape=london),
+        SimpleNamespace(designator="LFFF", name="PARIS", shape=london),
+    ]
+    monkeypatch.setitem(sys.modules, "traffic.data", SimpleNamespace(eurofirs=eurofirs))
+
+    gb_airspaces = get_gb_airspaces(tmp_path / "gb_airspaces.parquet")
+    assert gb_airspaces == [FlightInformationRegion("EGTT", "LONDON", london)]
+
+
+@pytest.mark.parametrize("raster_resolution", (None, 0.1))
+def test_find_uk_airspace_of_flight_segment_keeps_row_order(
+    raster_resolution: float | None, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the airspace column is added in row order, for DataFrames and LazyFrames."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(airspace_module, "_AIRSPACE_RASTERS", {})
+    airspaces = generate_test_airspaces()
+    flight_dataframe = pl.DataFrame(
+        {
+            "flight_id": [1, 1, 1, 2, 2, 2],
+            "longitude": [-1.0, 10.0, -3.0, -20.0, None, -2.0],
+            "latitude": [51.0, 51.0, 58.0, 50.0, 50.0, 62.0],
+        }
+    )
+
+    flight_dataframe_with_airspace = find_uk_airspace_of_flight_segment(
+        flight_dataframe, raster_resolution, airspaces
+    )
+    assert flight_dataframe_with_airspace.drop("airspace").equals(flight_dataframe)
+    assert flight_dataframe_with_airspace["airspace"].cast(pl.String).to_list() == [
+        "LONDON",
+        None,
+        "SCOTTISH",
+        "SHANWICK OCEANIC",
+        None,
+        None,
+    ]
+    assert_frame_equal(
+        find_uk_airspace_of_flight_segment(
+            flight_dataframe.lazy(), raster_resolution, airspaces
+        ).collect(engine="streaming"),
+        flight_dataframe_with_airspace,
+        categorical_as_str=True,
+    )
@@ -0,0 +1,201 @@
+"""Tests for the energy forcing calculation of daily flight data files."""
+
+from __future__ import annotations
+
+import argparse
+import os
+from typing import TYPE_CHECKING
+
+import polars as pl
+import pytest
+import shapely
+from polars.testing import assert_frame_equal
+
+from aia_model_contrail_avoidance.core_model import airspace as airspace_module
+from aia_model_contrail_avoidance.core_model.airspace import (
+    GB_AIRSPACES_CACHE_PATH,
+    FlightInformationRegion,
+    write_airspaces,
+)
+from aia_model_contrail_avoidance.core_model.environment import (
+    calculate_energy_forcing_per_flight,
+)
+from aia_model_contrail_avoidance.core_model.environment_store import (
+    ENERGY_FORCING_DATA_DIRECTORY,
+)
+from aia_model_contrail_avoidance.flight_data_processing import (
+    FlightDepartureAndArrivalSubset,
+    TemporalFlightSubset,
+    process_ads_b_flight_data,
+)
+from aia_model_contrail_avoidance.testing import (
+    create_synthetic_grid_environment,
+    generate_synthetic_ads_b_dataframe,
+)
+from analysis.calculate_energy_forcing_from_filepath import (
+    calculate_energy_forcing_from_filepath,
+    number_of_workers,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+NUMBER_OF_DAYS = 3
+
+
+@pytest.fixture
+def processed_days(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> tuple[Path, Path]:
+    """Processed flight data and flight info of synthetic days, with a synthetic environment.
+
+    The data directory is made in tmp_path, the working directory of the test and of the worker
+    processes it starts.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(airspace_module, "_GB_AIRSPACES", {})
+    monkeypatch.setattr(airspace_module, "_AIRSPACE_RASTERS", {})
+    write_airspaces(
+        [
+            FlightInformationRegion("EGTT", "LONDON", shapely.box(-6.0, 49.0, 2.0, 55.0)),
+            FlightInformationRegion("EGPX", "SCOTTISH", shapely.box(-10.0, 55.0, 0.0, 61.0)),
+        ],
+        GB_AIRSPACES_CACHE_PATH,
+    )
+    ENERGY_FORCING_DATA_DIRECTORY.mkdir(parents=True)
+    create_synthetic_grid_environment().to_dataset(name="ef_per_m").to_netcdf(
+        ENERGY_FORCING_DATA_DIRECTORY / "synthetic.nc"
+    )
+
+    flights_dir = tmp_path / "flights"
+    flights_info_dir = tmp_path / "flights_info"
+    flights_dir.mkdir()
+    flights_info_dir.mkdir()
+    for day in range(1, NUMBER_OF_DAYS + 1):
+        input_path = tmp_path / f"ads_b_day_{day:03d}.parquet"
+        generate_synthetic_ads_b_dataframe(
+            number_of_flights=10, datapoints_per_flight=50, seed=day
+        ).write_parquet(input_path)
+        process_ads_b_flight_data(
+            str(input_path),
+            str(flights_dir / f"UK_flights_day_{day:03d}.parquet"),
+            str(flights_info_dir / f"UK_flights_day_{day:03d}.parquet"),
+            FlightDepartureAndArrivalSubset.ALL,
+            TemporalFlightSubset.JANUARY,
+        )
+    return flights_dir, flights_info_dir
+
+
+def test_parallel_days_match_sequential_days(
+    processed_days: tuple[Path, Path], tmp_path: Path
+) -> None:
+    """Test that days processed by two worker processes give the same files as one process."""
+    flights_dir, flights_info_dir = processed_days
+
+    output_dirs = {}
+    for workers in (1, 2):
+        output_dirs[workers] = (tmp_path / f"ef_{workers}", tmp_path / f"ef_info_{workers}")
+        calculate_energy_forcing_from_filepath(
+            flights_dir,
+            flights_info_dir,
+            *output_dirs[workers],
+            TemporalFlightSubset.JANUARY,
+            "synthetic",
+            workers=workers,
+        )
+
+    for sequential_dir, parallel_dir in zip(output_dirs[1], output_dirs[2], strict=True):
+        sequential_files = sorted(path.name for path in sequential_dir.glob("*.parquet"))
+        assert len(sequential_files) == NUMBER_OF_DAYS
+        assert sorted(path.name for path in parallel_dir.glob("*.parquet")) == sequential_files
+        for file_name in sequential_files:
+            assert_frame_equal(
+                pl.read_parquet(parallel_dir / file_name),
+                pl.read_parquet(sequential_dir / file_name),
+                check_exact=True,
+            )
+
+
+def test_parallel_days_reconvert_stale_store(
+    processed_days: tuple[Path, Path], tmp_path: Path
+) -> None:
+    """Test a parallel run after the NetCDF file is regenerated uses the regenerated environment."""
+    flights_dir, flights_info_dir = processed_days
+    environment_path = ENERGY_FORCING_DATA_DIRECTORY / "synthetic.nc"
+
+    def run(name: str, workers: int) -> pl.DataFrame:
+        calculate_energy_forcing_from_filepath(
+            flights_dir,
+            flights_info_dir,
+            tmp_path / f"ef_{name}",
+            tmp_path / f"ef_info_{name}",
+            TemporalFlightSubset.JANUARY,
+            "synthetic",
+            workers=workers,
+        )
+        return pl.read_parquet(tmp_path / f"ef_{name}" / "UK_flights_day_001_with_ef.parquet")
+
+    original = run("original", workers=2)
+    (create_synthetic_grid_environment() + 1.0).to_dataset(name="ef_per_m").to_netcdf(
+        environment_path
+    )
+    modification_time = environment_path.stat().st_mtime_ns + 10**9
+    os.utime(environment_path, ns=(modification_time, modification_time))
+
+    regenerated = run("regenerated", workers=2)
+    assert_frame_equal(regenerated, run("sequential", workers=1), check_exact=True)
+    assert not regenerated["ef"].equals(original["ef"])
+
+
+def test_flight_info_with_ef_extends_saved_flight_info(
+    processed_days: tuple[Path, Path], tmp_path: Path
+) -> None:
+    """Test the saved flight info is extended with per-flight ef, and days without it skipped."""
+    flights_dir, flights_info_dir = processed_days
+    (flights_info_dir / f"UK_flights_day_{NUMBER_OF_DAYS:03d}_flight_info.parquet").unlink()
+    calculate_energy_forcing_from_filepath(
+        flights_dir,
+        flights_info_dir,
+        tmp_path / "ef",
+        tmp_path / "ef_info",
+        TemporalFlightSubset.JANUARY,
+        "synthetic",
+    )
+
+    assert sorted(path.name for path in (tmp_path / "ef_info").iterdir()) == [
+        f"UK_flights_day_{day:03d}_flight_info_with_ef.parquet" for day in range(1, NUMBER_OF_DAYS)
+    ]
+    for day in range(1, NUMBER_OF_DAYS):
+        flight_data_with_ef = pl.read_parquet(
+            tmp_path / "ef" / f"UK_flights_day_{day:03d}_with_ef.parquet"
+        )
+        expected_flight_info = pl.read_parquet(
+            flights_info_dir / f"UK_flights_day_{day:03d}_flight_info.parquet"
+        ).join(
+            calculate_energy_forcing_per_flight(flight_data_with_ef),
+            on="flight_id",
+            how="inner",
+            maintain_order="left",
+        )
+        assert_frame_equal(
+            pl.read_parquet(
+                tmp_path / "ef_info" / f"UK_flights_day_{day:03d}_flight_info_with_ef.parquet"
+            ),
+            expected_flight_info,
+        )
+
+
+@pytest.mark.parametrize("workers", (0, -2))
+def test_fewer_than_one_worker_is_rejected(tmp_path: Path, workers: int) -> None:
+    """Test a number of workers below one is rejected by the function and the command line."""
+    with pytest.raises(ValueError, match="workers must be at least 1"):
+        calculate_energy_forcing_from_filepath(
+            tmp_path,
+            tmp_path,
+            tmp_path / "ef",
+            tmp_path / "ef_info",
+            TemporalFlightSubset.JANUARY,
+            "synthetic",
+            workers=workers,
+        )
+    with pytest.raises(argparse.ArgumentTypeError, match="invalid number of workers"):
+        number_of_workers(str(workers))
+    assert number_of_workers("3") == 3  # noqa: PLR2004
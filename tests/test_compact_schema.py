@@ -0,0 +1,161 @@
+"""Tests for the compact encoding of ICAO codes in flight data."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from aia_model_contrail_avoidance.compact_schema import (
+    airport_icao_dtype,
+    airports_as_categorical,
+    apply_schema_profile,
+    compact_icao_schema,
+    decode_icao_columns,
+    encode_icao_columns,
+    flight_key,
+    is_icao_encoded,
+    normalise_icao_columns,
+    read_flight_parquet,
+    scan_flight_parquet,
+    widen_compact_numeric_columns,
+    write_flight_parquet,
+)
+from aia_model_contrail_avoidance.config import ADS_B_SCHEMA_CLEANED, SchemaProfile
+from aia_model_contrail_avoidance.testing import generate_synthetic_ads_b_dataframe
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def flight_dataframe() -> pl.DataFrame:
+    return generate_synthetic_ads_b_dataframe(number_of_flights=50, datapoints_per_flight=100)
+
+
+def test_encode_and_decode_round_trip(flight_dataframe: pl.DataFrame) -> None:
+    """Test that encoding and decoding the ICAO columns gives back the original strings."""
+    encoded = encode_icao_columns(flight_dataframe)
+
+    assert encoded.schema["icao_address"] == pl.UInt32
+    assert encoded.schema["departure_airport_icao"] == airport_icao_dtype()
+    assert encoded.estimated_size() < flight_dataframe.estimated_size()
+    assert_frame_equal(decode_icao_columns(encoded), flight_dataframe)
+    assert_frame_equal(encode_icao_columns(encoded), encoded)
+
+
+def test_icao_address_is_formatted_with_six_hexadecimal_digits() -> None:
+    """Test that decoded addresses keep their leading zeros and nulls."""
+    icao_addresses = pl.DataFrame({"icao_address": ["000001", "4ca7b5", "ffffff", None]})
+
+    encoded = encode_icao_columns(icao_addresses)
+
+    assert encoded["icao_address"].to_list() == [1, 0x4CA7B5, 0xFFFFFF, None]
+    assert_frame_equal(decode_icao_columns(encoded), icao_addresses)
+
+
+def test_invalid_codes_are_null_in_both_encodings() -> None:
+    """Test that invalid addresses and unknown airports are null rather than failing the query."""
+    icao_dataframe = pl.DataFrame(
+        {
+            "icao_address": ["40621D", "zz0001", "4ca7b5", "1000000", "abc"],
+            "departure_airport_icao": ["EGLL", "NOT_AN_AIRPORT", "EGCC", None, "EGPH"],
+        }
+    )
+
+    encoded = encode_icao_columns(icao_dataframe.lazy()).collect()
+    normalised = normalise_icao_columns(icao_dataframe)
+
+    assert encoded["icao_address"].to_list() == [0x40621D, None, 0x4CA7B5, None, 0xABC]
+    assert normalised.to_dict(as_series=False) == {
+        "icao_address": ["40621d", None, "4ca7b5", None, "000abc"],
+        "departure_airport_icao": ["EGLL", None, "EGCC", None, "EGPH"],
+    }
+    assert_frame_equal(decode_icao_columns(encoded), normalised)
+
+
+def test_is_icao_encoded_needs_integer_address_and_enum_airports(
+    flight_dataframe: pl.DataFrame,
+) -> None:
+    """Test that only an integer address with enum airports counts as the compact encoding."""
+    encoded = encode_icao_columns(flight_dataframe)
+
+    assert is_icao_encoded(encoded.schema)
+    assert not is_icao_encoded(flight_dataframe.schema)
+    assert not is_icao_encoded(airports_as_categorical(encoded).schema)
+    assert not is_icao_encoded(
+        airports_as_categorical(
+            encoded.with_columns(decode_icao_columns(encoded)["icao_address"])
+        ).schema
+    )
+    assert not is_icao_encoded(encoded.drop("arrival_airport_icao").schema)
+
+
+def test_flight_key_is_unique_per_aircraft_and_airport_pair() -> None:
+    """Test that the packed flight key distinguishes every field and propagates nulls."""
+    flights = encode_icao_columns(
+        pl.DataFrame(
+            {
+                "icao_address": ["4ca7b5", "4ca7b5", "4ca7b5", "4ca7b6", "4ca7b5"],
+                "departure_airport_icao": ["EGLL", "EGLL", "EGPH", "EGLL", None],
+                "arrival_airport_icao": ["EGPH", "EGKK", "EGPH", "EGPH", "EGPH"],
+            }
+        )
+    )
+
+    keys = flights.select(flight_key())["icao_address"]
+
+    assert keys.dtype == pl.UInt64
+    assert keys.null_count() == 1
+    assert keys.drop_nulls().n_unique() == 4  # noqa: PLR2004
+
+
+def test_compact_parquet_round_trip(tmp_path: Path, flight_dataframe: pl.DataFrame) -> None:
+    """Test that compact files read back in either encoding, and together with string files."""
+    string_path = tmp_path / "string.parquet"
+    compact_path = tmp_path / "compact.parquet"
+    write_flight_parquet(flight_dataframe, string_path, compact=False)
+    write_flight_parquet(flight_dataframe, compact_path)
+
+    compact_file_schema = pl.read_parquet_schema(compact_path)
+    assert compact_file_schema["icao_address"] == pl.UInt32
+    assert compact_file_schema["departure_airport_icao"] == pl.Categorical
+    assert_frame_equal(read_flight_parquet(compact_path, compact=False), flight_dataframe)
+    assert_frame_equal(
+        read_flight_parquet([string_path, compact_path]),
+        encode_icao_columns(pl.concat([flight_dataframe, flight_dataframe])),
+    )
+    assert scan_flight_parquet(string_path).collect_schema() == pl.Schema(
+        compact_icao_schema(flight_dataframe.schema)
+    )
+
+
+def test_compact_icao_schema() -> None:
+    """Test that only the ICAO columns change in the compact schema."""
+    schema = compact_icao_schema(ADS_B_SCHEMA_CLEANED)
+
+    assert schema["icao_address"] == pl.UInt32
+    assert schema["arrival_airport_icao"] == airport_icao_dtype()
+    assert schema["latitude"] == ADS_B_SCHEMA_CLEANED["latitude"]
+
+
+def test_apply_compact_schema_profile(flight_dataframe: pl.DataFrame) -> None:
+    """Test that the compact profile narrows the numeric columns and keeps the time zone."""
+    flight_dataframe = flight_dataframe.with_columns(
+        pl.col("timestamp").dt.replace_time_zone("UTC"),
+        (pl.col("altitude_baro") // 100.0).alias("flight_level"),
+        pl.lit(1.0).alias("ef"),
+    )
+
+    compact = apply_schema_profile(flight_dataframe, SchemaProfile.COMPACT)
+
+    assert compact.schema["timestamp"] == pl.Datetime("ms", "UTC")
+    assert compact.schema["latitude"] == pl.Float32
+    assert compact.schema["flight_level"] == pl.Int16
+    assert compact.schema["ef"] == pl.Float32
+    assert compact.estimated_size() < flight_dataframe.estimated_size()
+    assert apply_schema_profile(flight_dataframe, SchemaProfile.STANDARD) is flight_dataframe
+    assert widen_compact_numeric_columns(compact).schema["latitude"] == pl.Float64
+    assert widen_compact_numeric_columns(compact, ["ef"]).schema["latitude"] == pl.Float32
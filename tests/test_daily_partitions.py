@@ -0,0 +1,181 @@
+"""Tests for the daily partitioned datasets of flight data."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from aia_model_contrail_avoidance.daily_partitions import (
+    compact_day_partition,
+    daily_flight_data_sources,
+    day_partition_directories_in_date_order,
+    day_partition_directory,
+    day_partitions,
+    remove_chunk_parts,
+    write_day_partitions,
+)
+from aia_model_contrail_avoidance.testing import generate_synthetic_ads_b_dataframe
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def flight_chunks() -> list[pl.DataFrame]:
+    """Two chunks of flight data, each over the first and second day of the year."""
+    flight_dataframe = (
+        generate_synthetic_ads_b_dataframe(number_of_flights=20, datapoints_per_flight=50)
+        .with_columns(pl.col("timestamp") + pl.duration(days=pl.col("flight_id") // 10))
+        .with_columns(pl.col("timestamp").dt.ordinal_day().alias("flight_day"))
+    )
+    return [
+        flight_dataframe.filter(pl.col("flight_id") % 2 == 0),
+        flight_dataframe.filter(pl.col("flight_id") % 2 == 1),
+    ]
+
+
+def read_day(sources: dict[str, Path], name: str) -> pl.DataFrame:
+    return pl.read_parquet(sources[name])
+
+
+def test_chunks_are_written_as_part_files(
+    tmp_path: Path, flight_chunks: list[pl.DataFrame]
+) -> None:
+    """Test that each chunk adds part files and the days read back in the order of the chunks."""
+    for chunk_index, flight_chunk in enumerate(flight_chunks):
+        write_day_partitions(flight_chunk, tmp_path, chunk_index)
+
+    sources = daily_flight_data_sources(tmp_path)
+
+    assert list(sources) == ["UK_flights_day_001", "UK_flights_day_002"]
+    assert len(list(day_partition_directory(tmp_path, 1).glob("*.parquet"))) == 2  # noqa: PLR2004
+    all_flights = pl.concat(flight_chunks)
+    for day in (1, 2):
+        assert_frame_equal(
+            read_day(sources, f"UK_flights_day_{day:03d}"),
+            all_flights.filter(pl.col("flight_day") == day),
+        )
+
+
+def test_sink_to_day_partitions(tmp_path: Path, flight_chunks: list[pl.DataFrame]) -> None:
+    """Test that sinking a LazyFrame writes the same partitions as the eager writer."""
+    for chunk_index, flight_chunk in enumerate(flight_chunks):
+        write_day_partitions(flight_chunk, tmp_path / "eager", chunk_index)
+        flight_chunk.lazy().sink_parquet(day_partitions(tmp_path / "lazy", chunk_index), mkdir=True)
+
+    eager_sources = daily_flight_data_sources(tmp_path / "eager")
+    lazy_sources = daily_flight_data_sources(tmp_path / "lazy")
+
+    assert list(lazy_sources) == list(eager_sources)
+    for name in eager_sources:
+        assert_frame_equal(read_day(lazy_sources, name), read_day(eager_sources, name))
+
+
+def test_day_partitions_are_ordered_by_date_across_a_year(
+    tmp_path: Path, flight_chunks: list[pl.DataFrame]
+) -> None:
+    """Test that the first day of a year is ordered after the last day of the year before."""
+    new_year_flights = (
+        pl.concat(flight_chunks)
+        .with_columns(pl.col("timestamp") + pl.duration(days=365))
+        .with_columns(pl.col("timestamp").dt.ordinal_day().alias("flight_day"))
+    )
+    write_day_partitions(new_year_flights, tmp_path, 0)
+    day_partition_directory(tmp_path, 3).mkdir()
+
+    assert [path.name for path in day_partition_directories_in_date_order(tmp_path)] == [
+        "day=366",
+        "day=001",
+    ]
+
+
+def test_compact_day_partition(tmp_path: Path, flight_chunks: list[pl.DataFrame]) -> None:
+    """Test that compacting a day merges its parts without changing the data."""
+    for chunk_index, flight_chunk in enumerate(flight_chunks):
+        write_day_partitions(flight_chunk, tmp_path, chunk_index)
+    day_directory = day_partition_directory(tmp_path, 1)
+    uncompacted_day = read_day(daily_flight_data_sources(tmp_path), "UK_flights_day_001")
+
+    compact_day_partition(day_directory)
+
+    assert [path.name for path in day_directory.iterdir()] == ["part-00001-compacted.parquet"]
+    assert_frame_equal(
+        read_day(daily_flight_data_sources(tmp_path), "UK_flights_day_001"), uncompacted_day
+    )
+
+
+def test_compacted_day_reads_before_later_chunks(
+    tmp_path: Path, flight_chunks: list[pl.DataFrame]
+) -> None:
+    """Test that a day compacted again, or up to a chunk, keeps its rows in chunk order."""
+    chunks = [*flight_chunks, flight_chunks[0].with_columns(pl.col("flight_id") + 100)]
+    day_directory = day_partition_directory(tmp_path, 1)
+    write_day_partitions(chunks[0], tmp_path, 0)
+    write_day_partitions(chunks[1], tmp_path, 1)
+    compact_day_partition(day_directory)
+    write_day_partitions(chunks[2], tmp_path, 2)
+    write_day_partitions(chunks[2], tmp_path, 3)
+
+    compact_day_partition(day_directory, last_chunk_index=2)
+
+    assert sorted(path.name for path in day_directory.iterdir()) == [
+        "part-00002-compacted.parquet",
+        "part-00003-00000.parquet",
+    ]
+    assert_frame_equal(
+        read_day(daily_flight_data_sources(tmp_path), "UK_flights_day_001"),
+        pl.concat([*chunks, chunks[2]]).filter(pl.col("flight_day") == 1),
+    )
+
+
+def test_parts_of_interrupted_compaction_are_removed(
+    tmp_path: Path, flight_chunks: list[pl.DataFrame]
+) -> None:
+    """Test that parts already in a compacted file are removed, so their rows are not read twice."""
+    for chunk_index, flight_chunk in enumerate(flight_chunks):
+        write_day_partitions(flight_chunk, tmp_path, chunk_index)
+    day_directory = day_partition_directory(tmp_path, 1)
+    part_files = {path: path.read_bytes() for path in day_directory.iterdir()}
+    compact_day_partition(day_directory)
+    # as if the compaction was interrupted before the parts were removed
+    for path, content in part_files.items():
+        path.write_bytes(content)
+
+    remove_chunk_parts(tmp_path, len(flight_chunks))
+
+    assert [path.name for path in day_directory.iterdir()] == ["part-00001-compacted.parquet"]
+    assert_frame_equal(
+        read_day(daily_flight_data_sources(tmp_path), "UK_flights_day_001"),
+        pl.concat(flight_chunks).filter(pl.col("flight_day") == 1),
+    )
+
+
+def test_daily_files_and_partitions_are_read_together(
+    tmp_path: Path, flight_chunks: list[pl.DataFrame]
+) -> None:
+    """Test that a directory with daily files and day partitions lists both, in day order."""
+    write_day_partitions(flight_chunks[1], tmp_path, 0)
+    flight_chunks[0].write_parquet(tmp_path / "UK_flights_day_000.parquet")
+
+    sources = daily_flight_data_sources(tmp_path)
+
+    assert list(sources) == ["UK_flights_day_000", "UK_flights_day_001", "UK_flights_day_002"]
+    assert sources["UK_flights_day_000"] == tmp_path / "UK_flights_day_000.parquet"
+
+
+def test_remove_chunk_parts(tmp_path: Path, flight_chunks: list[pl.DataFrame]) -> None:
+    """Test that only the part files of the later chunks are removed."""
+    for chunk_index, flight_chunk in enumerate(flight_chunks):
+        write_day_partitions(flight_chunk, tmp_path, chunk_index)
+
+    remove_chunk_parts(tmp_path, 1)
+
+    sources = daily_flight_data_sources(tmp_path)
+    for day in (1, 2):
+        assert_frame_equal(
+            read_day(sources, f"UK_flights_day_{day:03d}"),
+            flight_chunks[0].filter(pl.col("flight_day") == day),
+        )
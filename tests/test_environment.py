@@ -3,19 +3,30 @@
 from __future__ import annotations
 
 import datetime
+from typing import TYPE_CHECKING
 
+import polars as pl
 import pytest
+from polars.testing import assert_series_equal
 
+from aia_model_contrail_avoidance.compact_schema import apply_schema_profile
+from aia_model_contrail_avoidance.config import SchemaProfile
 from aia_model_contrail_avoidance.core_model.environment import (
+    EnvironmentInterpolation,
+    calculate_energy_forcing_per_flight,
     calculate_total_energy_forcing,
     create_grid_environment,
     run_flight_data_through_environment,
 )
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridLookup
 from aia_model_contrail_avoidance.testing import (
     create_synthetic_grid_environment,
     generate_synthetic_flight,
 )
 
+if TYPE_CHECKING:
+    import xarray as xr
+
 
 def test_create_grid_environment() -> None:
     """Test creating grid environment."""
@@ -85,6 +96,29 @@ def test_run_flight_data_through_environment() -> None:
     assert flight_with_erf["ef"].null_count() == 0
 
 
+def test_run_flight_data_through_grid_lookup(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test a GridLookup passed in is used as it is and samples the same values as its DataArray."""
+    environment = create_synthetic_grid_environment()
+    grid_lookup = GridLookup.from_data_array(environment)
+    sample_flight_dataframe = generate_synthetic_flight(
+        flight_id=1,
+        departure_location=(51.4700, -0.4543),
+        arrival_location=(55.9533, -3.1883),
+        departure_time=datetime.datetime(2024, 1, 1, 1, 0, 0, tzinfo=datetime.UTC),
+        length_of_flight=3600.0,
+        flight_level=300,
+    )
+    from_data_array = run_flight_data_through_environment(sample_flight_dataframe, environment)
+
+    def fail_to_build(data_array: xr.DataArray) -> GridLookup:
+        msg = f"GridLookup built from {data_array.name}"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(GridLookup, "from_data_array", fail_to_build)
+    from_grid_lookup = run_flight_data_through_environment(sample_flight_dataframe, grid_lookup)
+    assert_series_equal(from_grid_lookup["ef"], from_data_array["ef"])
+
+
 @pytest.mark.parametrize(
     ("flight_level", "expected_total_ef"),
     (
@@ -124,3 +158,86 @@ def test_calculate_effective_radiative_forcing(flight_level: int, expected_total
 
     total_ef = calculate_total_energy_forcing(1, flight_with_ef)
     assert total_ef == pytest.approx(expected_total_ef, rel=0.05)
+
+
+@pytest.mark.parametrize(
+    ("flight_level_hpa", "expected_ef_per_m"),
+    ((300.0, 0.5), (325.0, 0.75), (400.0, 1.0)),
+)
+def test_run_flight_data_through_environment_linear(
+    flight_level_hpa: float, expected_ef_per_m: float
+) -> None:
+    """Test linear sampling interpolates between pressure levels and clamps outside them."""
+    environment = create_synthetic_grid_environment()
+    flight_level = (1 - (flight_level_hpa / 1013.25) ** (1 / 5.255)) * 288.15 / 0.0065 / 30.48
+    sample_flight_dataframe = pl.DataFrame(
+        {
+            "timestamp": [datetime.datetime(2024, 1, 1, 1, 20, tzinfo=datetime.UTC)],
+            "latitude": [52.3],
+            "longitude": [-1.6],
+            "flight_level": [flight_level],
+            "distance_flown_in_segment": [1.0],
+        }
+    )
+
+    flight_with_ef = run_flight_data_through_environment(
+        sample_flight_dataframe, environment, EnvironmentInterpolation.LINEAR
+    )
+    assert flight_with_ef["ef"].item() == pytest.approx(expected_ef_per_m * 1852.0)
+
+
+def test_run_compact_flight_data_through_environment() -> None:
+    """Test that the compact schema profile samples the same grid values as the standard one.
+
+    Flight level 330 in hundreds of feet overflows Int16 if it is not widened first.
+    """
+    environment = create_synthetic_grid_environment()
+    sample_flight_dataframe = generate_synthetic_flight(
+        flight_id=1,
+        departure_location=(51.4700, -0.4543),
+        arrival_location=(55.9533, -3.1883),
+        departure_time=datetime.datetime(2024, 1, 1, 1, 0, 0, tzinfo=datetime.UTC),
+        length_of_flight=3600.0,
+        flight_level=330,
+    )
+    compact_flight_dataframe = apply_schema_profile(sample_flight_dataframe, SchemaProfile.COMPACT)
+
+    flight_with_ef = run_flight_data_through_environment(
+        sample_flight_dataframe, environment, EnvironmentInterpolation.LINEAR
+    )
+    compact_flight_with_ef = apply_schema_profile(
+        run_flight_data_through_environment(
+            compact_flight_dataframe, environment, EnvironmentInterpolation.LINEAR
+        ),
+        SchemaProfile.COMPACT,
+    )
+
+    assert compact_flight_dataframe.schema["flight_level"] == pl.Int16
+    assert compact_flight_with_ef.schema["ef"] == pl.Float32
+    assert compact_flight_with_ef["ef"].sum() > 0.0
+    assert_series_equal(
+        compact_flight_with_ef["ef"], flight_with_ef["ef"], check_dtypes=False, rel_tol=1e-6
+    )
+
+
+def test_calculate_energy_forcing_per_flight() -> None:
+    """Test the per-flight energy forcing reduction and the list wrapper around it."""
+    flight_dataset_with_ef = pl.DataFrame(
+        {
+            "flight_id": [1, 1, 1, 2, 2],
+            "ef": [0.0, 2.0, 3.0, -1.0, 0.0],
+            "distance_flown_in_segment": [1.0, 2.0, 4.0, 1.0, 1.0],
+        }
+    )
+
+    energy_forcing_per_flight = calculate_energy_forcing_per_flight(flight_dataset_with_ef).sort(
+        "flight_id"
+    )
+    assert energy_forcing_per_flight["total_energy_forcing"].to_list() == [5.0, -1.0]
+    assert energy_forcing_per_flight["distance_forming_contrails"].to_list() == [6.0, 0.0]
+    assert energy_forcing_per_flight["max_segment_energy_forcing"].to_list() == [3.0, 0.0]
+    assert energy_forcing_per_flight["number_of_contrail_forming_segments"].to_list() == [2, 0]
+
+    assert calculate_total_energy_forcing([2, 3, 1], flight_dataset_with_ef) == [-1.0, 0.0, 5.0]
+    assert calculate_total_energy_forcing(1, flight_dataset_with_ef) == 5.0  # noqa: PLR2004
+    assert calculate_total_energy_forcing(3, flight_dataset_with_ef) == 0.0
@@ -0,0 +1,125 @@
+"""Tests for the environment cache."""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from aia_model_contrail_avoidance.core_model.environment_cache import EnvironmentCache
+from aia_model_contrail_avoidance.core_model.environment_store import (
+    ENERGY_FORCING_DATA_DIRECTORY,
+    write_memory_mapped_environment,
+)
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridLookup
+from aia_model_contrail_avoidance.testing import create_synthetic_grid_environment
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+
+def write_synthetic_environment_file(environment_file_name: str) -> Path:
+    """Write the synthetic grid as a NetCDF file in the energy forcing data directory."""
+    ENERGY_FORCING_DATA_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    path = ENERGY_FORCING_DATA_DIRECTORY / f"{environment_file_name}.nc"
+    create_synthetic_grid_environment().to_dataset(name="ef_per_m").to_netcdf(path)
+    return path
+
+
+def test_environment_cache_hits_and_reloads(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the cache loads once per modification time of the environment file."""
+    monkeypatch.chdir(tmp_path)
+    path = write_synthetic_environment_file("synthetic")
+    cache = EnvironmentCache()
+
+    environment = cache.get("synthetic")
+    assert cache.get("synthetic") is environment
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    modification_time = path.stat().st_mtime_ns + 10**9
+    os.utime(path, ns=(modification_time, modification_time))
+    assert cache.get("synthetic") is not environment
+    assert (cache.hits, cache.misses, len(cache)) == (1, 2, 1)
+
+
+def test_environment_cache_memory_budget(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the least recently used in-memory environment is evicted to stay within the budget."""
+    monkeypatch.chdir(tmp_path)
+    for name in ("first", "second", "third"):
+        write_synthetic_environment_file(name)
+    environment_size = create_synthetic_grid_environment().nbytes
+    cache = EnvironmentCache(memory_budget_bytes=2 * environment_size)
+
+    cache.get("first")
+    cache.get("second")
+    cache.get("first")
+    cache.get("third")
+    assert len(cache) == 2  # noqa: PLR2004
+    assert cache.memory_usage_bytes == 2 * environment_size
+
+    cache.get("first")
+    assert cache.hits == 2  # noqa: PLR2004
+    cache.get("second")
+    assert cache.misses == 4  # noqa: PLR2004
+
+
+def test_environment_cache_prefers_memory_mapped_store(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the cache loads the memory-mapped store only when asked to."""
+    monkeypatch.chdir(tmp_path)
+    path = write_synthetic_environment_file("synthetic")
+    write_memory_mapped_environment(
+        create_synthetic_grid_environment(), path.with_suffix(""), source_path=path
+    )
+    cache = EnvironmentCache(memory_budget_bytes=0)
+
+    environment = cache.get("synthetic", memory_mapped=True)
+    assert isinstance(environment.values, np.memmap)
+    assert cache.memory_usage_bytes == 0
+    assert cache.get("synthetic", memory_mapped=True) is environment
+    assert not isinstance(cache.get("synthetic").values, np.memmap)
+
+
+def test_environment_cache_ignores_stale_store(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test a NetCDF file rewritten after its store was converted is loaded instead of the store."""
+    monkeypatch.chdir(tmp_path)
+    path = write_synthetic_environment_file("synthetic")
+    write_memory_mapped_environment(
+        create_synthetic_grid_environment(), path.with_suffix(""), source_path=path
+    )
+    cache = EnvironmentCache()
+    assert isinstance(cache.get("synthetic", memory_mapped=True).values, np.memmap)
+
+    regenerated_environment = create_synthetic_grid_environment() + 1.0
+    regenerated_environment.to_dataset(name="ef_per_m").to_netcdf(path)
+    modification_time = path.stat().st_mtime_ns + 10**9
+    os.utime(path, ns=(modification_time, modification_time))
+
+    environment = cache.get("synthetic", memory_mapped=True)
+    assert not isinstance(environment.values, np.memmap)
+    np.testing.assert_array_equal(
+        environment.values, GridLookup.from_data_array(regenerated_environment).values
+    )
+    assert (cache.misses, len(cache)) == (2, 1)
+
+
+def test_environment_cache_keys_by_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test an environment of the same name in another working directory is loaded separately."""
+    cache = EnvironmentCache()
+    environments = []
+    for working_directory in (tmp_path / "first", tmp_path / "second"):
+        working_directory.mkdir()
+        monkeypatch.chdir(working_directory)
+        write_synthetic_environment_file("synthetic")
+        environments.append(cache.get("synthetic"))
+
+    assert environments[0] is not environments[1]
+    assert (cache.hits, cache.misses, len(cache)) == (0, 2, 2)
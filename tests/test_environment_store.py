@@ -0,0 +1,81 @@
+"""Tests for the memory-mapped environment store."""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from aia_model_contrail_avoidance.core_model.environment_store import (
+    is_memory_mapped_environment_current,
+    load_memory_mapped_environment,
+    write_memory_mapped_environment,
+)
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridLookup
+from aia_model_contrail_avoidance.testing import create_synthetic_grid_environment
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_memory_mapped_environment_matches_in_memory(tmp_path: Path) -> None:
+    """Test the memory-mapped store samples the same values as the in-memory grid."""
+    environment = create_synthetic_grid_environment()
+    environment = environment.copy(data=np.random.default_rng(0).normal(size=environment.shape))
+    write_memory_mapped_environment(environment, tmp_path / "store", time_chunk_size=5)
+
+    memory_mapped_lookup = load_memory_mapped_environment(tmp_path / "store")
+    in_memory_lookup = GridLookup.from_data_array(environment)
+    assert isinstance(memory_mapped_lookup.values, np.memmap)
+    assert not memory_mapped_lookup.values.flags.writeable
+    assert not memory_mapped_lookup.has_missing_values
+
+    rng = np.random.default_rng(1)
+    points = {
+        "longitude": rng.uniform(-9.0, 3.0, 1000),
+        "latitude": rng.uniform(48.0, 62.0, 1000),
+        "level": rng.uniform(200.0, 400.0, 1000),
+        "time": np.datetime64("2024-01-01T00:00:00", "s")
+        + rng.integers(0, 24 * 3600, 1000).astype("timedelta64[s]"),
+    }
+    np.testing.assert_array_equal(
+        memory_mapped_lookup.sample_nearest(points), in_memory_lookup.sample_nearest(points)
+    )
+    np.testing.assert_allclose(
+        memory_mapped_lookup.sample_linear(points), in_memory_lookup.sample_linear(points)
+    )
+
+
+def test_rewriting_store_keeps_previous_mapping_intact(tmp_path: Path) -> None:
+    """Test a rewritten store replaces the previous one without changing values already mapped."""
+    environment = create_synthetic_grid_environment()
+    write_memory_mapped_environment(environment, tmp_path / "store")
+    previous_lookup = load_memory_mapped_environment(tmp_path / "store")
+    previous_values = np.array(previous_lookup.values)
+
+    write_memory_mapped_environment(environment + 1.0, tmp_path / "store")
+    np.testing.assert_array_equal(previous_lookup.values, previous_values)
+    np.testing.assert_array_equal(
+        load_memory_mapped_environment(tmp_path / "store").values, previous_values + 1.0
+    )
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["store"]
+
+
+def test_store_is_current_only_for_unchanged_source(tmp_path: Path) -> None:
+    """Test a store is current only while its source file keeps its recorded modification time."""
+    source_path = tmp_path / "environment.nc"
+    source_path.write_bytes(b"")
+    assert not is_memory_mapped_environment_current(tmp_path / "store", source_path)
+
+    write_memory_mapped_environment(create_synthetic_grid_environment(), tmp_path / "store")
+    assert not is_memory_mapped_environment_current(tmp_path / "store", source_path)
+
+    write_memory_mapped_environment(
+        create_synthetic_grid_environment(), tmp_path / "store", source_path=source_path
+    )
+    assert is_memory_mapped_environment_current(tmp_path / "store", source_path)
+
+    modification_time = source_path.stat().st_mtime_ns + 10**9
+    os.utime(source_path, ns=(modification_time, modification_time))
+    assert not is_memory_mapped_environment_current(tmp_path / "store", source_path)
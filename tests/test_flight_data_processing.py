@@ -0,0 +1,269 @@
+"""Tests for processing ADS-B flight data."""
+
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal, assert_series_equal
+
+from aia_model_contrail_avoidance.compact_schema import decode_icao_columns
+from aia_model_contrail_avoidance.config import SchemaProfile
+from aia_model_contrail_avoidance.flight_data_processing import (
+    FlightDepartureAndArrivalSubset,
+    TemporalFlightSubset,
+    add_distance_flown_in_segment,
+    create_flight_info_dataframe,
+    generate_interpolated_rows_of_large_distance_flights,
+    merge_close_datapoints_of_flight,
+    process_ads_b_flight_data,
+    process_ads_b_flight_data_streaming,
+)
+from aia_model_contrail_avoidance.testing import generate_synthetic_ads_b_dataframe
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def flight_dataframe_with_segments() -> pl.DataFrame:
+    flight_dataframe = generate_synthetic_ads_b_dataframe(
+        number_of_flights=20, datapoints_per_flight=200
+    )
+    flight_dataframe = flight_dataframe.with_columns(
+        (pl.col("altitude_baro") // 100.0).alias("flight_level")
+    ).drop("altitude_baro")
+    return add_distance_flown_in_segment(flight_dataframe).select(
+        [
+            "timestamp",
+            "latitude",
+            "longitude",
+            "flight_level",
+            "flight_id",
+            "icao_address",
+            "departure_airport_icao",
+            "arrival_airport_icao",
+            "distance_flown_in_segment",
+            "prev_lat",
+            "prev_lon",
+            "prev_timestamp",
+        ]
+    )
+
+
+@pytest.mark.parametrize("max_distance", (3.0, 15.0))
+def test_vectorized_interpolation_matches_per_row_interpolation(
+    flight_dataframe_with_segments: pl.DataFrame, max_distance: float
+) -> None:
+    """Test that the vectorized interpolation reproduces the per-row interpolation."""
+    sort_columns = ["flight_id", "timestamp", "latitude"]
+    per_row = generate_interpolated_rows_of_large_distance_flights(
+        flight_dataframe_with_segments, max_distance, vectorized=False
+    ).sort(sort_columns)
+    vectorized = generate_interpolated_rows_of_large_distance_flights(
+        flight_dataframe_with_segments, max_distance, vectorized=True
+    ).sort(sort_columns)
+
+    assert len(vectorized) > len(flight_dataframe_with_segments)
+    assert_frame_equal(vectorized, per_row, check_exact=True)
+
+
+def test_streaming_processing_matches_eager_processing(tmp_path: Path) -> None:
+    """Test that the streaming pipeline writes the same files as the eager pipeline."""
+    input_path = tmp_path / "flights.parquet"
+    generate_synthetic_ads_b_dataframe(
+        number_of_flights=20, datapoints_per_flight=200
+    ).write_parquet(input_path)
+
+    output_files = {}
+    for streaming in (False, True):
+        save_path = tmp_path / f"processed_{streaming}.parquet"
+        info_path = tmp_path / f"info_{streaming}.parquet"
+        process_ads_b_flight_data(
+            str(input_path),
+            str(save_path),
+            str(info_path),
+            FlightDepartureAndArrivalSubset.ALL,
+            TemporalFlightSubset.JANUARY,
+            streaming=streaming,
+        )
+        # the first interpolated datapoint of a segment shares the timestamp and position of the
+        # datapoint before the segment
+        output_files[streaming] = (
+            pl.read_parquet(save_path).sort(
+                ["flight_id", "timestamp", "latitude", "distance_flown_in_segment"]
+            ),
+            pl.read_parquet(tmp_path / f"info_{streaming}_flight_info.parquet").sort("flight_id"),
+        )
+
+    assert not list(tmp_path.glob(".streaming-*"))
+    assert_frame_equal(output_files[True][0], output_files[False][0], check_exact=True)
+    # the float sums of total_distance_flown depend on how each engine splits the rows
+    assert_frame_equal(
+        output_files[True][1].drop("total_distance_flown"),
+        output_files[False][1].drop("total_distance_flown"),
+        check_exact=True,
+    )
+    assert_series_equal(
+        output_files[True][1]["total_distance_flown"],
+        output_files[False][1]["total_distance_flown"],
+        check_exact=False,
+    )
+
+
+@pytest.mark.parametrize(
+    ("temporal_subset", "expected_number_of_flights"),
+    ((TemporalFlightSubset.JANUARY, 20), (TemporalFlightSubset.FEBRUARY, 0)),
+)
+def test_streaming_processing_in_flight_id_batches(
+    tmp_path: Path, temporal_subset: TemporalFlightSubset, expected_number_of_flights: int
+) -> None:
+    """Test that the flights are processed the same in batches of fewer rows than the file."""
+    input_path = tmp_path / "flights.parquet"
+    generate_synthetic_ads_b_dataframe(
+        number_of_flights=20, datapoints_per_flight=200
+    ).write_parquet(input_path)
+
+    output_files = {}
+    for rows_per_flight_id_batch in (500, 1_000_000):
+        save_path = tmp_path / f"processed_{rows_per_flight_id_batch}.parquet"
+        process_ads_b_flight_data_streaming(
+            str(input_path),
+            str(save_path),
+            str(tmp_path / f"info_{rows_per_flight_id_batch}.parquet"),
+            FlightDepartureAndArrivalSubset.ALL,
+            temporal_subset,
+            rows_per_flight_id_batch=rows_per_flight_id_batch,
+        )
+        output_files[rows_per_flight_id_batch] = (
+            pl.read_parquet(save_path).sort(
+                ["flight_id", "timestamp", "latitude", "distance_flown_in_segment"]
+            ),
+            pl.read_parquet(tmp_path / f"info_{rows_per_flight_id_batch}_flight_info.parquet").sort(
+                "flight_id"
+            ),
+        )
+
+    assert len(output_files[500][1]) == expected_number_of_flights
+    assert_frame_equal(output_files[500][0], output_files[1_000_000][0], check_exact=True)
+    assert_frame_equal(output_files[500][1], output_files[1_000_000][1], check_exact=False)
+
+
+def test_merge_close_datapoints_does_not_depend_on_order_of_equal_timestamps() -> None:
+    """Test datapoints sharing a timestamp are merged the same in either incoming order."""
+    timestamps = [
+        datetime.datetime(2024, 1, 1, 0, minute, tzinfo=datetime.UTC) for minute in (0, 1, 2, 2, 3)
+    ]
+    flight_dataframe = pl.DataFrame(
+        {
+            "flight_id": [1] * 5,
+            "timestamp": timestamps,
+            "distance_flown_in_segment": [0.0, 2.5, 0.5, 2.0, 2.8],
+        }
+    )
+    swapped_flight_dataframe = flight_dataframe[[0, 1, 3, 2, 4]]
+
+    merged = merge_close_datapoints_of_flight(flight_dataframe, 3.0)
+    assert merged["distance_flown_in_segment"].to_list() == [0.0, 2.5, 3.0, 2.5, 2.8]
+    assert_frame_equal(merge_close_datapoints_of_flight(swapped_flight_dataframe, 3.0), merged)
+    assert_frame_equal(
+        merge_close_datapoints_of_flight(swapped_flight_dataframe.lazy(), 3.0).collect(), merged
+    )
+
+
+@pytest.mark.parametrize("streaming", (False, True))
+def test_compact_icao_processing_matches_string_processing(
+    tmp_path: Path, *, streaming: bool
+) -> None:
+    """Test that processing with the compact ICAO encoding gives the same flights."""
+    input_path = tmp_path / "flights.parquet"
+    generate_synthetic_ads_b_dataframe(
+        number_of_flights=20, datapoints_per_flight=200
+    ).write_parquet(input_path)
+
+    processed = {}
+    for compact_icao in (False, True):
+        save_path = tmp_path / f"processed_{compact_icao}.parquet"
+        process_ads_b_flight_data(
+            str(input_path),
+            str(save_path),
+            str(tmp_path / f"info_{compact_icao}.parquet"),
+            FlightDepartureAndArrivalSubset.ALL,
+            TemporalFlightSubset.JANUARY,
+            streaming=streaming,
+            compact_icao=compact_icao,
+        )
+        processed[compact_icao] = pl.read_parquet(save_path).sort(
+            ["flight_id", "timestamp", "latitude"]
+        )
+
+    assert processed[True].schema["icao_address"] == pl.UInt32
+    assert_frame_equal(decode_icao_columns(processed[True]), processed[False], check_exact=True)
+
+
+def test_compact_schema_profile_processing(tmp_path: Path) -> None:
+    """Test that the compact schema profile saves narrow dtypes close to the standard values."""
+    input_path = tmp_path / "flights.parquet"
+    generate_synthetic_ads_b_dataframe(
+        number_of_flights=20, datapoints_per_flight=200
+    ).write_parquet(input_path)
+
+    processed = {}
+    for schema_profile in SchemaProfile:
+        save_path = tmp_path / f"processed_{schema_profile.value}.parquet"
+        process_ads_b_flight_data(
+            str(input_path),
+            str(save_path),
+            str(tmp_path / f"info_{schema_profile.value}.parquet"),
+            FlightDepartureAndArrivalSubset.ALL,
+            TemporalFlightSubset.JANUARY,
+            schema_profile=schema_profile,
+        )
+        processed[schema_profile] = pl.read_parquet(save_path).sort(
+            ["flight_id", "timestamp", "latitude"]
+        )
+
+    compact = processed[SchemaProfile.COMPACT]
+    standard = processed[SchemaProfile.STANDARD]
+    assert compact.schema["latitude"] == pl.Float32
+    assert compact.schema["flight_level"] == pl.Int16
+    assert compact["distance_flown_in_segment"].sum() == pytest.approx(
+        standard["distance_flown_in_segment"].sum(), rel=1e-6
+    )
+
+
+def test_create_flight_info_dataframe() -> None:
+    """Test that the flight info dataframe has one row per flight with the aggregated columns."""
+    departure_time = datetime.datetime(2024, 1, 1, 10, 0, 0, tzinfo=datetime.UTC)
+    flight_dataframe = pl.DataFrame(
+        {
+            "timestamp": [
+                departure_time + datetime.timedelta(minutes=minutes) for minutes in (0, 5, 10, 120)
+            ],
+            "flight_level": [300.0, 350.0, 320.0, 200.0],
+            "flight_id": [1, 1, 1, 2],
+            "icao_address": ["aaaaaa", "aaaaaa", "aaaaaa", "bbbbbb"],
+            "departure_airport_icao": ["EGLL", "EGLL", "EGLL", "EGPH"],
+            "arrival_airport_icao": ["EGPH", "EGPH", "EGPH", "EGKK"],
+            "distance_flown_in_segment": [1.0, 2.0, 3.0, 4.0],
+            "ef": [0.0, 5.0, 1.0, 0.0],
+        }
+    )
+
+    flight_info_dataframe = create_flight_info_dataframe(
+        flight_dataframe, [pl.col("ef").sum().alias("total_energy_forcing")]
+    ).sort("flight_id")
+
+    assert flight_info_dataframe["flight_id"].to_list() == [1, 2]
+    assert flight_info_dataframe["departure_airport_icao"].to_list() == ["EGLL", "EGPH"]
+    assert flight_info_dataframe["first_message_timestamp"][0] == departure_time
+    assert flight_info_dataframe["last_message_timestamp"][0] == (
+        departure_time + datetime.timedelta(minutes=10)
+    )
+    assert flight_info_dataframe["number_of_messages"].to_list() == [3, 1]
+    assert flight_info_dataframe["total_distance_flown"].to_list() == [6.0, 4.0]
+    assert flight_info_dataframe["max_flight_level"].to_list() == [350.0, 200.0]
+    assert flight_info_dataframe["min_flight_level"].to_list() == [300.0, 200.0]
+    assert flight_info_dataframe["total_energy_forcing"].to_list() == [6.0, 0.0]
@@ -0,0 +1,124 @@
+"""Tests for the checkpoints of flight identification."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from aia_model_contrail_avoidance.flight_id_checkpoint import FlightIdCheckpoint
+
+INPUT_FILES = [Path(f"/data/ads_b/day_{day:03d}.parquet") for day in range(1, 6)]
+SEGMENTATION_CONFIG = {"hard_gap_hours": 6.0, "hard_gap_only": False}
+
+
+@pytest.fixture
+def checkpoint() -> FlightIdCheckpoint:
+    """The checkpoint after the first chunk of two input files."""
+    flight_info = pl.DataFrame(
+        {
+            "flight_id": [3, 7],
+            "icao_address": ["400001", "400002"],
+            "departure_airport_icao": ["EGLL", "EGCC"],
+            "arrival_airport_icao": ["EGPH", None],
+        }
+    )
+    return FlightIdCheckpoint(
+        files_per_chunk=2, segmentation_config=SEGMENTATION_CONFIG, compact_icao=True
+    ).after_chunk(INPUT_FILES[:2], flight_info, 9)
+
+
+def test_after_chunk(checkpoint: FlightIdCheckpoint) -> None:
+    """Test that each chunk adds its files to the manifest and replaces the carried state."""
+    next_checkpoint = checkpoint.after_chunk(INPUT_FILES[2:4], pl.DataFrame(), 12)
+
+    assert next_checkpoint.processed_input_files == tuple(path.name for path in INPUT_FILES[:4])
+    assert next_checkpoint.processed_chunks == 2  # noqa: PLR2004
+    assert next_checkpoint.next_flight_id == 12  # noqa: PLR2004
+    assert next_checkpoint.flight_info.is_empty()
+    assert checkpoint.processed_chunks == 1
+
+
+def test_save_and_load(tmp_path: Path, checkpoint: FlightIdCheckpoint) -> None:
+    """Test that a saved checkpoint loads back with the same state."""
+    checkpoint.save(tmp_path)
+    loaded_checkpoint = FlightIdCheckpoint.load(
+        tmp_path, files_per_chunk=2, segmentation_config=SEGMENTATION_CONFIG, compact_icao=True
+    )
+
+    assert loaded_checkpoint.processed_input_files == checkpoint.processed_input_files
+    assert loaded_checkpoint.processed_chunks == checkpoint.processed_chunks
+    assert loaded_checkpoint.next_flight_id == checkpoint.next_flight_id
+    assert loaded_checkpoint.segmentation_config == SEGMENTATION_CONFIG
+    assert loaded_checkpoint.compact_icao
+    assert_frame_equal(loaded_checkpoint.flight_info, checkpoint.flight_info)
+
+
+def test_save_replaces_previous_checkpoint(tmp_path: Path, checkpoint: FlightIdCheckpoint) -> None:
+    """Test that saving the next checkpoint leaves only its files in the directory."""
+    checkpoint.save(tmp_path)
+    checkpoint.after_chunk(INPUT_FILES[2:4], checkpoint.flight_info, 12).save(tmp_path)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "flight_info-00002.parquet",
+        "state.json",
+    ]
+    loaded_checkpoint = FlightIdCheckpoint.load(
+        tmp_path, files_per_chunk=2, segmentation_config=SEGMENTATION_CONFIG, compact_icao=True
+    )
+    assert loaded_checkpoint.next_flight_id == 12  # noqa: PLR2004
+
+
+def test_load_without_checkpoint(tmp_path: Path) -> None:
+    """Test that loading from a directory without a checkpoint starts from the first chunk."""
+    loaded_checkpoint = FlightIdCheckpoint.load(tmp_path / "checkpoint", files_per_chunk=2)
+
+    assert loaded_checkpoint.processed_chunks == 0
+    assert loaded_checkpoint.next_flight_id == 0
+    assert loaded_checkpoint.flight_info.is_empty()
+    assert loaded_checkpoint.remaining_input_files(INPUT_FILES) == INPUT_FILES
+
+
+def test_load_with_other_chunk_size(tmp_path: Path, checkpoint: FlightIdCheckpoint) -> None:
+    """Test that resuming with another number of files per chunk is refused."""
+    checkpoint.save(tmp_path)
+
+    with pytest.raises(ValueError, match="2 files per chunk"):
+        FlightIdCheckpoint.load(
+            tmp_path, files_per_chunk=3, segmentation_config=SEGMENTATION_CONFIG, compact_icao=True
+        )
+
+
+def test_load_with_other_segmentation_config(
+    tmp_path: Path, checkpoint: FlightIdCheckpoint
+) -> None:
+    """Test that resuming with other segmentation parameters is refused."""
+    checkpoint.save(tmp_path)
+
+    with pytest.raises(ValueError, match="segmentation config"):
+        FlightIdCheckpoint.load(
+            tmp_path,
+            files_per_chunk=2,
+            segmentation_config={**SEGMENTATION_CONFIG, "hard_gap_only": True},
+            compact_icao=True,
+        )
+
+
+def test_load_with_other_icao_encoding(tmp_path: Path, checkpoint: FlightIdCheckpoint) -> None:
+    """Test that resuming with the other encoding of the ICAO columns is refused."""
+    checkpoint.save(tmp_path)
+
+    with pytest.raises(ValueError, match="compact_icao=True"):
+        FlightIdCheckpoint.load(
+            tmp_path, files_per_chunk=2, segmentation_config=SEGMENTATION_CONFIG
+        )
+
+
+def test_remaining_input_files(checkpoint: FlightIdCheckpoint) -> None:
+    """Test that the processed input files are skipped, and must come first."""
+    assert checkpoint.remaining_input_files(INPUT_FILES) == INPUT_FILES[2:]
+
+    with pytest.raises(ValueError, match="not the first input files"):
+        checkpoint.remaining_input_files(INPUT_FILES[1:])
@@ -4,10 +4,15 @@ from __future__ import annotations
 
 import datetime
 
+import numpy as np
 import polars as pl
 import pytest
 
-from aia_model_contrail_avoidance.core_model.flights import flight_distance_from_location
+from aia_model_contrail_avoidance.core_model.flights import (
+    flight_distance_expression,
+    flight_distance_from_location,
+    flight_distance_from_location_vectorized,
+)
 from aia_model_contrail_avoidance.testing import generate_synthetic_flight
 
 
@@ -23,6 +28,28 @@ def test_flight_distance_from_location() -> None:
     assert distance == pytest.approx(288.0, rel=0.05)  # Approximate distance in nautical miles
 
 
+def test_flight_distance_expression() -> None:
+    """Test that the polars expression gives the same distances as the NumPy implementation."""
+    locations = pl.DataFrame(
+        {
+            "departure_latitude": [51.4700, 55.9533, 0.0, None],
+            "departure_longitude": [-0.4543, -3.1883, 179.5, 0.0],
+            "arrival_latitude": [55.9533, 55.9533, 0.0, 1.0],
+            "arrival_longitude": [-3.1883, -3.1883, -179.5, 1.0],
+        }
+    )
+
+    distances = locations.select(
+        flight_distance_expression(*(pl.col(column) for column in locations.columns))
+    ).to_series()
+
+    expected_distances = flight_distance_from_location_vectorized(
+        *(locations[column].head(3).to_numpy() for column in locations.columns)
+    )
+    np.testing.assert_allclose(distances.head(3).to_numpy(), expected_distances)
+    assert distances[3] is None
+
+
 def test_generate_synthetic_flight() -> None:
     departure_time = datetime.datetime(2024, 1, 1, 12, 0, 0, tzinfo=datetime.UTC)
     length_of_flight = 3600.0  # 1 hour
@@ -0,0 +1,118 @@
+"""Tests for the direct-index grid lookup."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from aia_model_contrail_avoidance.core_model.grid_lookup import GridAxis, GridLookup
+from aia_model_contrail_avoidance.testing import create_synthetic_grid_environment
+
+
+def generate_random_points(number_of_points: int, seed: int = 0) -> dict[str, np.ndarray]:
+    """Random points covering the synthetic grid, its edges, exact ties and values outside it."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2024-01-01T00:00:00", "us")
+    points = {
+        "longitude": rng.uniform(-10.0, 4.0, number_of_points),
+        "latitude": rng.uniform(47.0, 63.0, number_of_points),
+        "level": rng.uniform(200.0, 400.0, number_of_points),
+        "time": start + rng.integers(-7200, 28 * 3600, number_of_points).astype("timedelta64[s]"),
+    }
+    # a quarter of the points sit exactly halfway between two grid coordinates
+    halfway = slice(0, number_of_points // 4)
+    points["longitude"][halfway] = rng.integers(-8, 2, number_of_points // 4) + 0.5
+    points["latitude"][halfway] = rng.integers(49, 60, number_of_points // 4) + 0.5
+    points["level"][halfway] = rng.choice([275.0, 325.0], number_of_points // 4)
+    points["time"][halfway] = start + (
+        rng.integers(0, 23, number_of_points // 4) * 3600 + 1800
+    ).astype("timedelta64[s]")
+    return points
+
+
+def test_grid_lookup_matches_xarray_nearest() -> None:
+    """Test the lookup indexes the same grid points as xarray nearest selection."""
+    environment = create_synthetic_grid_environment()
+    # distinct values so every grid point can be told apart
+    environment = environment.copy(data=np.arange(environment.size).reshape(environment.shape))
+    points = generate_random_points(10_000)
+
+    expected = environment.sel(
+        {dim: xr.DataArray(values, dims=["points"]) for dim, values in points.items()},
+        method="nearest",
+    ).to_numpy()
+
+    np.testing.assert_array_equal(
+        GridLookup.from_data_array(environment).sample_nearest(points), expected
+    )
+
+
+def test_grid_axis_irregular_and_regular_agree() -> None:
+    """Test the searchsorted fallback finds the same indices as the arithmetic path."""
+    regular_axis = GridAxis(np.array([150.0, 200.0, 250.0, 300.0]))
+    irregular_axis = GridAxis(np.array([150.0, 200.0, 250.0, 300.0, 1000.0]))
+    assert regular_axis.is_regular
+    assert not irregular_axis.is_regular
+
+    values = np.array([0.0, 150.0, 174.9, 175.0, 225.0, 299.0, 300.0, 310.0])
+    np.testing.assert_array_equal(
+        regular_axis.nearest_indices(values), irregular_axis.nearest_indices(values)
+    )
+    assert irregular_axis.nearest_indices(np.array([700.0]))[0] == 4  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("unit", ("ns", "us", "s", "m"))
+def test_datetime_axis_units(unit: str) -> None:
+    """Test datetime values give the same indices in their own unit as in nanoseconds."""
+    start = np.datetime64("2024-01-01T00:00", "ns")
+    hourly_axis = GridAxis(start + np.arange(4) * np.timedelta64(1, "h"))
+    # an axis starting off the minute needs nanoseconds for values in minutes
+    offset_axis = GridAxis(start + np.timedelta64(30, "s") + np.arange(4) * np.timedelta64(1, "h"))
+    values = (start + np.array([-90, 0, 29, 30, 31, 90, 150, 400]) * np.timedelta64(1, "m")).astype(
+        f"datetime64[{unit}]"
+    )
+
+    for axis in (hourly_axis, offset_axis):
+        np.testing.assert_array_equal(
+            axis.nearest_indices(values), axis.nearest_indices(values.astype("datetime64[ns]"))
+        )
+    np.testing.assert_array_equal(hourly_axis.nearest_indices(values), [0, 0, 0, 1, 1, 2, 3, 3])
+    np.testing.assert_array_equal(offset_axis.nearest_indices(values), [0, 0, 0, 0, 1, 1, 2, 3])
+
+
+def test_grid_lookup_missing_dimension() -> None:
+    """Test the lookup needs a coordinate for every grid dimension."""
+    lookup = GridLookup.from_data_array(create_synthetic_grid_environment())
+    with pytest.raises(ValueError, match="level"):
+        lookup.sample_nearest(
+            {
+                "longitude": np.zeros(1),
+                "latitude": np.zeros(1),
+                "time": np.zeros(1, "datetime64[s]"),
+            }
+        )
+
+
+def test_grid_lookup_linear_matches_xarray_interp() -> None:
+    """Test linear sampling matches xarray interpolation inside the grid and is clamped outside."""
+    environment = create_synthetic_grid_environment()
+    rng = np.random.default_rng(1)
+    environment = environment.copy(data=rng.normal(size=environment.shape))
+    lookup = GridLookup.from_data_array(environment)
+    points = generate_random_points(10_000)
+    inside = {
+        "longitude": np.clip(points["longitude"], -8.0, 2.0),
+        "latitude": np.clip(points["latitude"], 49.0, 61.0),
+        "level": np.clip(points["level"], 250.0, 350.0),
+        "time": np.clip(
+            points["time"], np.datetime64("2024-01-01T00:00"), np.datetime64("2024-01-01T23:00")
+        ),
+    }
+
+    expected = environment.interp(
+        {dim: xr.DataArray(values, dims=["points"]) for dim, values in inside.items()}
+    ).to_numpy()
+
+    np.testing.assert_allclose(lookup.sample_linear(inside), expected, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(lookup.sample_linear(points), lookup.sample_linear(inside))